@@ -0,0 +1,148 @@
+# Shared helpers for the benchmark scripts in this folder.
+# Benchmarks are dev-only: they are not part of the toolkit payload.
+
+from __future__ import annotations
+
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+TOOLKIT = Path(__file__).resolve().parent.parent / "toolkit"
+if str(TOOLKIT) not in sys.path:
+    sys.path.insert(0, str(TOOLKIT))
+
+
+def make_tree(root: Path, dirs: int, files_per_dir: int, fanout: int = 8, seed: int = 1) -> Path:
+    """Create a deterministic synthetic tree of *dirs* directories under *root*.
+
+    Directories are spread breadth-first with the given fan-out; every directory
+    gets *files_per_dir* small files of pseudo-random size (sparse writes, so a
+    big tree costs inodes rather than disk space).
+    """
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    queue = [root]
+    made = 0
+    while queue and made < dirs:
+        cur = queue.pop(0)
+        for i in range(fanout):
+            if made >= dirs:
+                break
+            d = cur / f"d{made:06d}"
+            d.mkdir(exist_ok=True)
+            made += 1
+            queue.append(d)
+            for j in range(files_per_dir):
+                with open(d / f"f{j:03d}.bin", "wb") as f:
+                    f.truncate(rng.randint(0, 256 * 1024))
+    return root
+
+
+def timed(fn, *args, repeat: int = 3, **kwargs):
+    """Run fn several times; return (best wall time, last result)."""
+    best, res = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best, res
+
+
+def default_workdir(name: str) -> Path:
+    return Path(os.environ.get("WINMAINTAIN_BENCH_DIR", Path.home() / ".cache" / "winmaintain_bench")) / name
+
+
+CHROMIUM_CACHES = ("Cache/Cache_Data", "Code Cache/js", "Code Cache/wasm", "GPUCache",
+                   "Service Worker/CacheStorage", "Service Worker/ScriptCache")
+
+
+def _write(path: Path, rng: random.Random, size: int) -> int:
+    # Half random bytes, half repeated text: contents that compress like real caches/logs.
+    half = size // 2
+    path.write_bytes(rng.randbytes(half) + b"cache entry " * ((size - half) // 12 + 1))
+    return size
+
+
+def make_windows_tree(root: Path, scale: float = 1.0, seed: int = 1) -> Dict[str, str]:
+    """Create a deterministic Windows-like user profile under *root*; returns the env vars pointing into it.
+
+    - AppData/Local/Packages: deep (up to ~12 levels) UWP-style nesting.
+    - Edge and Yandex "User Data" with several Chromium profiles laid out as
+      build_cleanup_actions() expects (Cache, Code Cache, GPUCache, Service
+      Worker caches), each full of tiny cache files, next to non-cache data.
+    - Opera Stable / Opera GX Stable caches, CrashDumps, SquirrelTemp.
+    - AppData/Local/Temp: one huge flat folder.
+    - AppData/Roaming: a few app folders with logs.
+    *scale* multiplies the file counts.
+    """
+    rng = random.Random(seed)
+    n = lambda k: max(1, int(k * scale))
+    local = root / "AppData" / "Local"
+    roaming = root / "AppData" / "Roaming"
+
+    for p in range(n(12)):
+        base = local / "Packages" / f"Microsoft.App{p:02d}_8wekyb3d8bbwe"
+        for branch in range(3):
+            d = base / "LocalCache" / "Local" / f"branch{branch}"
+            for depth in range(rng.randint(4, 9)):
+                d = d / f"level{depth}_{rng.randint(0, 3)}"
+                d.mkdir(parents=True, exist_ok=True)
+                for j in range(rng.randint(1, 6)):
+                    _write(d / f"state{j}.dat", rng, rng.randint(100, 8000))
+
+    for browser, profiles in (("Microsoft/Edge/User Data", n(4)), ("Yandex/YandexBrowser/User Data", n(3))):
+        ud = local / browser
+        for i in range(profiles):
+            prof = ud / ("Default" if i == 0 else f"Profile {i}")
+            for c in CHROMIUM_CACHES:
+                d = prof / c
+                d.mkdir(parents=True, exist_ok=True)
+                for j in range(n(120)):
+                    _write(d / f"f_{j:06x}", rng, rng.randint(200, 6000))
+            for keep in ("Extensions/abc/1.0", "Local Storage/leveldb", "IndexedDB/https_x_0.indexeddb.leveldb"):
+                d = prof / keep
+                d.mkdir(parents=True, exist_ok=True)
+                for j in range(n(20)):
+                    _write(d / f"{j:06d}.ldb", rng, rng.randint(500, 20000))
+            _write(prof / "Bookmarks", rng, 4000)
+            _write(prof / "History", rng, 64000)
+        _write(ud / "Local State", rng, 2000)
+
+    for opera in ("Opera Stable", "Opera GX Stable"):
+        for c in ("Cache", "Code Cache", "GPUCache"):
+            d = local / "Opera Software" / opera / c
+            d.mkdir(parents=True, exist_ok=True)
+            for j in range(n(80)):
+                _write(d / f"data_{j}", rng, rng.randint(200, 4000))
+
+    for name, files in (("CrashDumps", n(20)), ("SquirrelTemp", n(40))):
+        d = local / name
+        d.mkdir(parents=True, exist_ok=True)
+        for j in range(files):
+            _write(d / f"item{j}.dmp", rng, rng.randint(1000, 50000))
+
+    temp = local / "Temp"
+    temp.mkdir(parents=True, exist_ok=True)
+    for j in range(n(15000)):
+        _write(temp / f"tmp{j:06d}.tmp", rng, rng.randint(0, 2000))
+
+    for app in ("Code", "Telegram Desktop", "discord"):
+        d = roaming / app / "logs"
+        d.mkdir(parents=True, exist_ok=True)
+        for j in range(n(30)):
+            (d / f"log{j}.txt").write_text("".join(f"[{k}] event {rng.random():.6f}\n" for k in range(rng.randint(50, 800))))
+
+    return {"USERPROFILE": str(root), "LOCALAPPDATA": str(local), "APPDATA": str(roaming), "TEMP": str(temp)}
+
+
+def localize_targets(targets: List[str], env: Dict[str, str]) -> List[str]:
+    """Windows cleanup patterns (%VAR%, backslashes) rewritten for this OS and the env of make_windows_tree()."""
+    out = []
+    for t in targets:
+        for k, v in env.items():
+            t = t.replace(f"%{k}%", v)
+        out.append(t.replace("\\", os.sep))
+    return out
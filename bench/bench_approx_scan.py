@@ -0,0 +1,118 @@
+# Sampled scan (approx_scan) against the exact scan on trees with skewed size
+# distributions: a few level-1 folders hold most of the folders, file sizes are
+# log-normal, and rare multi-GB "needle" files sit deep in random folders.
+# For each --samples value: time, share of folders listed, error of the raw
+# level-1 estimates, how often the low..high range holds the true size (and
+# how often the size is above it), how wide the range is (median high / true),
+# how much of the true top 5 the refined top 5 finds (folders, bytes), and the
+# error of the total. Trees are made with and without needles (--needles).
+#
+#   python bench/bench_approx_scan.py --level1 60 --trees 3
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+from pathlib import Path
+
+from _common import default_workdir, timed
+
+import win_maintain as wm
+
+
+def make_skewed_tree(root: Path, level1: int, seed: int, needles: float = 0.002) -> int:
+    # Folder counts per level-1 subtree are Pareto distributed; inside, each new
+    # folder hangs under a random earlier one, or (30%) under the newest one,
+    # which grows long chains. Files are sparse, so sizes cost no disk space.
+    rng = random.Random(seed)
+    made = 0
+    for i in range(level1):
+        top = root / f"top{i:03d}"
+        top.mkdir(parents=True)
+        dirs = [top]
+        for j in range(min(int(rng.paretovariate(1.1) * 15), 4000) - 1):
+            parent = dirs[-1] if rng.random() < 0.3 else rng.choice(dirs)
+            d = parent / f"d{j:04d}"
+            d.mkdir()
+            dirs.append(d)
+        for d in dirs:
+            for k in range(rng.randint(0, 6)):
+                with open(d / f"f{k}.bin", "wb") as f:
+                    f.truncate(min(int(rng.lognormvariate(9, 2.2)), 1 << 31))
+            if rng.random() < needles:
+                with open(d / "needle.bin", "wb") as f:
+                    f.truncate(rng.randint(1 << 29, 1 << 32))
+        made += len(dirs)
+    return made
+
+
+def truth(root: Path):
+    res = wm.scan_root(str(root), -1, top_dirs=100000, top_files=0)
+    return res, dict(res.top_dirs_level1)
+
+
+def main():
+    ap = argparse.ArgumentParser("bench_approx_scan")
+    ap.add_argument("--level1", type=int, default=60, help="Level-1 folders per tree.")
+    ap.add_argument("--trees", type=int, default=3, help="Trees (seeds) to average over.")
+    ap.add_argument("--samples", type=int, nargs="+", default=[8, 32, 128])
+    ap.add_argument("--runs", type=int, default=5, help="Sampling runs (seeds) per tree.")
+    ap.add_argument("--needles", type=float, nargs="+", default=[0.0, 0.002], help="Chance per folder of a 0.5-4 GB file.")
+    args = ap.parse_args()
+
+    for needles in args.needles:
+        rows = {s: {"time": [], "listed": [], "err": [], "cover": [], "above": [], "width": [], "top5": [],
+                    "top5_bytes": [], "total": []} for s in args.samples}
+        exact_t, exact_dirs = [], []
+        print(f"=== needles: {needles:g} per folder ===")
+        for tree in range(args.trees):
+            root = default_workdir(f"skewed_{args.level1}_{needles:g}_{tree}")
+            if not root.exists():
+                print(f"Generating {root} ...")
+                make_skewed_tree(root, args.level1, seed=tree + 1, needles=needles)
+            t, (res, sizes) = timed(truth, root, repeat=2)
+            exact_t.append(t)
+            exact_dirs.append(res.stats.dirs_scanned)
+            top5 = sorted(sizes, key=sizes.get, reverse=True)[:5]
+            top5_bytes = sum(sizes[k] for k in top5)
+            print(f"tree {tree}: {res.stats.dirs_scanned} folders, {res.stats.files_scanned} files, "
+                  f"{wm.format_gb(res.stats.bytes_total)}, top 5 folders hold {top5_bytes / res.stats.bytes_total:.0%}, "
+                  f"exact scan {t:.2f}s")
+            for s in args.samples:
+                r = rows[s]
+                for run in range(args.runs):
+                    raw = wm.approx_scan(str(root), samples=s, refine=0, seed=run)
+                    t0 = time.perf_counter()
+                    ref = wm.approx_scan(str(root), samples=s, refine=5, seed=run)
+                    r["time"].append(time.perf_counter() - t0)
+                    r["listed"].append(raw.dirs_listed / res.stats.dirs_scanned)
+                    est = [f for f in raw.folders if not f.exact]
+                    r["err"] += [abs(f.bytes - sizes[f.path]) / max(sizes[f.path], 1) for f in est]
+                    r["cover"] += [f.low <= sizes[f.path] <= f.high for f in est]
+                    r["above"] += [sizes[f.path] > f.high for f in est]
+                    r["width"] += [f.high / max(sizes[f.path], 1) for f in est]
+                    found = [f.path for f in ref.folders[:5]]
+                    r["top5"].append(len(set(top5) & set(found)) / 5)
+                    r["top5_bytes"].append(sum(sizes[k] for k in found) / top5_bytes)
+                    r["total"].append(abs(ref.bytes - res.stats.bytes_total) / res.stats.bytes_total)
+
+        print(f"exact scan: {statistics.mean(exact_t):.2f}s avg, {statistics.mean(exact_dirs):.0f} folders")
+        print(f"{'samples':>7} {'time':>7} {'listed':>7} {'median err':>10} {'in range':>8} {'above':>6} "
+              f"{'high/true':>9} {'top5':>5} {'top5 bytes':>10} {'total err':>9}")
+        for s, r in rows.items():
+            print(f"{s:>7} {statistics.mean(r['time']):6.2f}s {statistics.mean(r['listed']):6.0%} "
+                  f"{statistics.median(r['err']) if r['err'] else 0:10.1%} "
+                  f"{statistics.mean(r['cover']) if r['cover'] else 1:8.0%} "
+                  f"{statistics.mean(r['above']) if r['above'] else 0:6.0%} "
+                  f"{statistics.median(r['width']) if r['width'] else 1:9.2f} {statistics.mean(r['top5']):5.0%} "
+                  f"{statistics.mean(r['top5_bytes']):10.0%} {statistics.mean(r['total']):9.1%}")
+        print()
+    print("time includes the exact refinement (--refine 5); listed, error and range coverage are for the "
+          "sampling alone, over the folders it did not list in full; above = true size over the range; "
+          "top5 bytes = bytes of the reported top 5 over bytes of the true top 5")
+
+
+if __name__ == "__main__":
+    main()
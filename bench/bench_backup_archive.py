@@ -0,0 +1,80 @@
+# backup-browsers --archive on a synthetic browser profile where text-like
+# files (History, logs, JSON, scripts) sit in the same folders as already
+# compressed ones (.ldb tables, images): zip, tar.xz with the stored files in
+# their own fast stream, and tar.xz as one preset-6 stream for comparison.
+#
+#   python bench/bench_backup_archive.py --folders 16 --repeat 3
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+from _common import default_workdir, timed
+
+import win_maintain as wm
+
+
+def make_profile(root: Path, folders: int, seed: int = 1) -> int:
+    # Each folder mixes repetitive text (log lines, JSON, JS) with random-content
+    # .ldb / .png files, interleaved by name. Returns the total size.
+    rng = random.Random(seed)
+    total = 0
+    for i in range(folders):
+        d = root / "Default" / f"Storage{i:03d}"
+        d.mkdir(parents=True, exist_ok=True)
+        for k in range(30):
+            if k % 3 == 2:
+                ext = rng.choice([".ldb", ".png"])
+                total += (d / f"{k:06d}{ext}").write_bytes(rng.randbytes(rng.randint(16, 192) * 1024))
+            else:
+                lines = rng.randint(20, 400)
+                text = "".join(f'{{"origin": "https://site{rng.randint(1, 40)}.example", "visit": {n}, '
+                               f'"title": "{rng.choice(["Inbox", "News", "Docs", "Search"])}"}}\n' for n in range(lines))
+                total += (d / f"{k:06d}.log").write_text(text)
+    total += (root / "Local State").write_text(json.dumps({"profile": {"info_cache": {"Default": {}}}}))
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser("bench_backup_archive")
+    ap.add_argument("--folders", type=int, default=16)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    src = default_workdir(f"profile_{args.folders}")
+    if not src.exists():
+        print(f"Generating profile under {src} ...")
+        make_profile(src, args.folders)
+    size = sum(p.stat().st_size for p in src.rglob("*") if p.is_file())
+    print(f"{src}: {sum(1 for p in src.rglob('*') if p.is_file())} files, {size / 2**20:.1f} MB")
+
+    out = Path(tempfile.mkdtemp(prefix="bench_archive_"))
+
+    def archive(fmt: str, name: str):
+        w = wm.ArchiveWriter(out / name, fmt)
+        w.add_tree(src, "Edge_UserData")
+        return w.close().stat().st_size
+
+    try:
+        for label, fmt in (("zip", "zip"), ("tar.xz", "tar.xz")):
+            t, n = timed(archive, fmt, f"backup.{fmt}", repeat=args.repeat)
+            print(f"{label:<22} {t:7.2f}s  {n / 2**20:7.2f} MB")
+        # Baseline: every file through the one preset-6 stream.
+        looks_compressed = wm.looks_compressed
+        wm.looks_compressed = lambda path, size: False
+        try:
+            t, n = timed(archive, "tar.xz", "single.tar.xz", repeat=args.repeat)
+        finally:
+            wm.looks_compressed = looks_compressed
+        print(f"{'tar.xz single stream':<22} {t:7.2f}s  {n / 2**20:7.2f} MB")
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Cleanup target expansion on a synthetic browser-profile tree: directory
+# listings and wall time of the old per-pattern expand_globs, of a correct
+# per-pattern Path.glob, and of the shared-prefix trie (expand_glob_groups).
+#
+#   python bench/bench_cleanup_globs.py --profiles 200 --extra 40
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+
+from _common import default_workdir, timed
+
+import win_maintain as wm
+
+CACHE_DIRS = ["Cache", "Code Cache", "GPUCache", "Service Worker/CacheStorage", "Service Worker/ScriptCache"]
+
+
+def make_profiles(root: Path, profiles: int, extra: int) -> None:
+    # Edge + Yandex "User Data" with *profiles* profiles each: the five cache
+    # folders (a few files each) next to *extra* unrelated folders.
+    for browser in ("Microsoft/Edge/User Data", "Yandex/YandexBrowser/User Data"):
+        ud = root / browser
+        for i in range(profiles):
+            prof = ud / ("Default" if i == 0 else f"Profile {i}")
+            for c in CACHE_DIRS:
+                (prof / c).mkdir(parents=True, exist_ok=True)
+                for j in range(3):
+                    (prof / c / f"data_{j}").touch()
+            for j in range(extra):
+                (prof / f"Extension State {j}").mkdir(exist_ok=True)
+
+
+def legacy_expand_globs(patterns):
+    # expand_globs as it was: one Path.glob per pattern, only on the last segment.
+    out = []
+    for pat in patterns:
+        pat2 = os.path.expandvars(pat)
+        p = Path(pat2)
+        if "*" in pat2 or "?" in pat2:
+            parent = p.parent
+            if parent.exists():
+                out.extend(list(parent.glob(p.name)))
+            else:
+                out.append(p)
+        else:
+            out.append(p)
+    uniq, seen = [], set()
+    for p in out:
+        s = str(p).lower()
+        if s not in seen:
+            uniq.append(p)
+            seen.add(s)
+    return uniq
+
+
+def per_pattern_glob(patterns):
+    # Every pattern globbed on its own, wildcards in any segment.
+    out, seen = [], set()
+    for pat in patterns:
+        p = Path(os.path.expandvars(pat))
+        anchor = Path(p.anchor)
+        for m in anchor.glob(str(p.relative_to(anchor))):
+            if str(m).lower() not in seen:
+                seen.add(str(m).lower())
+                out.append(m)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser("bench_cleanup_globs")
+    ap.add_argument("--profiles", type=int, default=200)
+    ap.add_argument("--extra", type=int, default=40, help="Non-cache folders per profile.")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    root = default_workdir(f"profiles_{args.profiles}x{args.extra}")
+    if not root.exists():
+        print(f"Generating profiles under {root} ...")
+        make_profiles(root, args.profiles, args.extra)
+    actions = [a for a in wm.build_cleanup_actions(include_browser_cache=True, include_nvidia_app=False)
+               if a.name in ("Yandex Browser cache", "Edge cache")]
+    for a in actions:  # %VAR% and backslashes are only understood on Windows
+        a.targets = [t.replace("%LOCALAPPDATA%", str(root)).replace("\\", os.sep) for t in a.targets]
+
+    listings = [0]
+    real_scandir = os.scandir
+
+    def counting_scandir(*a):
+        listings[0] += 1
+        return real_scandir(*a)
+
+    os.scandir = counting_scandir
+    runs = [
+        ("old expand_globs", lambda: [legacy_expand_globs(a.targets) for a in actions]),
+        ("per-pattern glob", lambda: [per_pattern_glob(a.targets) for a in actions]),
+        ("prefix trie", lambda: wm.expand_glob_groups([a.targets for a in actions])),
+    ]
+    for name, fn in runs:
+        listings[0] = 0
+        fn()
+        n_list = listings[0]
+        t, res = timed(fn, repeat=args.repeat)
+        found = sum(len(r) for r in res)
+        print(f"{name:<18} {t * 1000:9.1f} ms  listings={n_list:<7} paths={found}")
+    os.scandir = real_scandir
+
+
+if __name__ == "__main__":
+    main()
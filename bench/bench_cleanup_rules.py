@@ -0,0 +1,57 @@
+# Rule engine (iter_rule_matches) on a big synthetic temp folder: several
+# overlapping rule actions evaluated in one walk vs one walk per action.
+#
+#   python bench/bench_cleanup_rules.py --dirs 20000 --files 50     (1M files)
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from _common import default_workdir, make_tree
+
+import win_maintain as wm
+
+
+def main():
+    ap = argparse.ArgumentParser("bench_cleanup_rules")
+    ap.add_argument("--dirs", type=int, default=20000)
+    ap.add_argument("--files", type=int, default=50, help="Files per directory.")
+    args = ap.parse_args()
+
+    root = default_workdir(f"scan_{args.dirs}x{args.files}")
+    if not root.exists():
+        print(f"Generating tree under {root} ...")
+        make_tree(root, args.dirs, args.files)
+
+    actions = [
+        wm.CleanupAction("big", "", [str(root)], rule=wm.CleanupRule(larger_than_mb=0.2)),
+        wm.CleanupAction("f00x", "", [str(root)], rule=wm.CleanupRule(names=["f00?.bin"], exclude=["d0000[0-3]?"])),
+        wm.CleanupAction("old", "", [str(root)], rule=wm.CleanupRule(older_than_days=30)),
+        wm.CleanupAction("subtree", "", [str(root / "d000000")], rule=wm.CleanupRule()),
+    ]
+    targets = wm.expand_glob_groups([a.targets for a in actions])
+
+    def run(acts, tgts):
+        n = size = 0
+        for _, _, sz, _ in wm.iter_rule_matches(acts, tgts):
+            n += 1
+            size += sz
+        return n, size
+
+    t0 = time.perf_counter()
+    one = run(actions, targets)
+    t_one = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for i in range(len(actions)):
+        # Walks overlap here, so matches are not comparable to the single pass.
+        run([actions[i]], [targets[i]])
+    t_each = time.perf_counter() - t0
+    files = args.dirs * args.files
+    print(f"one walk, {len(actions)} rules   {t_one:8.2f}s  ({files / t_one:9.0f} files/s)  matched={one[0]} "
+          f"({wm.format_gb(one[1])})")
+    print(f"one walk per rule     {t_each:8.2f}s  x{t_each / t_one:4.2f} slower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Command output capture on multi-megabyte cp866 / cp1251 / UTF-8 outputs
+# (systeminfo / tasklist style): the old run_cmd (subprocess.run + trying
+# five codecs on the whole buffer) against run_cmd (prefix-sampled codec,
+# incremental decode while the command runs), decode-only timings, and
+# whether the decoded text is right.
+#
+#   python bench/bench_run_cmd.py --mb 8
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from _common import timed
+
+import win_maintain as wm
+
+LINE = "Имя образа {0:5d}  PID {0:6d}  Сеанс: Console  Память: {1:7d} КБ  Состояние: Выполняется\r\n"
+
+
+def legacy_decode(b: bytes) -> str:
+    # decode_best_effort as it was.
+    for enc in ("utf-8", "utf-8-sig", "cp866", "cp1251", "mbcs"):
+        try:
+            return b.decode(enc)
+        except Exception:
+            continue
+    return b.decode("utf-8", errors="replace")
+
+
+def legacy_run_cmd(cmd):
+    p = subprocess.run(cmd, capture_output=True)
+    return p.returncode, legacy_decode(p.stdout).strip(), legacy_decode(p.stderr).strip()
+
+
+def main():
+    ap = argparse.ArgumentParser("bench_run_cmd")
+    ap.add_argument("--mb", type=float, default=8.0, help="Output size per command.")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench_cmd_"))
+    lines = []
+    size = 0
+    while size < args.mb * 2**20:
+        lines.append(LINE.format(len(lines), len(lines) * 37 % 999999))
+        size += len(lines[-1])  # bytes in the single-byte code pages
+    text = "".join(lines)
+    print(f"{len(lines)} lines per output")
+    for enc in ("cp866", "cp1251", "utf-8"):
+        data = text.encode(enc)
+        path = work / f"out_{enc}.bin"
+        path.write_bytes(data)
+        cmd = [sys.executable, "-c", f"import shutil,sys; shutil.copyfileobj(open({str(path)!r},'rb'), sys.stdout.buffer)"]
+        expect = text.strip()
+
+        t_dec_old, dec_old = timed(legacy_decode, data, repeat=args.repeat)
+        t_dec_new, dec_new = timed(wm.decode_best_effort, data, repeat=args.repeat)
+        t_old, r_old = timed(legacy_run_cmd, cmd, repeat=args.repeat)
+        t_new, r_new = timed(wm.run_cmd, cmd, repeat=args.repeat)
+        n = []
+        t_lines, _ = timed(wm.run_cmd, cmd, on_line=n.append, repeat=1)
+        print(f"{enc:<7} {len(data) / 2**20:5.1f} MB | decode old {t_dec_old * 1000:6.1f} ms "
+              f"({'ok' if dec_old.strip() == expect else 'WRONG'}) new {t_dec_new * 1000:6.1f} ms "
+              f"({'ok' if dec_new.strip() == expect else 'WRONG'}) | run old {t_old:5.2f}s "
+              f"({'ok' if r_old[1] == expect else 'WRONG'}) new {t_new:5.2f}s "
+              f"({'ok' if r_new[1] == expect else 'WRONG'}) streamed {t_lines:5.2f}s ({len(n)} lines)")
+
+    cmds = [[sys.executable, "-c", "import time; time.sleep(0.5)"]] * 8
+    t_seq, _ = timed(lambda: [wm.run_cmd(c) for c in cmds], repeat=1)
+    t_par, _ = timed(wm.run_cmds, cmds, workers=8, repeat=1)
+    print(f"8 x 0.5 s commands: one by one {t_seq:.2f}s, run_cmds {t_par:.2f}s")
+    for p in work.iterdir():
+        p.unlink()
+    work.rmdir()
+
+
+if __name__ == "__main__":
+    main()
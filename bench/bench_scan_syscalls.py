@@ -0,0 +1,38 @@
+# Metadata fetches per entry in the scan hot loop (ScanStats.stat_calls).
+#
+# The default tree has 20000 dirs x 50 files = 1M files; use smaller numbers
+# for a quick run:
+#   python bench/bench_scan_syscalls.py --dirs 2000 --files 20
+
+from __future__ import annotations
+
+import argparse
+
+from _common import default_workdir, make_tree, timed
+
+import win_maintain as wm
+
+
+def main():
+    ap = argparse.ArgumentParser("bench_scan_syscalls")
+    ap.add_argument("--dirs", type=int, default=20000)
+    ap.add_argument("--files", type=int, default=50, help="Files per directory.")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    root = default_workdir(f"scan_{args.dirs}x{args.files}")
+    if not root.exists():
+        print(f"Generating tree under {root} ...")
+        make_tree(root, args.dirs, args.files)
+
+    t, res = timed(wm.scan_root, str(root), depth=-1, top_dirs=25, top_files=30, repeat=args.repeat)
+    st = res.stats
+    # Every listed entry except the root itself.
+    entries = st.files_scanned + st.dirs_scanned - 1 + st.skipped_reparse
+    print(f"entries={entries} files={st.files_scanned} dirs={st.dirs_scanned}")
+    print(f"stat_calls={st.stat_calls} per_entry={st.stat_calls / max(entries, 1):.3f}")
+    print(f"wall={t:.3f}s entries/s={entries / t:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Speedup of the parallel scan walker (scan_root workers=N) on a synthetic tree.
+#
+#   python bench/bench_scan_workers.py --dirs 20000 --files 10 --workers 1 2 4 8
+
+from __future__ import annotations
+
+import argparse
+
+from _common import default_workdir, make_tree, timed
+
+import win_maintain as wm
+
+
+def main():
+    ap = argparse.ArgumentParser("bench_scan_workers")
+    ap.add_argument("--dirs", type=int, default=20000)
+    ap.add_argument("--files", type=int, default=10, help="Files per directory.")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    root = default_workdir(f"scan_{args.dirs}x{args.files}")
+    if not root.exists():
+        print(f"Generating tree under {root} ...")
+        make_tree(root, args.dirs, args.files)
+
+    base_time, base = None, None
+    for n in args.workers:
+        t, res = timed(wm.scan_root, str(root), depth=-1, top_dirs=25, top_files=30, workers=n, repeat=args.repeat)
+        same = base is None or (
+            (res.stats.files_scanned, res.stats.dirs_scanned, res.stats.bytes_total) ==
+            (base.stats.files_scanned, base.stats.dirs_scanned, base.stats.bytes_total)
+            and res.top_dirs_level1 == base.top_dirs_level1
+            and res.top_dirs_level2 == base.top_dirs_level2
+            and res.top_files == base.top_files
+        )
+        if base is None:
+            base_time, base = t, res
+        print(f"workers={n:<3} {t:8.3f}s  speedup x{base_time / t:5.2f}  identical={same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Session zip on a synthetic session folder (many text logs, JSON reports,
+# some already-compressed files): shutil.make_archive against SessionArchiver
+# with 1 and N workers, and a second session archived with the dedupe store.
+#
+#   python bench/bench_session_zip.py --logs 600 --workers 4
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+from _common import default_workdir, timed
+
+import win_collect_session as wcs
+
+
+def make_session(root: Path, logs: int, seed: int = 1) -> int:
+    # Logs of 20 KB..1 MB with repetitive lines, a report per 20 logs, and a
+    # random-content .png every 50 logs. Returns the total size.
+    rng = random.Random(seed)
+    total = 0
+    for i in range(logs):
+        d = root / "logs" / f"app{i % 12:02d}"
+        d.mkdir(parents=True, exist_ok=True)
+        lines = rng.randint(200, 10000)
+        text = "".join(f"2026-10-{1 + n % 28:02d} 12:{n % 60:02d}:{rng.randint(0, 59):02d} INFO worker={rng.randint(1, 16)} "
+                       f"event={rng.choice(['start', 'stop', 'retry', 'ok'])} id={rng.getrandbits(32):08x}\n"
+                       for n in range(lines))
+        total += (d / f"log_{i:04d}.log").write_text(text)
+        if i % 20 == 0:
+            rep = {"drive": "C", "items": [{"path": f"C:/dir{n}", "bytes": rng.getrandbits(30)} for n in range(500)]}
+            (root / "reports").mkdir(exist_ok=True)
+            total += (root / "reports" / f"report_{i:04d}.json").write_text(json.dumps(rep, indent=2))
+        if i % 50 == 0:
+            (root / "shots").mkdir(exist_ok=True)
+            total += (root / "shots" / f"shot_{i:04d}.png").write_bytes(rng.randbytes(512 * 1024))
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser("bench_session_zip")
+    ap.add_argument("--logs", type=int, default=600)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    src = default_workdir(f"session_{args.logs}")
+    if not src.exists():
+        print(f"Generating session folder under {src} ...")
+        make_session(src, args.logs)
+    size = sum(p.stat().st_size for p in src.rglob("*") if p.is_file())
+    print(f"{src}: {sum(1 for p in src.rglob('*') if p.is_file())} files, {size / 2**20:.1f} MB, {os.cpu_count()} CPUs")
+
+    out = Path(tempfile.mkdtemp(prefix="bench_zip_"))
+    try:
+        t, _ = timed(shutil.make_archive, str(out / "legacy"), "zip", root_dir=str(src), repeat=args.repeat)
+        print(f"shutil.make_archive          {t:7.2f}s  {(out / 'legacy.zip').stat().st_size / 2**20:7.1f} MB")
+        for workers in sorted({1, args.workers}):
+            t, st = timed(wcs.SessionArchiver(workers=workers).archive, src, out / f"par{workers}.zip", repeat=args.repeat)
+            print(f"SessionArchiver workers={workers:<3}  {t:7.2f}s  {st['bytes_out'] / 2**20:7.1f} MB  "
+                  f"({st['files_stored']} stored)")
+
+        # Second session: same folder with 5% of the logs rewritten, archived against the store.
+        store_dir = out / "store"
+        store_dir.mkdir()
+        store = wcs.SessionStore(store_dir)
+        wcs.SessionArchiver(workers=args.workers, store=store).archive(src, store_dir / "s1.zip")
+        second = out / "second"
+        shutil.copytree(src, second)
+        for i, p in enumerate(sorted(second.rglob("*.log"))):
+            if i % 20 == 0:
+                p.write_text(p.read_text()[::-1])
+        t, st = timed(wcs.SessionArchiver(workers=args.workers, store=store).archive, second, store_dir / "s2.zip",
+                      repeat=1)
+        store.close()
+        print(f"second session with dedupe   {t:7.2f}s  {st['bytes_out'] / 2**20:7.1f} MB  "
+              f"({st['files_deduped']} of {st['files']} files already archived)")
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
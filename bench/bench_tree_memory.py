@@ -0,0 +1,82 @@
+# Memory per directory: DirTree (flat arrays) vs a naive dict-of-dicts tree.
+# Trees are built in memory only, no files are created.
+#
+#   python bench/bench_tree_memory.py --dirs 500000
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from _common import TOOLKIT  # noqa: F401  (puts toolkit/ on sys.path)
+
+import win_maintain as wm
+
+NAMES = ["Cache", "Code Cache", "GPUCache", "Default", "Local Storage", "IndexedDB", "Service Worker",
+         "CacheStorage", "ScriptCache", "Extensions", "Temp", "Logs", "Packages", "LocalState"]
+
+
+def shape(dirs: int, fanout: int, seed: int):
+    """Yield (parent index, name) in breadth-first order."""
+    rng = random.Random(seed)
+    for i in range(1, dirs):
+        parent = (i - 1) // fanout
+        name = rng.choice(NAMES) if rng.random() < 0.6 else f"{rng.getrandbits(48):012x}"
+        yield parent, name, rng.randint(0, 1 << 24), rng.randint(0, 50)
+
+
+def build_dirtree(dirs: int, fanout: int, seed: int):
+    t = wm.DirTree("C:\\Users\\bench\\AppData\\Local")
+    for parent, name, size, files in shape(dirs, fanout, seed):
+        node = t.add(parent, name)
+        t.set_own(node, size, files)
+    t.finalize()
+    return t
+
+
+def build_naive(dirs: int, fanout: int, seed: int):
+    root = {"name": "", "bytes": 0, "files": 0, "children": {}}
+    nodes = [root]
+    for parent, name, size, files in shape(dirs, fanout, seed):
+        node = {"name": name, "bytes": size, "files": files, "children": {}}
+        nodes[parent]["children"][f"{name}#{len(nodes)}"] = node
+        nodes.append(node)
+    return root, nodes
+
+
+def measure(fn, *args):
+    """Return (result, bytes still allocated, wall time); timed without tracing."""
+    t0 = time.perf_counter()
+    fn(*args)
+    dt = time.perf_counter() - t0
+    tracemalloc.start()
+    res = fn(*args)
+    cur, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return res, cur, dt
+
+
+def main():
+    ap = argparse.ArgumentParser("bench_tree_memory")
+    ap.add_argument("--dirs", type=int, default=500_000)
+    ap.add_argument("--fanout", type=int, default=12)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    tree, tree_mem, tree_dt = measure(build_dirtree, args.dirs, args.fanout, args.seed)
+    naive, naive_mem, naive_dt = measure(build_naive, args.dirs, args.fanout, args.seed)
+    print(f"dirs={args.dirs}")
+    print(f"DirTree      {tree_mem / args.dirs:8.1f} B/dir  build {tree_dt:6.2f}s (incl. finalize)")
+    print(f"dict-of-dict {naive_mem / args.dirs:8.1f} B/dir  build {naive_dt:6.2f}s")
+    print(f"ratio x{naive_mem / tree_mem:.1f}")
+
+    t0 = time.perf_counter()
+    tree.biggest(3, 25)
+    tree.children("", 25)
+    print(f"queries (biggest at level 3 + top children of root): {time.perf_counter() - t0:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
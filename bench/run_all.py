@@ -0,0 +1,203 @@
+# Benchmark suite: builds a deterministic Windows-like profile (make_windows_tree)
+# and times the main code paths on it. Results go to a JSON file; with a
+# baseline, every benchmark slower than it by more than --threshold is
+# flagged and the exit code is 1. Runs on Linux (paths and %VARS% of the
+# cleanup patterns are rewritten for the synthetic tree).
+#
+#   python bench/run_all.py                        (results JSON + compare with the saved baseline)
+#   python bench/run_all.py --save-baseline        (store this run as the baseline)
+#   python bench/run_all.py --only scan cleanup --scale 2
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from _common import default_workdir, localize_targets, make_windows_tree, timed
+
+import win_collect_session as wcs
+import win_maintain as wm
+
+
+def bench_scan(ctx):
+    out = {}
+    for workers in (1, 4):
+        t, res = timed(wm.scan_root, ctx["env"]["LOCALAPPDATA"], -1, 25, 30, workers=workers, repeat=ctx["repeat"])
+        out[f"scan_root_w{workers}"] = {"seconds": t, "dirs": res.stats.dirs_scanned, "files": res.stats.files_scanned}
+    t, res = timed(wm.scan_root, ctx["env"]["LOCALAPPDATA"], -1, 25, 30, levels=4, repeat=ctx["repeat"])
+    out["scan_root_levels4"] = {"seconds": t, "dirs": res.stats.dirs_scanned}
+    return out
+
+
+def bench_globs(ctx):
+    groups = [a.targets for a in ctx["actions"]]
+    t, res = timed(wm.expand_glob_groups, groups, repeat=ctx["repeat"])
+    return {"expand_globs": {"seconds": t, "paths": sum(len(g) for g in res)}}
+
+
+def bench_cleanup(ctx):
+    outdir = ctx["scratch"] / "reports"
+
+    def dry_run():
+        wm._reclaim_cache.clear()
+        return wm.cleanup(ctx["actions"], yes=False, outdir=outdir)
+
+    t, rep = timed(dry_run, repeat=ctx["repeat"])
+    res = {"cleanup_dry_run": {"seconds": t, "reclaimable_files": rep["reclaimable_files"]}}
+
+    # Execute deletes the tree: time it on fresh copies of the profile.
+    best, freed = float("inf"), 0
+    for _ in range(ctx["repeat"]):
+        victim = ctx["scratch"] / "victim"
+        shutil.rmtree(victim, ignore_errors=True)
+        env = make_windows_tree(victim, ctx["scale"])
+        actions = _actions(env)
+        wm._reclaim_cache.clear()
+        t0 = time.perf_counter()
+        rep = wm.cleanup(actions, yes=True, outdir=outdir)
+        best = min(best, time.perf_counter() - t0)
+        freed = rep["freed_files"]
+    shutil.rmtree(ctx["scratch"] / "victim", ignore_errors=True)
+    res["cleanup_execute"] = {"seconds": best, "freed_files": freed}
+    return res
+
+
+def bench_copy(ctx):
+    # What backup-browsers copies (Edge "User Data" without caches), and a whole AppData\Local copy.
+    res = {}
+    for name, src, exclude in (("copy_browser_profile", Path(ctx["env"]["LOCALAPPDATA"]) / "Microsoft" / "Edge" / "User Data",
+                                wm.BROWSER_CACHE_DIRS),
+                               ("copy_appdata_local", Path(ctx["env"]["LOCALAPPDATA"]), frozenset())):
+        def run():
+            dst = ctx["scratch"] / "copy"
+            shutil.rmtree(dst, ignore_errors=True)
+            with wm.CopyEngine(best_effort=True, exclude_dirs=exclude) as engine:
+                engine.copytree(src, dst)
+            return engine.throughput()
+
+        t, tp = timed(run, repeat=ctx["repeat"])
+        res[name] = {"seconds": t, "files": tp["files"], "bytes": tp["bytes"]}
+    shutil.rmtree(ctx["scratch"] / "copy", ignore_errors=True)
+    return res
+
+
+def bench_session_zip(ctx):
+    src = Path(ctx["env"]["APPDATA"])
+    zip_path = ctx["scratch"] / "session.zip"
+    res = {}
+    for workers in (1, 4):
+        t, st = timed(wcs.SessionArchiver(workers=workers).archive, src, zip_path, repeat=ctx["repeat"])
+        res[f"session_zip_w{workers}"] = {"seconds": t, "bytes_out": st["bytes_out"]}
+    zip_path.unlink(missing_ok=True)
+    return res
+
+
+BENCHES = {"scan": bench_scan, "globs": bench_globs, "cleanup": bench_cleanup, "copy": bench_copy,
+           "zip": bench_session_zip}
+
+
+def _actions(env):
+    actions = wm.build_cleanup_actions(include_browser_cache=True, include_nvidia_app=False)
+    for a in actions:
+        a.targets = localize_targets(a.targets, env)
+    return actions
+
+
+def compare(results, baseline, threshold: float, floor: float):
+    """Rows (name, base, now, ratio, flagged) for benchmarks present in both runs."""
+    rows = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = cur["seconds"] / base["seconds"] if base["seconds"] > 0 else float("inf")
+        # Sub-*floor* differences are timer noise, whatever the ratio.
+        flagged = ratio > 1 + threshold and cur["seconds"] - base["seconds"] > floor
+        rows.append((name, base["seconds"], cur["seconds"], ratio, flagged))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser("run_all")
+    ap.add_argument("--only", nargs="+", choices=sorted(BENCHES), default=sorted(BENCHES))
+    ap.add_argument("--scale", type=float, default=1.0, help="Multiplier for file counts of the synthetic profile.")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the best is kept.")
+    ap.add_argument("--out", default=None, help="Results JSON (default: <workdir>/results/run_<stamp>.json).")
+    ap.add_argument("--baseline", default=None, help="Baseline JSON (default: <workdir>/baseline.json).")
+    ap.add_argument("--save-baseline", action="store_true", help="Write this run as the baseline.")
+    ap.add_argument("--threshold", type=float, default=0.2, help="Flag benchmarks slower than baseline by this fraction (default 0.2).")
+    ap.add_argument("--floor", type=float, default=0.05, help="Ignore slowdowns under this many seconds (default 0.05).")
+    args = ap.parse_args()
+
+    work = default_workdir(f"suite_x{args.scale:g}")
+    profile = work / "profile"
+    marker = work / "profile.json"
+    if not marker.exists():
+        print(f"Generating synthetic profile under {profile} ...")
+        shutil.rmtree(profile, ignore_errors=True)
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.write_text(json.dumps(make_windows_tree(profile, args.scale)))
+    env = json.loads(marker.read_text())
+    os.environ.update(env)
+    # cleanup --yes empties the recycle bin through PowerShell; use the Python stand-in off Windows.
+    if os.name != "nt":
+        wm.set_shell_worker(wm.ShellWorker([sys.executable, "-c", wm.PY_WORKER_LOOP]))
+
+    scratch = work / "scratch"
+    shutil.rmtree(scratch, ignore_errors=True)
+    scratch.mkdir(parents=True)
+    ctx = {"env": env, "actions": _actions(env), "scale": args.scale, "repeat": args.repeat, "scratch": scratch}
+
+    results = {}
+    for name in args.only:
+        t0 = time.perf_counter()
+        part = BENCHES[name](ctx)
+        for k, v in part.items():
+            v["seconds"] = round(v["seconds"], 4)
+            print(f"{k:<24} {v['seconds']:9.3f}s  " + "  ".join(f"{kk}={vv}" for kk, vv in v.items() if kk != "seconds"))
+        results.update(part)
+        print(f"  ({name}: {time.perf_counter() - t0:.1f}s incl. setup)")
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    doc = {
+        "meta": {"created_at": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "scale": args.scale, "repeat": args.repeat},
+        "results": results,
+    }
+    out = Path(args.out) if args.out else work / "results" / f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(doc, indent=2))
+    print(f"\nResults: {out}")
+
+    baseline_path = Path(args.baseline) if args.baseline else work / "baseline.json"
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(doc, indent=2))
+        print(f"Baseline saved: {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path} (run with --save-baseline).")
+        return 0
+
+    base = json.loads(baseline_path.read_text())
+    if base["meta"].get("scale") != args.scale:
+        print(f"[warn] baseline was made with --scale {base['meta'].get('scale')}")
+    rows = compare(results, base["results"], args.threshold, args.floor)
+    print(f"\nAgainst baseline {baseline_path} ({base['meta']['created_at']}):")
+    for name, b, c, ratio, flagged in rows:
+        print(f"{name:<24} {b:9.3f}s -> {c:9.3f}s  x{ratio:5.2f}" + ("  REGRESSION" if flagged else ""))
+    bad = [r[0] for r in rows if r[4]]
+    if bad:
+        print(f"\n{len(bad)} regression(s): {', '.join(bad)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+# Tests import the toolkit scripts as modules; they run on Linux (temp folders,
+# os.link), so Windows-only calls are avoided or replaced per test.
+
+import sys
+from pathlib import Path
+
+TOOLKIT = Path(__file__).resolve().parent.parent / "toolkit"
+if str(TOOLKIT) not in sys.path:
+    sys.path.insert(0, str(TOOLKIT))
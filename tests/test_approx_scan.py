@@ -0,0 +1,38 @@
+import win_maintain as wm
+
+
+def _tree(root):
+    # top0 is big and deep, the rest small and flat.
+    d = root / "top0"
+    for i in range(30):
+        d = d / f"d{i}"
+        d.mkdir(parents=True)
+        (d / "f.bin").write_bytes(b"\0" * 10_000)
+    for k in range(1, 6):
+        sub = root / f"top{k}"
+        sub.mkdir()
+        for i in range(3):
+            (sub / f"f{i}.bin").write_bytes(b"\0" * 100 * k)
+    (root / "own.bin").write_bytes(b"\0" * 7)
+
+
+def test_refined_and_fully_listed_folders_are_exact(tmp_path):
+    _tree(tmp_path)
+    exact = dict(wm.scan_root(str(tmp_path), -1, 100, 0).top_dirs_level1)
+    res = wm.approx_scan(str(tmp_path), samples=4, refine=6, seed=1)
+    assert all(f.exact for f in res.folders)
+    assert {f.path: f.bytes for f in res.folders} == {k: v for k, v in exact.items() if k != "own.bin"}
+    assert res.bytes == res.low == res.high == sum(exact.values())
+
+
+def test_ranges_hold_what_was_seen(tmp_path):
+    _tree(tmp_path)
+    exact = dict(wm.scan_root(str(tmp_path), -1, 100, 0).top_dirs_level1)
+    for seed in range(5):
+        res = wm.approx_scan(str(tmp_path), samples=2, refine=0, seed=seed)
+        for f in res.folders:
+            assert f.low <= f.bytes <= f.high
+            assert f.low <= exact[f.path]  # low is at least the bytes seen, never above the size
+            if f.exact:
+                assert f.bytes == exact[f.path]
+        assert res.low <= res.bytes <= res.high
@@ -0,0 +1,63 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import win_maintain as wm
+
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+
+@pytest.fixture
+def profile(tmp_path):
+    src = tmp_path / "src"
+    files = {}
+    for i in range(3):
+        d = src / "Default" / f"Storage{i}"
+        d.mkdir(parents=True)
+        for k in range(4):
+            # Text and random files interleaved by name, as in a real profile folder.
+            if k % 2:
+                data = os.urandom(70_000)
+                name = f"{k:06d}.ldb"
+            else:
+                data = (f"line {k} of folder {i}\n" * 3000).encode()
+                name = f"{k:06d}.log"
+            (d / name).write_bytes(data)
+            files[f"Edge/Default/Storage{i}/{name}"] = data
+    (src / "Default" / "Cache").mkdir()
+    (src / "Default" / "Cache" / "data_0").write_bytes(b"cache")
+    return src, files
+
+
+def test_tar_xz_groups_files_by_stream(tmp_path, profile):
+    src, files = profile
+    w = wm.ArchiveWriter(tmp_path / "b.tar.xz", "tar.xz", exclude_dirs=wm.BROWSER_CACHE_DIRS)
+    errors, stats = w.add_tree(src, "Edge")
+    path = w.close()
+    assert errors == []
+    assert (stats["files"], stats["files_stored"]) == (12, 6)
+    # One preset-6 stream and one fast stream for the tree; the tar end blocks get a last one.
+    assert path.read_bytes().count(XZ_MAGIC) == 3
+    with tarfile.open(path) as tf:
+        names = tf.getnames()
+        assert sorted(names) == sorted(files)
+        assert all(tf.extractfile(n).read() == files[n] for n in names)
+    # Compressible files come first, each group in walk order.
+    assert [n.endswith(".log") for n in names] == [True] * 6 + [False] * 6
+    assert names[:6] == sorted(names[:6])
+
+
+def test_zip_stores_compressed_files(tmp_path, profile):
+    src, files = profile
+    w = wm.ArchiveWriter(tmp_path / "b.zip", "zip", exclude_dirs=wm.BROWSER_CACHE_DIRS)
+    errors, stats = w.add_tree(src, "Edge")
+    path = w.close()
+    assert errors == [] and stats["files_stored"] == 6
+    with zipfile.ZipFile(path) as zf:
+        assert zf.namelist() == sorted(files)
+        for info in zf.infolist():
+            stored = info.filename.endswith(".ldb")
+            assert info.compress_type == (zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+            assert zf.read(info) == files[info.filename]
@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+import win_maintain as wm
+
+
+def _tree(root, dirs=6, files=9):
+    total = 0
+    for i in range(dirs):
+        d = root / f"d{i}" / "sub" / "deeper"
+        d.mkdir(parents=True)
+        for k in range(files):
+            (d / f"f{k}.tmp").write_bytes(b"\0" * (i * 100 + k))
+            total += i * 100 + k
+    return total, dirs * files
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_delete_counts_what_it_frees(tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(wm.DeleteEngine, "BATCH", 5)
+    root = tmp_path / "cache"
+    size, n = _tree(root)
+    with wm.DeleteEngine(workers) as engine:
+        assert engine.delete(root) == (True, "deleted_dir", size, n)
+        assert engine.delete(root) == (True, "not_found", 0, 0)
+    assert not root.exists()
+
+
+def test_links_are_removed_not_followed(tmp_path):
+    keep = tmp_path / "keep"
+    keep.mkdir()
+    (keep / "data.bin").write_bytes(b"\0" * 1000)
+    root = tmp_path / "cache"
+    root.mkdir()
+    (root / "f.tmp").write_bytes(b"\0" * 10)
+    os.symlink(keep, root / "dir_link", target_is_directory=True)
+    os.symlink(keep / "data.bin", root / "file_link")
+    with wm.DeleteEngine(2) as engine:
+        assert engine.delete(root) == (True, "deleted_dir", 10, 1)
+        assert engine.delete(keep / "data.bin") == (True, "deleted_file", 1000, 1)
+        assert engine.delete(root) == (True, "not_found", 0, 0)
+    assert keep.is_dir()
+
+
+def test_locked_file_does_not_stop_the_folder(tmp_path, monkeypatch):
+    root = tmp_path / "cache"
+    size, n = _tree(root)
+    locked = root / "d2" / "sub" / "deeper" / "f3.tmp"
+    unlink = os.unlink
+
+    def fake_unlink(path, *a, **kw):
+        if os.fspath(path) == str(locked):
+            raise PermissionError(13, "in use", str(locked))
+        return unlink(path, *a, **kw)
+
+    monkeypatch.setattr(os, "unlink", fake_unlink)
+    with wm.DeleteEngine(4) as engine:
+        ok, result, freed, files = engine.delete(root)
+    assert not ok and result.startswith("permission_denied")
+    assert (freed, files) == (size - 203, n - 1)
+    assert locked.exists()
+    assert sorted(p.name for p in root.iterdir()) == ["d2"]
+
+
+def test_cleanup_yes_reports_freed(tmp_path, monkeypatch):
+    monkeypatch.setattr(wm, "is_admin", lambda: True)
+    wm.set_shell_worker(wm.ShellWorker([sys.executable, "-c", wm.PY_WORKER_LOOP]))
+    root = tmp_path / "cache"
+    size, n = _tree(root)
+    (tmp_path / "old.log").write_bytes(b"\0" * 77)
+    actions = [wm.CleanupAction("t", "test", [str(root), str(tmp_path / "old.log"), str(tmp_path / "missing")])]
+    report = wm.cleanup(actions, yes=True, outdir=tmp_path / "out", workers=4)
+    items = report["actions"][0]["items"]
+    assert [i["result"] for i in items] == ["deleted_dir", "deleted_file", "not_found"]
+    assert (report["freed_bytes"], report["freed_files"]) == (size + 77, n + 1)
+    assert not root.exists()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import win_collect_session as wcs
+import win_maintain as wm
+
+TOOLKIT = Path(wcs.__file__).resolve().parent
+
+
+def _slow_tree(root, files=40):
+    root.mkdir()
+    for i in range(files):
+        (root / f"f{i:03d}.txt").write_text("x" * 100)
+    return root
+
+
+def test_timed_out_collector_is_stopped_before_return(tmp_path):
+    src = _slow_tree(tmp_path / "src")
+    session = tmp_path / "session"
+    session.mkdir()
+    cancel = threading.Event()
+    with wm.CopyEngine(workers=1, cancel=cancel) as engine:
+        def slow_copy(s, t, rel):
+            time.sleep(0.05)
+            engine.copy_file(s, t)
+
+        collectors = [
+            wcs.Collector("slow", lambda d, t: engine.copytree(src, d / "slow", copy=slow_copy), timeout=0.3),
+            wcs.Collector("quick", lambda d, t: (d / "quick.txt").write_text("ok"), timeout=5.0),
+        ]
+        results = wcs.run_collectors(collectors, session, cancel=cancel)
+        copied = sorted(p.name for p in (session / "slow").iterdir())
+        time.sleep(0.3)
+        assert sorted(p.name for p in (session / "slow").iterdir()) == copied
+    assert results["slow"]["status"] == "timeout"
+    assert results["quick"]["status"] == "ok"
+    assert 0 < len(copied) < 40
+    assert cancel.is_set()
+
+
+def test_collect_session_with_timeouts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("APPDATA", str(tmp_path / "appdata"))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path / "home"))
+    commands = {
+        "systeminfo": [sys.executable, "-c", "print('Host Name: test')"],
+        "installed_programs": [sys.executable, "-c", "import time; time.sleep(30)"],
+    }
+    manifest = wcs.collect_session(str(tmp_path / "dest"), zip_output=True, commands=commands,
+                                   timeouts={"installed_programs": 0.5})
+    status = {k: v["status"] for k, v in manifest["collectors"].items()}
+    assert status["installed_programs"] == "timeout"
+    assert status["systeminfo"] == "ok"
+    with zipfile.ZipFile(manifest["zip"]) as zf:
+        names = set(zf.namelist())
+        assert "systeminfo.txt" in names and "manifest.json" in names
+        assert zf.read("systeminfo.txt").decode().strip() == "Host Name: test"
+
+
+def test_cancelled_copytree_raises(tmp_path):
+    src = _slow_tree(tmp_path / "src", 5)
+    cancel = threading.Event()
+    cancel.set()
+    with wm.CopyEngine(cancel=cancel) as engine:
+        with pytest.raises(wm.CopyCancelled):
+            engine.copytree(src, tmp_path / "dst")
+    assert engine.files == 0
+
+
+def _run_script(folder, cwd):
+    return subprocess.run([sys.executable, str(folder / "win_collect_session.py"), "--help"], cwd=cwd,
+                          capture_output=True, text=True, timeout=60)
+
+
+def test_script_runs_from_its_folder(tmp_path):
+    # The shipped layout: both scripts side by side, started from another folder.
+    folder = tmp_path / "toolkit"
+    folder.mkdir()
+    for name in ("win_collect_session.py", "win_maintain.py"):
+        shutil.copy(TOOLKIT / name, folder / name)
+    p = _run_script(folder, tmp_path)
+    assert "win_maintain.py" not in p.stderr
+    if os.name == "nt":
+        assert p.returncode == 0 and "--dest" in p.stdout
+    else:
+        assert "This tool is for Windows." in p.stdout  # past the imports, stopped by main()
+
+
+def test_script_without_win_maintain_says_so(tmp_path):
+    shutil.copy(TOOLKIT / "win_collect_session.py", tmp_path)
+    p = _run_script(tmp_path, tmp_path)
+    assert p.returncode == 1
+    assert "needs win_maintain.py in the same folder" in p.stderr
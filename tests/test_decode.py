@@ -0,0 +1,36 @@
+import pytest
+
+import win_maintain as wm
+
+TEXT = "Имя образа  PID  Сеанс: Console  Память: 1234 КБ  Состояние: Выполняется\r\n" * 50
+
+
+@pytest.mark.parametrize("enc", ["cp866", "cp1251", "utf-8", "utf-8-sig"])
+def test_decode_best_effort_picks_codec(enc):
+    assert wm.decode_best_effort(TEXT.encode(enc)) == TEXT
+
+
+@pytest.mark.parametrize("enc", ["cp866", "cp1251", "utf-8"])
+def test_long_ascii_prefix(enc):
+    # The codec sample starts at the first non-ASCII byte, not at the start of the buffer.
+    text = "x" * 70_000 + "\r\nПривет\r\n"
+    data = text.encode(enc)
+    assert wm.decode_best_effort(data) == text
+    dec = wm._StreamDecoder()
+    for i in range(0, len(data), 4096):
+        dec.feed(data[i:i + 4096])
+    dec.feed(b"", final=True)
+    assert dec.text() == text
+
+
+def test_mixed_buffer_falls_back_to_a_strict_codec():
+    # Valid UTF-8 in the sample, a cp1251 byte past it: no replacement characters.
+    data = "Привет ".encode() * 10_000 + "ok".encode("cp1251") + b"\x98"
+    out = wm.decode_best_effort(data)
+    assert "�" not in out
+    assert len(out) == len(data)
+
+
+def test_ascii_and_empty():
+    assert wm.decode_best_effort(b"") == ""
+    assert wm.decode_best_effort(b"plain\r\n") == "plain\r\n"
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+import win_maintain as wm
+
+SIZE = 100_000
+
+
+def _file(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\1" * size)
+    return path
+
+
+def _scan(root, workers, **kw):
+    return wm.scan_root(str(root), -1, top_dirs=10, top_files=10, workers=workers, dedupe_links=True, **kw)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_links_in_one_folder(tmp_path, workers):
+    src = _file(tmp_path / "d" / "orig.bin", SIZE)
+    os.link(src, tmp_path / "d" / "link1.bin")
+    os.link(src, tmp_path / "d" / "link2.bin")
+    _file(tmp_path / "d" / "small.txt", 10)
+    st = _scan(tmp_path, workers).stats
+    assert st.bytes_total == 3 * SIZE + 10
+    assert st.bytes_unique == SIZE + 10
+    assert st.hardlinks == 3
+    assert st.hardlinks_deduped == 2
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_links_across_folders(tmp_path, workers):
+    src = _file(tmp_path / "a" / "x" / "orig.bin", SIZE)
+    for i, sub in enumerate(("b", "c/deep/er", "a/y")):
+        (tmp_path / sub).mkdir(parents=True)
+        os.link(src, tmp_path / sub / f"link{i}.bin")
+    _file(tmp_path / "c" / "own.bin", 500)
+    res = _scan(tmp_path, workers)
+    assert res.stats.bytes_total == 4 * SIZE + 500
+    assert res.stats.bytes_unique == SIZE + 500
+    assert res.stats.hardlinks_deduped == 3
+    # Level totals stay apparent sizes.
+    assert dict(res.top_dirs_level1) == {"a": 2 * SIZE, "b": SIZE, "c": SIZE + 500}
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_without_flag_links_count_in_full(tmp_path, workers):
+    src = _file(tmp_path / "a" / "orig.bin", SIZE)
+    (tmp_path / "b").mkdir()
+    os.link(src, tmp_path / "b" / "link.bin")
+    st = wm.scan_root(str(tmp_path), -1, 10, 10, workers=workers).stats
+    assert st.bytes_total == 2 * SIZE
+    assert st.bytes_unique == 2 * SIZE
+    assert st.hardlinks == 0
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_nested_roots(tmp_path, workers):
+    # outer/inner is scanned as a root of its own and as part of outer.
+    outer = tmp_path / "outer"
+    inner = outer / "inner"
+    src = _file(inner / "orig.bin", SIZE)
+    os.link(src, inner / "link_inner.bin")
+    _file(outer / "other" / "keep.bin", 20)
+    os.link(src, outer / "other" / "link_outer.bin")
+    results, rollup = wm.scan_roots([str(outer), str(inner)], -1, 10, 10, workers=workers, dedupe_links=True)
+    outer_st, inner_st = results[0].stats, results[1].stats
+    assert (inner_st.bytes_total, inner_st.bytes_unique) == (2 * SIZE, SIZE)
+    assert (outer_st.bytes_total, outer_st.bytes_unique) == (3 * SIZE + 20, SIZE + 20)
+    assert results[0].nested_roots == [str(inner)]
+    # The rollup counts inner once (it sits inside outer).
+    assert (rollup["bytes_total"], rollup["bytes_unique"]) == (3 * SIZE + 20, SIZE + 20)
+
+
+def test_workers_agree(tmp_path):
+    src = _file(tmp_path / "a" / "orig.bin", SIZE)
+    for i in range(40):
+        d = tmp_path / f"d{i % 7}" / f"s{i}"
+        d.mkdir(parents=True)
+        os.link(src, d / "link.bin")
+        _file(d / "own.bin", i)
+    one, many = _scan(tmp_path, 1).stats, _scan(tmp_path, 4).stats
+    assert (one.bytes_total, one.bytes_unique) == (many.bytes_total, many.bytes_unique)
+    assert one.bytes_unique == SIZE + sum(range(40))
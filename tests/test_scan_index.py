@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+
+import pytest
+
+import win_maintain as wm
+
+OLD_NS = 1_000_000_000 * 1_600_000_000  # far enough back for ScanIndex.RACY_NS
+
+
+def _make_tree(root):
+    for name, files in (("a", {"x.log": 1000, "y.bin": 200}), ("b", {"z.bin": 50})):
+        d = root / name / "sub"
+        d.mkdir(parents=True)
+        for fname, size in files.items():
+            (d / fname).write_bytes(b"\0" * size)
+    _age(root)
+
+
+def _age(root):
+    # Back-date every mtime so index rows are trusted on the next scan.
+    for dirpath, dirnames, filenames in os.walk(root):
+        for n in dirnames + filenames:
+            os.utime(os.path.join(dirpath, n), ns=(OLD_NS, OLD_NS))
+    os.utime(root, ns=(OLD_NS, OLD_NS))
+
+
+def _scan(root, index):
+    res = wm.scan_root(str(root), -1, top_dirs=10, top_files=10, index=index)
+    index.commit()
+    return res
+
+
+def _totals(res):
+    return res.stats.bytes_total, dict(res.top_dirs_level1), sorted(res.top_files)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    _make_tree(root)
+    return root
+
+
+def test_unchanged_folders_are_reused(tree, tmp_path):
+    index = wm.ScanIndex(tmp_path / "out" / wm.SCAN_INDEX_NAME)
+    first = _scan(tree, index)
+    second = _scan(tree, index)
+    assert first.stats.dirs_reused == 0
+    assert second.stats.dirs_reused == second.stats.dirs_scanned == 5
+    assert _totals(second) == _totals(first)
+    index.close()
+
+
+def test_added_file_is_counted(tree, tmp_path):
+    index = wm.ScanIndex(tmp_path / "out" / wm.SCAN_INDEX_NAME)
+    _scan(tree, index)
+    (tree / "b" / "sub" / "new.bin").write_bytes(b"\0" * 4000)
+    res = _scan(tree, index)
+    assert _totals(res) == _totals(wm.scan_root(str(tree), -1, 10, 10))
+    assert dict(res.top_dirs_level1)["b"] == 4050
+    index.close()
+
+
+def test_removed_file_and_folder_are_dropped(tree, tmp_path):
+    index = wm.ScanIndex(tmp_path / "out" / wm.SCAN_INDEX_NAME)
+    _scan(tree, index)
+    (tree / "a" / "sub" / "x.log").unlink()
+    (tree / "b" / "sub" / "z.bin").unlink()
+    (tree / "b" / "sub").rmdir()
+    res = _scan(tree, index)
+    assert _totals(res) == _totals(wm.scan_root(str(tree), -1, 10, 10))
+    assert dict(res.top_dirs_level1) == {"a": 200}
+    assert res.stats.bytes_total == 200
+    index.close()
+
+
+def _scan_args(root, outdir, **kw):
+    args = dict(roots=[str(root)], outdir=str(outdir), depth=-1, top=10, files=10, workers=1, levels=0,
+                dedupe_links=False, stream=False, progress_interval=1.0, incremental=False, full=False,
+                report=["json"], snapshot=False, budget=None, max_dirs_per_sec=None, max_stats_per_sec=None,
+                low_priority=False, background=False, approx=False, profile=False)
+    args.update(kw)
+    return argparse.Namespace(**args)
+
+
+def _cmd_scan(root, outdir, **kw):
+    wm.cmd_scan(_scan_args(root, outdir, **kw))
+    reports = sorted(outdir.glob("scan_report_*.json"))
+    res = json.loads(reports[-1].read_text(encoding="utf-8"))["results"][0]
+    for p in outdir.glob("scan_report_*"):
+        p.unlink()
+    return res
+
+
+def test_plain_scan_sees_file_resized_in_place(tree, tmp_path, capsys):
+    out = tmp_path / "out"
+    before = _cmd_scan(tree, out)
+    log = tree / "a" / "sub" / "x.log"
+    with open(log, "r+b") as f:
+        f.truncate(1_000_000)
+    _age(tree)  # the folder mtime does not move on an in-place resize
+    after = _cmd_scan(tree, out)
+    assert dict(before["top_dirs_level1"])["a"] == 1200
+    assert dict(after["top_dirs_level1"])["a"] == 1_000_200
+    assert [str(log), 1_000_000] in after["top_files"]
+    assert not (out / wm.SCAN_INDEX_NAME).exists()
+
+
+def test_incremental_scan_full_rereads_resized_file(tree, tmp_path, capsys):
+    out = tmp_path / "out"
+    _cmd_scan(tree, out, incremental=True)
+    assert (out / wm.SCAN_INDEX_NAME).exists()
+    with open(tree / "a" / "sub" / "x.log", "r+b") as f:
+        f.truncate(1_000_000)
+    _age(tree)
+    res = _cmd_scan(tree, out, incremental=True, full=True)
+    assert res["stats"]["dirs_reused"] == 0
+    assert dict(res["top_dirs_level1"])["a"] == 1_000_200
@@ -0,0 +1,96 @@
+import argparse
+import json
+import threading
+
+import pytest
+
+import win_maintain as wm
+
+
+def _tree(root, dirs, size):
+    for i in range(dirs):
+        d = root / f"d{i}"
+        d.mkdir(parents=True)
+        (d / "f.bin").write_bytes(b"\0" * size)
+    return root
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "sqlite"])
+def test_finished_root_is_readable_while_the_scan_runs(tmp_path, fmt):
+    fast = _tree(tmp_path / "fast", 2, 100)
+    slow = _tree(tmp_path / "slow", 20, 10)
+    cls = wm.REPORT_WRITERS[fmt]
+    w = cls((tmp_path / "report").with_suffix(cls.suffix))
+    w.write("meta", {"roots": [str(fast), str(slow)]})
+    release = threading.Event()
+    seen = []
+
+    def on_progress(ev):
+        # Hold the slow walk until the fast root has been read back.
+        if ev.root == str(slow) and not ev.done:
+            assert release.wait(10)
+
+    def on_result(res):
+        w.write_result(res)
+        if res.stats.root == str(fast):
+            seen.extend(wm.iter_report(w.path))
+            release.set()
+
+    results, rollup = wm.scan_roots([str(fast), str(slow)], -1, 10, 10, levels=2, interval=0,
+                                    on_progress=on_progress, on_result=on_result)
+    w.write("rollup", rollup)
+    w.close()
+
+    stats = [r for r in seen if r["kind"] == "stats"]
+    assert [r["root"] for r in stats] == [str(fast)]
+    assert stats[0]["bytes_total"] == 200
+    assert {r["path"] for r in seen if r["kind"] == "top_dir" and r["level"] == 1} == {"d0", "d1"}
+    assert {r["path"] for r in seen if r["kind"] == "dir"} == {"", "d0", "d1"}
+    assert release.is_set()
+    final = list(wm.iter_report(w.path))
+    assert [r["root"] for r in final if r["kind"] == "stats"] == [str(fast), str(slow)]
+    assert [r["bytes_total"] for r in final if r["kind"] == "rollup"] == [400]
+
+
+def test_container_waits_for_its_nested_root(tmp_path):
+    outer = _tree(tmp_path / "outer", 3, 10)
+    inner = _tree(outer / "d0" / "inner", 2, 5)
+    release = threading.Event()
+    order, held = [], []
+
+    def on_progress(ev):
+        if ev.root == str(inner) and not ev.done:
+            assert release.wait(10)
+
+    def let_go():
+        # The outer walk has long finished; its result still waits for inner.
+        held.append(list(order))
+        release.set()
+
+    timer = threading.Timer(0.5, let_go)
+    timer.start()
+    results, _ = wm.scan_roots([str(outer), str(inner)], -1, 10, 10, interval=0, on_progress=on_progress,
+                               on_result=lambda res: order.append(res.stats.root))
+    timer.cancel()
+    assert held == [[]]
+    assert sorted(order) == [str(outer), str(inner)]
+    assert [r.stats.root for r in results] == [str(outer), str(inner)]
+    assert results[0].stats.bytes_total == 40
+
+
+def test_json_report_keeps_its_layout(tmp_path, capsys):
+    a, b = _tree(tmp_path / "a", 3, 10), _tree(tmp_path / "b", 1, 7)
+    out = tmp_path / "out"
+    wm.cmd_scan(argparse.Namespace(
+        roots=[str(a), str(b)], outdir=str(out), depth=-1, top=10, files=10, workers=1, levels=3,
+        dedupe_links=False, stream=False, progress_interval=1.0, incremental=False, full=False,
+        report=["json"], snapshot=False, budget=None, max_dirs_per_sec=None, max_stats_per_sec=None,
+        low_priority=False, background=False, approx=False, profile=False))
+    text = next(out.glob("scan_report_*.json")).read_text(encoding="utf-8")
+    data = json.loads(text)
+    assert text == json.dumps(data, ensure_ascii=False, indent=2)
+    assert sorted(r["stats"]["root"] for r in data["results"]) == [str(a), str(b)]
+    assert data["rollup"]["bytes_total"] == 37
+    topdirs = next(out.glob("scan_report_*_topdirs.csv")).read_text(encoding="utf-8-sig").splitlines()
+    assert topdirs[0] == "root;level;path;bytes;gb"
+    assert len(topdirs) == 1 + 4 + 4  # level 1 rows and the --levels 3 rows (level 1 again) of 4 folders
@@ -0,0 +1,45 @@
+import argparse
+import json
+import sqlite3
+
+import win_maintain as wm
+
+
+def _tree(root):
+    for rel, size in (("a/x/deep", 100), ("a/y", 20), ("b", 5)):
+        d = root / rel
+        d.mkdir(parents=True)
+        (d / "f.bin").write_bytes(b"\0" * size)
+    return root
+
+
+def _cmd_scan(root, out, **kw):
+    args = dict(roots=[str(root)], outdir=str(out), depth=-1, top=10, files=10, workers=1, levels=0,
+                dedupe_links=False, stream=False, progress_interval=1.0, incremental=False, full=False,
+                report=["json", "jsonl"], snapshot=True, budget=None, max_dirs_per_sec=None,
+                max_stats_per_sec=None, low_priority=False, background=False, approx=False, profile=False)
+    args.update(kw)
+    wm.cmd_scan(argparse.Namespace(**args))
+    result = json.loads(next(out.glob("scan_report_*.json")).read_text(encoding="utf-8"))["results"][0]
+    kinds = [r["kind"] for r in wm.iter_report(next(out.glob("scan_report_*.jsonl")))]
+    with sqlite3.connect(str(wm.list_snapshots(out)[-1])) as db:
+        paths = sorted(p for p, in db.execute("SELECT path FROM dirs"))
+    return result, kinds, paths
+
+
+def test_snapshot_keeps_every_folder_without_levels(tmp_path, capsys):
+    root = _tree(tmp_path / "root")
+    result, kinds, paths = _cmd_scan(root, tmp_path / "out")
+    assert paths == sorted(["", "a", "a/x", "a/x/deep", "a/y", "b"])
+    # The reports are those of a plain scan: no level lists, no tree records.
+    assert result["top_dirs_by_level"] == {}
+    assert dict(result["top_dirs_level1"]) == {"a": 120, "b": 5}
+    assert "dir" not in kinds
+
+
+def test_snapshot_with_levels(tmp_path, capsys):
+    root = _tree(tmp_path / "root")
+    result, kinds, paths = _cmd_scan(root, tmp_path / "out", levels=2)
+    assert len(paths) == 6
+    assert sorted(result["top_dirs_by_level"]) == ["1", "2"]
+    assert kinds.count("dir") == 6
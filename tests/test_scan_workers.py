@@ -0,0 +1,58 @@
+import random
+from dataclasses import asdict
+
+import pytest
+
+import win_maintain as wm
+
+
+@pytest.fixture(scope="module")
+def tree(tmp_path_factory):
+    # ~400 folders up to 6 levels deep, with many equal file sizes so the top
+    # lists have to break ties the same way whatever the walk order.
+    root = tmp_path_factory.mktemp("tree")
+    rng = random.Random(7)
+    dirs = [root]
+    for i in range(400):
+        parent = rng.choice(dirs[-40:]) if i % 3 else rng.choice(dirs)
+        d = parent / f"d{i:03d}"
+        d.mkdir()
+        dirs.append(d)
+        for k in range(rng.randint(0, 6)):
+            (d / f"f{k}.bin").write_bytes(b"\0" * rng.choice([0, 10, 10, 500, 4096, 4096, 70_000]))
+    return root
+
+
+def _tree_rows(res):
+    return sorted((r["path"], r["level"], r["bytes"], r["files"], r["dirs"])
+                  for r in wm._tree_records(res.stats.root, res.tree))
+
+
+def _same(a, b):
+    skip = {"elapsed_sec", "profile"}
+    assert {k: v for k, v in asdict(a.stats).items() if k not in skip} == \
+           {k: v for k, v in asdict(b.stats).items() if k not in skip}
+    assert a.top_dirs_level1 == b.top_dirs_level1
+    assert a.top_dirs_level2 == b.top_dirs_level2
+    assert a.top_dirs_by_level == b.top_dirs_by_level
+    assert a.top_files == b.top_files
+    assert _tree_rows(a) == _tree_rows(b)
+
+
+@pytest.mark.parametrize("depth", [-1, 3])
+@pytest.mark.parametrize("top", [5, 1000])
+def test_workers_give_the_same_result(tree, depth, top):
+    one = wm.scan_root(str(tree), depth, top, top, workers=1, levels=6)
+    four = wm.scan_root(str(tree), depth, top, top, workers=4, levels=6)
+    assert one.stats.dirs_scanned > (400 if depth < 0 else 20)
+    _same(one, four)
+
+
+def test_workers_give_the_same_result_for_nested_roots(tree):
+    inner = sorted(p for p in tree.iterdir() if p.is_dir())[0]
+    runs = [wm.scan_roots([str(tree), str(inner)], -1, 10, 10, workers=w, levels=4) for w in (1, 4)]
+    (res1, roll1), (res4, roll4) = runs
+    for a, b in zip(res1, res4):
+        _same(a, b)
+    assert {k: v for k, v in roll1.items() if k != "elapsed_sec"} == \
+           {k: v for k, v in roll4.items() if k != "elapsed_sec"}
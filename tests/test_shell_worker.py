@@ -0,0 +1,51 @@
+import sys
+
+import pytest
+
+import win_maintain as wm
+
+
+@pytest.fixture
+def worker():
+    w = wm.ShellWorker([sys.executable, "-c", wm.PY_WORKER_LOOP], timeout=10)
+    yield w
+    w.close()
+
+
+def test_exit_code_and_output(worker):
+    assert worker.run("echo out; echo err >&2; exit 3") == (3, "out", "err")
+    assert worker.run("echo warn >&2") == (0, "", "warn")
+    assert worker.run("printf 'a\\nb\\n'") == (0, "a\nb", "")
+    assert (worker.starts, worker.calls) == (1, 3)
+
+
+def test_non_ascii(worker):
+    code, out, err = worker.run("printf 'Привет, мир\\n'; printf 'Ошибка' >&2")
+    assert (code, out, err) == (0, "Привет, мир", "Ошибка")
+    assert worker.run("echo 'Сеанс: Console'") == (0, "Сеанс: Console", "")
+
+
+def test_restart_after_timeout(worker):
+    code, out, err = worker.run("sleep 5", timeout=0.3)
+    assert code == -1 and "timed out" in err
+    assert worker.run("echo again") == (0, "again", "")
+    assert worker.starts == 2
+
+
+def test_restart_after_worker_killed(worker):
+    assert worker.run("echo first") == (0, "first", "")
+    worker._proc.kill()
+    worker._proc.wait()
+    assert worker.run("echo second") == (0, "second", "")
+    # The worker dies in the middle of a call: the call fails, the next one starts a new worker.
+    code, out, err = worker.run("kill -9 $PPID; sleep 5")
+    assert code == -1 and "exited" in err
+    assert worker.run("echo third") == (0, "third", "")
+    assert worker.starts == 3
+
+
+def test_close_and_reuse(worker):
+    assert worker.run("echo x")[0] == 0
+    worker.close()
+    assert worker.run("echo y") == (0, "y", "")
+    assert worker.starts == 2
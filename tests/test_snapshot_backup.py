@@ -0,0 +1,115 @@
+import json
+import os
+
+import pytest
+
+import win_maintain as wm
+
+
+def _write(path, data, mtime_ns=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def profile(tmp_path):
+    src = tmp_path / "src"
+    _write(src / "Default" / "Bookmarks", b"bookmarks" * 100)
+    _write(src / "Default" / "History", b"history" * 1000)
+    _write(src / "Local State", b"{}")
+    _write(src / "Default" / "Cache" / "data_0", b"cache")
+    return src
+
+
+def _snapshot(tmp_path, src, name, prev=None, hash_files=False):
+    out = tmp_path / "dest" / name
+    out.mkdir(parents=True)
+    with wm.CopyEngine(exclude_dirs=wm.BROWSER_CACHE_DIRS) as engine:
+        copier = wm.SnapshotCopier(out, engine, prev_dir=prev, hash_files=hash_files)
+        assert copier.copytree(src, "Edge") == []
+    copier.save_manifest()
+    return out, copier.totals()
+
+
+def test_first_snapshot_copies_everything(tmp_path, profile):
+    snap, totals = _snapshot(tmp_path, profile, "browsers_backup_1")
+    assert totals["files_copied"] == 3
+    assert totals["files_linked"] == 0
+    assert totals["bytes_copied"] == 900 + 7000 + 2
+    files = wm.load_manifest(snap)
+    assert sorted(files) == ["Edge/Default/Bookmarks", "Edge/Default/History", "Edge/Local State"]
+    assert files["Edge/Default/History"][0] == 7000
+    assert (snap / "Edge" / "Default" / "History").read_bytes() == b"history" * 1000
+    assert not (snap / "Edge" / "Default" / "Cache").exists()
+
+
+def test_second_snapshot_links_unchanged_and_copies_changed(tmp_path, profile):
+    first, _ = _snapshot(tmp_path, profile, "browsers_backup_1")
+    _write(profile / "Default" / "History", b"HISTORY" * 1001)
+    second, totals = _snapshot(tmp_path, profile, "browsers_backup_2", prev=first)
+    assert (totals["files_copied"], totals["files_linked"]) == (1, 2)
+    assert totals["bytes_linked"] == 900 + 2
+    assert totals["bytes_copied"] == 7007
+
+    for rel in ("Default/Bookmarks", "Local State"):
+        old, new = os.stat(first / "Edge" / rel), os.stat(second / "Edge" / rel)
+        assert new.st_nlink == 2
+        assert (old.st_dev, old.st_ino) == (new.st_dev, new.st_ino)
+    hist = second / "Edge" / "Default" / "History"
+    assert os.stat(hist).st_nlink == 1
+    assert hist.read_bytes() == b"HISTORY" * 1001
+    assert (first / "Edge" / "Default" / "History").read_bytes() == b"history" * 1000
+
+
+@pytest.mark.parametrize("hash_files, linked", [(True, 3), (False, 2)])
+def test_hash_links_touched_but_unchanged_file(tmp_path, profile, hash_files, linked):
+    first, _ = _snapshot(tmp_path, profile, "browsers_backup_1", hash_files=hash_files)
+    bookmarks = profile / "Default" / "Bookmarks"
+    st = os.stat(bookmarks)
+    os.utime(bookmarks, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+    second, totals = _snapshot(tmp_path, profile, "browsers_backup_2", prev=first, hash_files=hash_files)
+    assert totals["files_linked"] == linked
+    assert os.stat(second / "Edge" / "Default" / "Bookmarks").st_nlink == (2 if hash_files else 1)
+    entry = wm.load_manifest(second)["Edge/Default/Bookmarks"]
+    # The manifest keeps the new mtime, so the next snapshot links on size + mtime alone.
+    assert entry[1] == os.stat(bookmarks).st_mtime_ns
+    assert (entry[2] is not None) == hash_files
+
+
+def test_load_manifest_and_latest_snapshot(tmp_path, profile):
+    dest = tmp_path / "dest"
+    assert wm.latest_snapshot(tmp_path, "browsers_backup_") is None
+    _snapshot(tmp_path, profile, "browsers_backup_20240101_000000")
+    newest, _ = _snapshot(tmp_path, profile, "browsers_backup_20240102_000000")
+    (dest / "browsers_backup_20240103_000000").mkdir()  # unfinished: no manifest
+    assert wm.latest_snapshot(dest, "browsers_backup_") == newest
+    assert wm.load_manifest(dest / "browsers_backup_20240103_000000") == {}
+    (newest / wm.BACKUP_MANIFEST).write_text("{broken", encoding="utf-8")
+    assert wm.load_manifest(newest) == {}
+
+
+def test_backup_report_counts_copied_and_linked_bytes(tmp_path, profile, monkeypatch):
+    local = tmp_path / "local"
+    edge = local / "Microsoft" / "Edge" / "User Data"
+    edge.parent.mkdir(parents=True)
+    profile.rename(edge)
+    monkeypatch.setenv("LOCALAPPDATA", str(local))
+    monkeypatch.setenv("APPDATA", str(tmp_path / "roaming"))
+    monkeypatch.setattr(wm, "run_cmd", lambda *a, **k: (0, "", ""))  # no tasklist: no browsers running
+    dest = tmp_path / "backups"
+
+    first = wm.backup_browsers(str(dest), incremental=True)
+    # Stamps have one-second resolution: move the first backup back in time.
+    older = dest / "browsers_backup_20000101_000000"
+    os.rename(first["saved_to"], older)
+    _write(edge / "Local State", b'{"changed": 1}')
+    second = wm.backup_browsers(str(dest), incremental=True)
+
+    report = json.loads((dest / os.path.basename(second["saved_to"]) / "backup_report.json").read_text(encoding="utf-8"))
+    assert report["previous"] == str(older)
+    assert (first["bytes_copied"], first["bytes_linked"]) == (7902, 0)
+    assert (report["bytes_copied"], report["bytes_linked"]) == (14, 7900)
+    assert (report["files_copied"], report["files_linked"]) == (1, 2)
+    assert [i["status"] for i in report["items"]] == ["ok", "not_found", "not_found", "not_found"]
@@ -13,46 +13,50 @@
 # - This tool files (if run from the pack folder)
 #
 # Optional: you can add your own files into the created session folder before zipping.
+#
+# Needs win_maintain.py in the same folder (copy engine, command runner): the toolkit folder,
+# the portable zip and payload.zip ship both, and the session pack copies both.
 
 from __future__ import annotations
 
 import argparse
+import functools
+import hashlib
 import json
 import os
 import shutil
+import sqlite3
+import struct
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import List, Tuple
-
-
-def decode_best_effort(b: bytes) -> str:
-    if b is None:
-        return ""
-    for enc in ("utf-8", "utf-8-sig", "cp866", "cp1251", "mbcs"):
-        try:
-            return b.decode(enc)
-        except Exception:
-            continue
-    return b.decode("utf-8", errors="replace")
-
+from typing import Callable, Dict, List, Optional, Tuple
 
-def run_cmd(cmd: List[str]) -> Tuple[int, str, str]:
-    p = subprocess.run(cmd, capture_output=True)
-    out = decode_best_effort(p.stdout).strip()
-    err = decode_best_effort(p.stderr).strip()
-    return p.returncode, out, err
+try:
+    from win_maintain import CopyCancelled, CopyEngine, looks_compressed, run_cmd
+except ImportError as e:  # the script was copied without its sibling
+    sys.exit(f"win_collect_session.py needs win_maintain.py in the same folder: {e}")
 
 
-def copy_if_exists(src: Path, dst: Path):
+def copy_if_exists(src: Path, dst: Path, engine: Optional[CopyEngine] = None):
     if not src.exists():
         return False
     dst.parent.mkdir(parents=True, exist_ok=True)
+    if engine is None:
+        with CopyEngine() as own:
+            return copy_if_exists(src, dst, own)
     if src.is_dir():
-        shutil.copytree(src, dst, dirs_exist_ok=True)
+        engine.copytree(src, dst)
     else:
-        shutil.copy2(src, dst)
+        engine.copy_file(str(src), str(dst))
     return True
 
 
@@ -64,8 +68,7 @@ def find_ps_history_candidates() -> List[Path]:
     ]
 
 
-def export_installed_programs(out_file: Path):
-    ps = r'''
+INSTALLED_PROGRAMS_PS = r'''
 $ErrorActionPreference = "SilentlyContinue"
 $k1 = "HKLM:\Software\Microsoft\Windows\CurrentVersion\Uninstall\*"
 $k2 = "HKLM:\Software\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall\*"
@@ -86,68 +89,388 @@ foreach ($k in @($k1,$k2,$k3)) {
 }
 $apps | Sort-Object Name -Unique | ConvertTo-Json -Depth 4
 '''
-    code, out, err = run_cmd(["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", ps])
+
+# External commands of the collectors; pass other argv lists to collect_session() to replace them (e.g. on Linux).
+DEFAULT_COMMANDS: Dict[str, List[str]] = {
+    "systeminfo": ["cmd", "/c", "systeminfo"],
+    "installed_programs": ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", INSTALLED_PROGRAMS_PS],
+}
+
+
+def export_installed_programs(out_file: Path, cmd: Optional[List[str]] = None, timeout: Optional[float] = None):
+    code, out, err = run_cmd(cmd or DEFAULT_COMMANDS["installed_programs"], timeout=timeout)
     out_file.write_text(out if out else json.dumps({"error": err, "code": code}, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
-def export_system_summary(out_file: Path):
-    code, out, err = run_cmd(["cmd", "/c", "systeminfo"])
+def export_system_summary(out_file: Path, cmd: Optional[List[str]] = None, timeout: Optional[float] = None):
+    code, out, err = run_cmd(cmd or DEFAULT_COMMANDS["systeminfo"], timeout=timeout)
     out_file.write_text(out if out else f"error: {err}", encoding="utf-8")
 
 
-def main():
-    if os.name != "nt":
-        print("This tool is for Windows.")
-        sys.exit(1)
-
-    ap = argparse.ArgumentParser("win_collect_session")
-    ap.add_argument("--dest", default=r"D:\Backups\WinSession", help="Where to place the session folder.")
-    ap.add_argument("--zip", action="store_true", help="Also zip the session folder at the end.")
-    args = ap.parse_args()
+@dataclass
+class Collector:
+    """One named step of a session collection: run(session_dir, timeout) writes its files."""
+    name: str
+    run: Callable[[Path, float], object]
+    timeout: float = 60.0
 
-    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    dest_root = Path(args.dest).expanduser().resolve()
-    session_dir = dest_root / f"win_session_{stamp}"
-    session_dir.mkdir(parents=True, exist_ok=True)
 
-    # 1) PowerShell history
+def collect_ps_history(session_dir: Path, engine: CopyEngine) -> List[str]:
     hist_dir = session_dir / "powershell_history"
     hist_dir.mkdir(exist_ok=True)
     copied = []
     for cand in find_ps_history_candidates():
-        dst = hist_dir / cand.name
-        if copy_if_exists(cand, dst):
+        if copy_if_exists(cand, hist_dir / cand.name, engine):
             copied.append(str(cand))
     (hist_dir / "sources.txt").write_text("\n".join(copied) if copied else "No PSReadLine history found.", encoding="utf-8")
+    return copied
 
-    # 2) System summary
-    export_system_summary(session_dir / "systeminfo.txt")
 
-    # 3) Installed programs
-    export_installed_programs(session_dir / "installed_programs.json")
-
-    # 4) Grab readiness reports from Desktop
+def collect_desktop_reports(session_dir: Path, engine: CopyEngine) -> int:
     desktop = Path(os.environ.get("USERPROFILE", "")) / "Desktop"
     rep_dir = session_dir / "reports"
     rep_dir.mkdir(exist_ok=True)
+    n = 0
     if desktop.exists():
         for pat in ("win11_readiness*.txt", "win11_readiness*.json", "win11_readiness_v2*.txt", "win11_readiness_v2*.json"):
             for f in desktop.glob(pat):
-                copy_if_exists(f, rep_dir / f.name)
+                n += copy_if_exists(f, rep_dir / f.name, engine)
+    return n
+
 
-    # 5) Copy current folder (pack scripts) into session if present
+def collect_pack_files(session_dir: Path, engine: CopyEngine) -> int:
     cur = Path.cwd()
     pack_dir = session_dir / "pack_files"
     pack_dir.mkdir(exist_ok=True)
+    n = 0
     for name in ("win_maintain.py", "win_collect_session.py", "README.md", "CHECKLIST_backup.md", "PROMPT_FOR_NEW_CHAT.txt"):
-        src = cur / name
-        if src.exists():
-            copy_if_exists(src, pack_dir / name)
+        n += copy_if_exists(cur / name, pack_dir / name, engine)
+    return n
+
+
+def build_collectors(engine: CopyEngine, commands: Optional[Dict[str, List[str]]] = None) -> List[Collector]:
+    cmds = dict(DEFAULT_COMMANDS, **(commands or {}))
+    return [
+        Collector("powershell_history", lambda d, t: collect_ps_history(d, engine)),
+        Collector("systeminfo", lambda d, t: export_system_summary(d / "systeminfo.txt", cmds["systeminfo"], t), 120.0),
+        Collector("installed_programs",
+                  lambda d, t: export_installed_programs(d / "installed_programs.json", cmds["installed_programs"], t), 120.0),
+        Collector("desktop_reports", lambda d, t: collect_desktop_reports(d, engine)),
+        Collector("pack_files", lambda d, t: collect_pack_files(d, engine)),
+    ]
+
+
+def run_collectors(collectors: List[Collector], session_dir: Path, workers: int = 4,
+                   cancel: Optional[threading.Event] = None) -> Dict[str, Dict[str, object]]:
+    """Run all collectors concurrently; returns {name: {status, elapsed_sec, timeout_sec[, result]}}.
+
+    Command collectors kill their child process at the timeout. A Python
+    step that overruns is reported as "timeout"; *cancel* (the event of the
+    CopyEngine the steps copy through) is then set so it stops at its next
+    file. Returns only once every step has ended, so nothing writes into
+    *session_dir* afterwards.
+    """
+    results: Dict[str, Dict[str, object]] = {}
+    t0 = time.perf_counter()
+
+    def timed(c: Collector):
+        start = time.perf_counter()
+        try:
+            return c.run(session_dir, c.timeout)
+        finally:
+            results[c.name]["elapsed_sec"] = round(time.perf_counter() - start, 2)
+
+    pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="collect")
+    futures = []
+    for c in collectors:
+        results[c.name] = {"status": "running", "elapsed_sec": None, "timeout_sec": c.timeout}
+        futures.append((c, pool.submit(timed, c)))
+    for c, fut in futures:
+        rec = results[c.name]
+        try:
+            res = fut.result(timeout=max(c.timeout - (time.perf_counter() - t0), 0))
+            rec["status"] = "ok"
+            if res is not None:
+                rec["result"] = res
+        except (FutureTimeout, subprocess.TimeoutExpired, CopyCancelled):
+            rec["status"] = "timeout"
+            if rec["elapsed_sec"] is None:
+                rec["elapsed_sec"] = round(time.perf_counter() - t0, 2)
+        except Exception as e:
+            rec["status"] = f"error: {e!r}"
+    if cancel is not None and any(r["status"] == "timeout" for r in results.values()):
+        cancel.set()
+    pool.shutdown(wait=True, cancel_futures=True)
+    return results
+
+
+SESSION_STORE_NAME = "session_store.sqlite"
+DEDUPE_MEMBER = "_dedupe.json"
+_ZIP64_LIMIT = 0xFFFFFFFF
+
+
+class SessionStore:
+    """Content index of earlier session zips (<dest>/session_store.sqlite): blake2b hash -> (archive, member).
+
+    Only archives still present next to the store count as known, so
+    deleting an old session zip never leaves a new one pointing at it.
+    """
+
+    def __init__(self, dest_root: Path):
+        self.root = dest_root
+        self._db = sqlite3.connect(str(dest_root / SESSION_STORE_NAME))
+        self._db.execute("CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, size INTEGER, archive TEXT, member TEXT)")
+        rows = self._db.execute("SELECT hash, archive, member FROM blobs").fetchall()
+        alive = {a: (dest_root / a).is_file() for a in {r[1] for r in rows}}
+        self.known: Dict[str, Tuple[str, str]] = {h: (a, m) for h, a, m in rows if alive[a]}
+
+    def record(self, archive: str, members: List[Tuple[str, int, str]]) -> None:
+        """Remember the (hash, size, member) content stored in *archive* (first copy wins)."""
+        rows = [(h, size, archive, m) for h, size, m in members if h not in self.known]
+        self._db.executemany("INSERT OR REPLACE INTO blobs VALUES (?,?,?,?)", rows)
+        self._db.commit()
+        self.known.update((h, (a, m)) for h, _, a, m in rows)
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _dos_time(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(max(mtime, 315532800 + 86400))  # zip dates start in 1980
+    return t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2, (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+
+
+class _ZipAssembler:
+    """Writes a zip from members compressed elsewhere (raw deflate or stored), zip64 where needed."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.entries: List[tuple] = []
+
+    def add(self, name: str, method: int, crc: int, size: int, csize: int, mtime: float, data) -> None:
+        offset = self.fp.tell()
+        name_b = name.encode("utf-8")
+        big = size >= _ZIP64_LIMIT or csize >= _ZIP64_LIMIT
+        extra = struct.pack("<HHQQ", 1, 16, size, csize) if big else b""
+        dtime, ddate = _dos_time(mtime)
+        self.fp.write(struct.pack("<IHHHHHIIIHH", 0x04034B50, 45 if big else 20, 0x800, method, dtime, ddate, crc,
+                                  _ZIP64_LIMIT if big else csize, _ZIP64_LIMIT if big else size,
+                                  len(name_b), len(extra)))
+        self.fp.write(name_b)
+        self.fp.write(extra)
+        for chunk in data:
+            self.fp.write(chunk)
+        self.entries.append((name_b, method, dtime, ddate, crc, size, csize, offset))
+
+    def close(self) -> None:
+        start = self.fp.tell()
+        for name_b, method, dtime, ddate, crc, size, csize, offset in self.entries:
+            big = size >= _ZIP64_LIMIT or csize >= _ZIP64_LIMIT
+            far = offset >= _ZIP64_LIMIT
+            fields = ([size, csize] if big else []) + ([offset] if far else [])
+            extra = struct.pack("<HH" + "Q" * len(fields), 1, 8 * len(fields), *fields) if fields else b""
+            self.fp.write(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 45 if fields else 20, 45 if fields else 20,
+                                      0x800, method, dtime, ddate, crc,
+                                      _ZIP64_LIMIT if big else csize, _ZIP64_LIMIT if big else size,
+                                      len(name_b), len(extra), 0, 0, 0, 0, _ZIP64_LIMIT if far else offset))
+            self.fp.write(name_b)
+            self.fp.write(extra)
+        end = self.fp.tell()
+        count, cd_size = len(self.entries), end - start
+        if count >= 0xFFFF or start >= _ZIP64_LIMIT or cd_size >= _ZIP64_LIMIT:
+            self.fp.write(struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, cd_size, start))
+            self.fp.write(struct.pack("<IIQI", 0x07064B50, 0, end, 1))
+        self.fp.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                                  min(cd_size, _ZIP64_LIMIT), min(start, _ZIP64_LIMIT), 0))
+
+
+class SessionArchiver:
+    """Zips a session folder, deflating members on a thread pool (zlib drops the GIL).
+
+    Workers compress whole files (spooled to a temp file past SPOOL bytes);
+    the zip is assembled in folder order as results arrive, with at most
+    a few files per worker in flight. Files that looks_compressed(), or
+    that deflate would not shrink, are stored. With a SessionStore, files
+    whose content is already in an earlier session zip (or earlier in this
+    one) are left out and listed in _dedupe.json as
+    {path: {hash, size, archive, member}}; extract_session() restores them.
+    """
+
+    BUFFER = 1024 * 1024
+    SPOOL = 32 * 1024 * 1024
+
+    def __init__(self, workers: int = 4, level: int = 6, store: Optional[SessionStore] = None):
+        self.workers = max(workers, 1)
+        self.level = level
+        self.store = store
+
+    def archive(self, src_dir: Path, zip_path: Path) -> Dict[str, object]:
+        """Write *src_dir* into *zip_path* (via <zip>.part); returns its stats."""
+        t0 = time.perf_counter()
+        stats = {"files": 0, "files_stored": 0, "files_deduped": 0, "bytes_in": 0, "bytes_deduped": 0}
+        files = []
+        for root, dirs, names in os.walk(src_dir):
+            dirs.sort()
+            rel = os.path.relpath(root, src_dir)
+            for fn in sorted(names):
+                files.append((os.path.join(root, fn), fn if rel == "." else f"{rel.replace(os.sep, '/')}/{fn}"))
+
+        known = dict(self.store.known) if self.store is not None else None
+        refs: Dict[str, dict] = {}
+        new_blobs: List[Tuple[str, int, str]] = []
+        part = zip_path.with_name(zip_path.name + ".part")
+        try:
+            self._assemble(files, part, zip_path.name, known, refs, new_blobs, stats)
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+        os.replace(part, zip_path)
+        if self.store is not None:
+            self.store.record(zip_path.name, new_blobs)
+        stats["bytes_out"] = zip_path.stat().st_size
+        stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else None
+        stats["elapsed_sec"] = round(time.perf_counter() - t0, 2)
+        return stats
+
+    def _assemble(self, files: List[Tuple[str, str]], part: Path, name: str,
+                  known: Optional[Dict[str, Tuple[str, str]]], refs: Dict[str, dict],
+                  new_blobs: List[Tuple[str, int, str]], stats: Dict[str, object]) -> None:
+        window = self.workers * 4
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="zip") as pool, \
+                open(part, "wb") as fp:
+            out = _ZipAssembler(fp)
+            pending = []
+            i = 0
+            while i < len(files) or pending:
+                while i < len(files) and len(pending) < window:
+                    pending.append((files[i][1], pool.submit(self._pack, files[i][0], known)))
+                    i += 1
+                member, fut = pending.pop(0)
+                res = fut.result()
+                stats["files"] += 1
+                stats["bytes_in"] += res["size"]
+                digest = res.get("hash")
+                if known is not None and digest in known:
+                    archive, ref = known[digest]
+                    refs[member] = {"hash": digest, "size": res["size"], "archive": archive, "member": ref}
+                    stats["files_deduped"] += 1
+                    stats["bytes_deduped"] += res["size"]
+                    if res.get("data"):
+                        res["data"].close()
+                    continue
+                with res["data"] as data:
+                    data.seek(0)
+                    out.add(member, res["method"], res["crc"], res["size"], res["csize"], res["mtime"],
+                            iter(functools.partial(data.read, self.BUFFER), b""))
+                stats["files_stored"] += res["method"] == 0
+                if known is not None:
+                    known[digest] = (name, member)
+                    new_blobs.append((digest, res["size"], member))
+            if refs:
+                body = json.dumps(refs, ensure_ascii=False, indent=1).encode("utf-8")
+                comp = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+                packed = comp.compress(body) + comp.flush()
+                out.add(DEDUPE_MEMBER, 8, zlib.crc32(body), len(body), len(packed), time.time(), [packed])
+            out.close()
+
+    def _pack(self, path: str, known: Optional[Dict[str, Tuple[str, str]]]) -> Dict[str, object]:
+        st = os.stat(path)
+        res: Dict[str, object] = {"mtime": st.st_mtime}
+        buf = bytearray(self.BUFFER)
+        view = memoryview(buf)
+        if known is not None:
+            # Hash pass first: content seen before is never compressed.
+            h = hashlib.blake2b(digest_size=20)
+            size = 0
+            with open(path, "rb", buffering=0) as f:
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    h.update(view[:n])
+                    size += n
+            res["hash"], res["size"] = h.hexdigest(), size
+            if res["hash"] in known:
+                return res
+        stored = looks_compressed(path, st.st_size)
+        while True:
+            data = tempfile.SpooledTemporaryFile(max_size=self.SPOOL)
+            comp = None if stored else zlib.compressobj(self.level, zlib.DEFLATED, -15)
+            crc = size = 0
+            with open(path, "rb", buffering=0) as f:
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    chunk = view[:n]
+                    crc = zlib.crc32(chunk, crc)
+                    size += n
+                    data.write(chunk if comp is None else comp.compress(chunk))
+            if comp is not None:
+                data.write(comp.flush())
+                if data.tell() >= size and size:
+                    data.close()
+                    stored = True
+                    continue
+            break
+        res.update(method=0 if stored else 8, crc=crc, size=size, csize=data.tell(), data=data)
+        return res
+
+
+def extract_session(zip_path: Path, out_dir: Path) -> int:
+    """Extract a session zip, pulling deduplicated files from the earlier zips next to it; returns files written."""
+    n = 0
+    with zipfile.ZipFile(zip_path) as zf:
+        refs = json.loads(zf.read(DEDUPE_MEMBER)) if DEDUPE_MEMBER in zf.namelist() else {}
+        for info in zf.infolist():
+            if info.filename != DEDUPE_MEMBER:
+                zf.extract(info, out_dir)
+                n += 1
+    others: Dict[str, zipfile.ZipFile] = {}
+    try:
+        for member, ref in refs.items():
+            src = others.get(ref["archive"])
+            if src is None:
+                src = others[ref["archive"]] = zipfile.ZipFile(zip_path.parent / ref["archive"])
+            target = out_dir / member
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with src.open(ref["member"]) as fin, open(target, "wb") as fout:
+                shutil.copyfileobj(fin, fout, SessionArchiver.BUFFER)
+            n += 1
+    finally:
+        for zf in others.values():
+            zf.close()
+    return n
+
+
+def collect_session(dest: str, zip_output: bool = False, commands: Optional[Dict[str, List[str]]] = None,
+                    timeouts: Optional[Dict[str, float]] = None, dedupe: bool = False,
+                    zip_workers: int = 4) -> Dict[str, object]:
+    """Collect a session folder under *dest*; returns the manifest.
+
+    *commands* / *timeouts* override DEFAULT_COMMANDS / collector timeouts by name.
+    With *dedupe* the zip leaves out content already in earlier session zips (see SessionArchiver).
+    """
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    dest_root = Path(dest).expanduser().resolve()
+    session_dir = dest_root / f"win_session_{stamp}"
+    session_dir.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    cancel = threading.Event()
+    with CopyEngine(cancel=cancel) as engine:
+        collectors = build_collectors(engine, commands)
+        for c in collectors:
+            c.timeout = (timeouts or {}).get(c.name, c.timeout)
+        collected = run_collectors(collectors, session_dir, workers=len(collectors), cancel=cancel)
 
     # Manifest
     manifest = {
         "created_at": datetime.now().isoformat(timespec="seconds"),
         "session_dir": str(session_dir),
+        "elapsed_sec": round(time.perf_counter() - t0, 2),
+        "collectors": collected,
+        "copy": engine.throughput(),
         "notes": [
             "ChatGPT chat history is NOT collected by this script.",
             "If you need ChatGPT logs: export from ChatGPT UI and copy into this session folder.",
@@ -155,14 +478,39 @@ def main():
     }
     (session_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
 
-    zip_path = None
-    if args.zip:
-        zip_path = str(dest_root / f"win_session_{stamp}.zip")
-        shutil.make_archive(zip_path[:-4], "zip", root_dir=str(session_dir))
+    if zip_output:
+        zip_path = dest_root / f"win_session_{stamp}.zip"
+        store = SessionStore(dest_root) if dedupe else None
+        try:
+            manifest["zip_stats"] = SessionArchiver(workers=zip_workers, store=store).archive(session_dir, zip_path)
+        finally:
+            if store is not None:
+                store.close()
+        manifest["zip"] = str(zip_path)
+    return manifest
+
+
+def main():
+    if os.name != "nt":
+        print("This tool is for Windows.")
+        sys.exit(1)
+
+    ap = argparse.ArgumentParser("win_collect_session")
+    ap.add_argument("--dest", default=r"D:\Backups\WinSession", help="Where to place the session folder.")
+    ap.add_argument("--zip", action="store_true", help="Also zip the session folder at the end.")
+    ap.add_argument("--dedupe", action="store_true", help="Leave files already zipped in earlier sessions out of the zip.")
+    ap.add_argument("--zip-workers", type=int, default=4, help="Parallel compression threads (default 4).")
+    args = ap.parse_args()
+
+    manifest = collect_session(args.dest, zip_output=args.zip, dedupe=args.dedupe, zip_workers=args.zip_workers)
+    for name, rec in manifest["collectors"].items():
+        if rec["status"] != "ok":
+            print(f"{name}: {rec['status']}")
 
-    print(f"Session saved to: {session_dir}")
-    if zip_path:
-        print(f"Zipped to: {zip_path}")
+    print(f"Session saved to: {manifest['session_dir']}")
+    if manifest.get("zip"):
+        zs = manifest["zip_stats"]
+        print(f"Zipped to: {manifest['zip']} ({zs['files']} files, {zs['files_deduped']} already in earlier sessions)")
 
 
 if __name__ == "__main__":
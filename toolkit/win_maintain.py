@@ -9,6 +9,7 @@
 #
 # Usage examples:
 #   python win_maintain.py scan
+#   python win_maintain.py dupes --roots D:\Photos --min-mb 5
 #   python win_maintain.py cleanup            (dry-run)
 #   python win_maintain.py cleanup --yes      (execute)
 #   python win_maintain.py cleanup --yes --browser-cache
@@ -21,18 +22,41 @@
 from __future__ import annotations
 
 import argparse
+import atexit
+import base64
+import codecs
+import cProfile
 import csv
 import ctypes
+import fnmatch
+import functools
+import hashlib
 import heapq
 import json
+import lzma
+import math
 import os
+import pstats
+import queue
+import random
+import re
 import shutil
+import sqlite3
 import subprocess
 import sys
+import tarfile
+import threading
 import time
-from dataclasses import dataclass, asdict
-from datetime import datetime
+import zipfile
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, asdict, field, fields, replace
+from datetime import datetime, timedelta
 from pathlib import Path
+from stat import S_ISDIR, S_ISLNK, S_ISREG
 
 def get_app_root() -> Path:
     """Return the directory where reports should live.
@@ -49,11 +73,14 @@ def get_app_root() -> Path:
 
 APP_ROOT = get_app_root()
 DEFAULT_OUTDIR = APP_ROOT / "out"
+SCAN_INDEX_NAME = "scan_index.sqlite"
 
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 
 REPARSE_POINT_ATTR = 0x0400  # FILE_ATTRIBUTE_REPARSE_POINT
+_WINDOWS = os.name == "nt"
+LINK_SET_MAX = 1 << 22  # hard links tracked by --dedupe-links (16 bytes each)
 
 
 def is_admin() -> bool:
@@ -63,27 +90,348 @@ def is_admin() -> bool:
         return False
 
 
+PROCESS_MODE_BACKGROUND_BEGIN = 0x00100000  # lowers CPU, I/O and memory priority
+IDLE_PRIORITY_CLASS = 0x00000040
+
+
+def lower_priority() -> str:
+    """Make this process yield to the user's work; returns what was applied.
+
+    Windows: background processing mode (CPU, disk I/O and memory priority
+    lowered), or the idle priority class if that is refused. Elsewhere: nice 10.
+    """
+    if _WINDOWS:
+        try:
+            k32 = ctypes.windll.kernel32
+            k32.GetCurrentProcess.restype = ctypes.c_void_p
+            k32.SetPriorityClass.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+            proc = k32.GetCurrentProcess()
+            if k32.SetPriorityClass(proc, PROCESS_MODE_BACKGROUND_BEGIN):
+                return "background mode"
+            if k32.SetPriorityClass(proc, IDLE_PRIORITY_CLASS):
+                return "idle priority"
+        except Exception:
+            pass
+        return "unchanged"
+    try:
+        os.nice(10)
+        return "nice 10"
+    except OSError:
+        return "unchanged"
+
+
+_ENC_SAMPLE = 4096  # bytes (from the first non-ASCII chunk on) used to pick a codec
+_OEM_HIGH = bytes(range(0x80, 0xB0))  # cp866: А-Я, а-п
+_ANSI_HIGH = bytes(range(0xC0, 0x100))  # cp1251: А-я
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Codec of console output from a sample: UTF-8 (BOM or valid), else cp866 (OEM) or cp1251 (ANSI).
+
+    The two Cyrillic code pages are told apart by where most high bytes
+    fall: cp866 puts А-Я and а-п below 0xB0, cp1251 puts all letters from 0xC0 up.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, False)  # a cut-off last character is fine
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    oem = len(sample) - len(sample.translate(None, _OEM_HIGH))
+    ansi = len(sample) - len(sample.translate(None, _ANSI_HIGH))
+    return "cp866" if oem >= ansi else "cp1251"
+
+
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+
 def decode_best_effort(b: bytes) -> str:
-    if b is None:
+    """Decode a whole output buffer: codec from detect_encoding() on the bytes from the first
+    non-ASCII one on, decoded strictly; on an error the other codecs are tried in turn."""
+    if not b:
         return ""
-    for enc in ("utf-8", "utf-8-sig", "cp866", "cp1251", "mbcs"):
+    m = _NON_ASCII.search(b)
+    if m is None:
+        return b.decode("ascii")
+    first = detect_encoding(b[m.start():m.start() + _ENC_SAMPLE * 16])
+    for enc in dict.fromkeys((first, "utf-8", "cp1251", "mbcs", "cp866")):
         try:
             return b.decode(enc)
-        except Exception:
+        except (UnicodeDecodeError, LookupError):  # mbcs exists on Windows only
             continue
-    return b.decode("utf-8", errors="replace")
+    return b.decode(first, errors="replace")
+
+
+class _StreamDecoder:
+    """Incremental decoder for a pipe: ASCII passes straight through, the codec is picked from
+    the first _ENC_SAMPLE bytes after the first non-ASCII one. on_line(line) gets complete lines."""
+
+    def __init__(self, on_line=None, encoding: Optional[str] = None):
+        self.on_line = on_line
+        self.encoding = encoding
+        self._dec = codecs.getincrementaldecoder(encoding)(errors="replace") if encoding else None
+        self._pending = b""
+        self._parts: List[str] = []
+        self._tail = ""
+
+    def feed(self, data: bytes, final: bool = False) -> None:
+        if self._dec is None:
+            if not self._pending and data.isascii():
+                self._emit(data.decode("ascii"), final)
+                return
+            self._pending += data
+            if len(self._pending) < _ENC_SAMPLE and not final:
+                return
+            self.encoding = detect_encoding(self._pending[:_ENC_SAMPLE])
+            self._dec = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+            data, self._pending = self._pending, b""
+        self._emit(self._dec.decode(data, final), final)
+
+    def _emit(self, text: str, final: bool) -> None:
+        if text:
+            self._parts.append(text)
+        if self.on_line is None:
+            return
+        lines = (self._tail + text).split("\n")
+        self._tail = lines.pop()
+        for line in lines:
+            self.on_line(line.rstrip("\r"))
+        if final and self._tail:
+            self.on_line(self._tail.rstrip("\r"))
+            self._tail = ""
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+def run_cmd(cmd: List[str], timeout: Optional[float] = None, on_line=None,
+            encoding: Optional[str] = None) -> Tuple[int, str, str]:
+    """Run *cmd*; returns (exit code, stdout, stderr), stripped.
+
+    Output is read while the command runs and decoded incrementally (codec
+    from detect_encoding() unless *encoding* is given). on_line(line) is
+    called, on a reader thread, for each stdout line as it arrives. After
+    *timeout* seconds the command is killed and subprocess.TimeoutExpired
+    raised (with the output so far).
+    """
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out = _StreamDecoder(on_line, encoding)
+    err = _StreamDecoder(None, encoding)
+
+    def pump(pipe, dec: _StreamDecoder) -> None:
+        with pipe:
+            while True:
+                chunk = pipe.read1(65536)
+                if not chunk:
+                    break
+                dec.feed(chunk)
+        dec.feed(b"", final=True)
+
+    readers = [threading.Thread(target=pump, args=a, daemon=True) for a in ((proc.stdout, out), (proc.stderr, err))]
+    for t in readers:
+        t.start()
+    try:
+        code = proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        for t in readers:
+            t.join(timeout=1.0)
+        raise subprocess.TimeoutExpired(cmd, timeout, output=out.text(), stderr=err.text())
+    for t in readers:
+        t.join()
+    return code, out.text().strip(), err.text().strip()
+
+
+def run_cmds(cmds: List[List[str]], workers: int = 4, timeout: Optional[float] = None) -> List[Tuple[int, str, str]]:
+    """Run several commands concurrently; results in the order of *cmds*.
+
+    A command that times out yields (-1, its output so far, "timed out after N s").
+    """
+    def one(cmd: List[str]) -> Tuple[int, str, str]:
+        try:
+            return run_cmd(cmd, timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            return -1, (e.output or "").strip(), f"timed out after {timeout:g}s"
+        except OSError as e:
+            return -1, "", repr(e)
+
+    with ThreadPoolExecutor(max_workers=max(min(workers, len(cmds)), 1), thread_name_prefix="cmd") as pool:
+        return list(pool.map(one, cmds))
+
+
+# Request loop of the PowerShell worker: one base64 (UTF-8) script per stdin line, answered by one
+# "@@WM <code> <base64 stdout> <base64 stderr>" line. Anything else the script prints straight to the
+# console arrives as separate lines and is added to its stdout. The code is the last native program's
+# exit code when it failed, else 1 if the script raised a PowerShell error: what a native program writes
+# to stderr (NativeCommandError records under 2>&1) is only reported, as with subprocess.
+_PS_WORKER_LOOP = r"""
+[Console]::OutputEncoding = [System.Text.UTF8Encoding]::new($false)
+$ProgressPreference = 'SilentlyContinue'
+$utf8 = [System.Text.UTF8Encoding]::new($false)
+while ($null -ne ($line = [Console]::In.ReadLine())) {
+  $out = @(); $err = @(); $code = 0; $failed = $false
+  try {
+    $global:LASTEXITCODE = 0
+    $sb = [ScriptBlock]::Create($utf8.GetString([Convert]::FromBase64String($line)))
+    foreach ($r in (& $sb 2>&1)) {
+      if ($r -is [System.Management.Automation.ErrorRecord]) {
+        $err += $r.ToString()
+        if ($r.FullyQualifiedErrorId -notlike 'NativeCommandError*') { $failed = $true }
+      }
+      else { $out += ($r | Out-String).TrimEnd() }
+    }
+    if ($failed) { $code = 1 }
+    if ($global:LASTEXITCODE) { $code = $global:LASTEXITCODE }
+  } catch { $err += $_.Exception.Message; $code = 1 }
+  $o = [Convert]::ToBase64String($utf8.GetBytes(($out -join "`n")))
+  $e = [Convert]::ToBase64String($utf8.GetBytes(($err -join "`n")))
+  [Console]::Out.WriteLine("@@WM $code $o $e")
+  [Console]::Out.Flush()
+}
+"""
+
+# Same protocol in Python, each script run through the system shell (sh / cmd): a stand-in for tests.
+PY_WORKER_LOOP = r"""
+import base64, subprocess, sys
+for line in sys.stdin:
+    p = subprocess.run(base64.b64decode(line).decode("utf-8"), shell=True, capture_output=True)
+    b64 = lambda s: base64.b64encode(s.rstrip()).decode("ascii")
+    sys.stdout.write("@@WM %d %s %s\n" % (p.returncode, b64(p.stdout), b64(p.stderr)))
+    sys.stdout.flush()
+"""
+
+
+def powershell_worker_argv(exe: str = "powershell") -> List[str]:
+    """argv of a PowerShell worker (exe "pwsh" for PowerShell 7)."""
+    return [exe, "-NoLogo", "-NoProfile", "-NonInteractive", "-ExecutionPolicy", "Bypass", "-Command", _PS_WORKER_LOOP]
+
+
+class ShellWorker:
+    """Long-lived shell process that runs scripts one at a time, saving a process start per call.
+
+    Scripts go to the worker's stdin and results come back over the
+    line-framed protocol of _PS_WORKER_LOOP; *argv* may start any program
+    speaking it (powershell_worker_argv("pwsh"), or [sys.executable, "-c",
+    PY_WORKER_LOOP]). A dead worker is started again on the next call. A
+    call that dies with the worker or passes its timeout returns code -1
+    (the worker is killed), and is not run again.
+    """
+
+    MARKER = "@@WM "
+
+    def __init__(self, argv: Optional[List[str]] = None, timeout: float = 600.0):
+        self.argv = argv or powershell_worker_argv()
+        self.timeout = timeout
+        self.starts = 0
+        self.calls = 0
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._stderr: List[bytes] = []
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        self._proc = subprocess.Popen(self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE, bufsize=0)
+        self.starts += 1
+        self._lines = lines = queue.Queue()
+        self._stderr = errs = []
+        proc = self._proc
+
+        def pump_out() -> None:
+            for line in proc.stdout:
+                lines.put(line)
+            lines.put(None)
+
+        def pump_err() -> None:
+            for line in proc.stderr:
+                errs.append(line)
+                del errs[:-50]
+
+        threading.Thread(target=pump_out, name="shell-out", daemon=True).start()
+        threading.Thread(target=pump_err, name="shell-err", daemon=True).start()
+
+    def run(self, script: str, timeout: Optional[float] = None) -> Tuple[int, str, str]:
+        """Run *script* in the worker; returns (exit code, stdout, stderr)."""
+        with self._lock:
+            self.calls += 1
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+            try:
+                self._proc.stdin.write(base64.b64encode(script.encode("utf-8")) + b"\n")
+                self._proc.stdin.flush()
+            except OSError as e:
+                self._kill()
+                return -1, "", f"shell worker not accepting input: {e}"
+            deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+            extra: List[str] = []
+            while True:
+                try:
+                    line = self._lines.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    self._kill()
+                    return -1, "\n".join(extra), f"timed out after {timeout or self.timeout:g}s (shell worker killed)"
+                if line is None:
+                    self._kill()
+                    tail = decode_best_effort(b"".join(self._stderr)).strip()
+                    return -1, "\n".join(extra), f"shell worker exited{': ' + tail if tail else ''}"
+                text = decode_best_effort(line).rstrip("\r\n")
+                parts = text[len(self.MARKER):].split(" ") if text.startswith(self.MARKER) else []
+                try:
+                    code = int(parts[0]) if len(parts) == 3 else None
+                    out, err = (decode_best_effort(base64.b64decode(x, validate=True)) for x in parts[1:]) \
+                        if code is not None else ("", "")
+                except ValueError:  # includes binascii.Error
+                    code = None
+                if code is None:  # printed by the script itself
+                    extra.append(text)
+                    continue
+                return code, "\n".join(extra + [out]).strip(), err.strip()
+
+    def _kill(self) -> None:
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+                self._proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            self._proc = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is None:
+                try:
+                    self._proc.stdin.close()
+                    self._proc.wait(timeout=5)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+
+
+_shell_worker: Optional[ShellWorker] = None
 
 
-def run_cmd(cmd: List[str]) -> Tuple[int, str, str]:
-    p = subprocess.run(cmd, capture_output=True)
-    out = decode_best_effort(p.stdout).strip()
-    err = decode_best_effort(p.stderr).strip()
-    return p.returncode, out, err
+def get_shell_worker() -> ShellWorker:
+    """The process-wide PowerShell worker used by run_powershell (started on first use)."""
+    global _shell_worker
+    if _shell_worker is None:
+        set_shell_worker(ShellWorker())
+    return _shell_worker
 
 
-def run_powershell(ps: str) -> Tuple[int, str, str]:
-    prefix = "[Console]::OutputEncoding = [System.Text.UTF8Encoding]::new(); $ProgressPreference='SilentlyContinue'; "
-    return run_cmd(["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", prefix + ps])
+def set_shell_worker(worker: ShellWorker) -> None:
+    """Replace the process-wide worker (e.g. with a pwsh or Python stand-in); the old one is closed."""
+    global _shell_worker
+    if _shell_worker is not None:
+        _shell_worker.close()
+    else:
+        atexit.register(lambda: _shell_worker is not None and _shell_worker.close())
+    _shell_worker = worker
+
+
+def run_powershell(ps: str, timeout: Optional[float] = None) -> Tuple[int, str, str]:
+    return get_shell_worker().run(ps, timeout=timeout)
 
 
 def format_gb(num_bytes: float) -> str:
@@ -108,6 +456,53 @@ def list_drives() -> List[str]:
     return drives
 
 
+SLOW_DIRS_KEPT = 20  # slowest directories kept by scan --profile
+LATENCY_BUCKETS = 24  # directory latency histogram: bucket i counts [2**(i-1), 2**i) microseconds
+
+
+@dataclass
+class ScanProfile:
+    """Where a scan spends its time (scan --profile); ScanStats.profile is None otherwise.
+
+    Phase timers are summed over walker threads, so with workers > 1 they add
+    up to more than the wall time. scandir_sec is the listing itself: a
+    directory's visit minus the stat, aggregation and top-N time spent in it.
+    Each visit also goes into latency_hist and, if among the slowest, into
+    slowest_dirs ((seconds, path), slowest first once the scan is finished).
+    report_sec is set after the reports of the run are written and covers all
+    of its roots.
+    """
+    scandir_sec: float = 0.0
+    stat_sec: float = 0.0
+    aggregate_sec: float = 0.0
+    top_n_sec: float = 0.0
+    report_sec: float = 0.0
+    latency_hist: List[int] = field(default_factory=lambda: [0] * LATENCY_BUCKETS)
+    slowest_dirs: List[Tuple[float, str]] = field(default_factory=list)
+
+    def add_dir(self, path: str, sec: float) -> None:
+        self.latency_hist[min(int(sec * 1e6).bit_length(), LATENCY_BUCKETS - 1)] += 1
+        _push_top(self.slowest_dirs, SLOW_DIRS_KEPT, sec, path)
+
+    def merge(self, other: "ScanProfile") -> None:
+        for name in ("scandir_sec", "stat_sec", "aggregate_sec", "top_n_sec", "report_sec"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.latency_hist = [a + b for a, b in zip(self.latency_hist, other.latency_hist)]
+        self.slowest_dirs = heapq.nlargest(SLOW_DIRS_KEPT, self.slowest_dirs + other.slowest_dirs)
+        heapq.heapify(self.slowest_dirs)
+
+    def histogram(self) -> List[Tuple[str, int]]:
+        """Non-empty latency buckets as ("<label>", count), fastest first."""
+        def label(us: int) -> str:
+            return f"{us} us" if us < 1000 else f"{us / 1000:.3g} ms" if us < 10**6 else f"{us / 10**6:.3g} s"
+        rows = []
+        for i, n in enumerate(self.latency_hist):
+            if n:
+                lo = label(1 << (i - 1)) if i else "0"
+                rows.append((f">= {lo}" if i == LATENCY_BUCKETS - 1 else f"{lo} .. {label(1 << i)}", n))
+        return rows
+
+
 @dataclass
 class ScanStats:
     root: str
@@ -118,7 +513,17 @@ class ScanStats:
     errors: int = 0
     denied: int = 0
     skipped_reparse: int = 0
+    stat_calls: int = 0
+    dirs_reused: int = 0
+    bytes_unique: int = 0  # bytes_total with hard-linked files counted once (--dedupe-links)
+    hardlinks: int = 0  # files seen with st_nlink > 1
+    hardlinks_deduped: int = 0  # ... whose inode was already counted
+    hardlinks_untracked: int = 0  # ... not tracked because the link set was full
+    cancelled: bool = False
+    budget_exhausted: bool = False  # stopped by --budget (cancelled is set too)
+    dirs_pending: int = 0  # found but not listed when the walk stopped
     elapsed_sec: float = 0.0
+    profile: Optional[ScanProfile] = None  # scan --profile
 
 
 @dataclass
@@ -127,231 +532,2626 @@ class ScanResult:
     top_dirs_level1: List[Tuple[str, int]]
     top_dirs_level2: List[Tuple[str, int]]
     top_files: List[Tuple[str, int]]
+    top_dirs_by_level: Dict[int, List[Tuple[str, int]]] = field(default_factory=dict)
+    tree: Optional["DirTree"] = None
+    nested_roots: List[str] = field(default_factory=list)
+    unfinished_level1: List[Tuple[str, int]] = field(default_factory=list)  # (folder, dirs pending), stopped walks
 
 
-def scan_root(root: str, depth: int, top_dirs: int, top_files: int) -> ScanResult:
-    t0 = time.time()
-    root = os.path.abspath(root)
-    stats = ScanStats(root=root, depth=depth)
+@dataclass
+class _ScanPartial:
+    """Accumulator for one walker thread; partials are merged into a ScanResult."""
+    stats: ScanStats
+    lvl1: Dict[str, int] = field(default_factory=dict)
+    lvl2: Dict[str, int] = field(default_factory=dict)
+    file_heap: List[Tuple[int, str]] = field(default_factory=list)
+    tree: Optional["DirTree"] = None
+    nested: List[str] = field(default_factory=list)
+    links: Optional["_LinkSet"] = None
+    pending: Dict[str, int] = field(default_factory=dict)  # level-1 key ("" = the root) -> dirs not listed
 
-    lvl1: Dict[str, int] = {}
-    lvl2: Dict[str, int] = {}
-    file_heap: List[Tuple[int, str]] = []
 
-    stack = [root]
-    root_parts_len = len(Path(root).parts)
+def _push_top(heap: List[Tuple[int, str]], limit: int, sz: int, p: str) -> None:
+    # (size, path) is a total order, so the kept set does not depend on visiting order.
+    if limit <= 0:
+        return
+    if len(heap) < limit:
+        heapq.heappush(heap, (sz, p))
+    elif (sz, p) > heap[0]:
+        heapq.heapreplace(heap, (sz, p))
 
-    def add_file(sz: int, p: str):
-        if top_files <= 0:
-            return
-        if len(file_heap) < top_files:
-            heapq.heappush(file_heap, (sz, p))
-        else:
-            if sz > file_heap[0][0]:
-                heapq.heapreplace(file_heap, (sz, p))
 
-    while stack:
-        cur = stack.pop()
-        stats.dirs_scanned += 1
+class DirTree:
+    """Full directory size tree in flat arrays: one slot per scanned directory.
+
+    Nodes are numbered in discovery order, so a parent always has a lower id
+    than its children; names are interned. finalize() computes subtree totals
+    and a child index (CSR layout) used by the query methods. Paths given to and
+    returned by the queries are relative to the root.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.parent = array("i", [-1])
+        self.name = array("i", [0])
+        self.level = array("h", [0])
+        self.own_bytes = array("q", [0])
+        self.own_files = array("q", [0])
+        self.total_bytes = array("q")
+        self.total_files = array("q")
+        self.total_dirs = array("q")
+        self._names: List[str] = [""]
+        self._name_ids: Dict[str, int] = {"": 0}
+        self._child_start = array("i")
+        self._child_ids = array("i")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def add(self, parent: int, name: str) -> int:
+        with self._lock:
+            nid = self._name_ids.get(name)
+            if nid is None:
+                nid = self._name_ids[name] = len(self._names)
+                self._names.append(name)
+            node = len(self.parent)
+            self.parent.append(parent)
+            self.name.append(nid)
+            self.level.append(self.level[parent] + 1)
+            self.own_bytes.append(0)
+            self.own_files.append(0)
+            return node
+
+    def set_own(self, node: int, size: int, files: int) -> None:
+        # Each node is written by the one worker that lists it.
+        self.own_bytes[node] = size
+        self.own_files[node] = files
+
+    def finalize(self) -> None:
+        n = len(self.parent)
+        parent = self.parent
+        tb, tf = array("q", self.own_bytes), array("q", self.own_files)
+        td = array("q", [1]) * n
+        for i in range(n - 1, 0, -1):
+            p = parent[i]
+            tb[p] += tb[i]
+            tf[p] += tf[i]
+            td[p] += td[i]
+        self.total_bytes, self.total_files, self.total_dirs = tb, tf, td
+
+        start = array("i", [0]) * (n + 1)
+        for i in range(1, n):
+            start[parent[i] + 1] += 1
+        for i in range(n):
+            start[i + 1] += start[i]
+        fill = array("i", start)
+        ids = array("i", [0]) * (n - 1)
+        for i in range(1, n):
+            p = parent[i]
+            ids[fill[p]] = i
+            fill[p] += 1
+        self._child_start, self._child_ids = start, ids
+
+    def graft(self, parent: int, name: str, other: "DirTree", max_level: int = -1, count: int = -1) -> None:
+        """Copy *other* (the tree of a nested root) under *parent* as *name*.
+
+        Only its first *count* nodes (the walk itself, not what was grafted into
+        it since) down to *max_level* are copied.
+        """
+        n = len(other) if count < 0 else count
+        ids = array("i", [0]) * n
+        ids[0] = self.add(parent, name)
+        self.set_own(ids[0], other.own_bytes[0], other.own_files[0])
+        for i in range(1, n):
+            if 0 <= max_level < other.level[i]:
+                continue
+            ids[i] = self.add(ids[other.parent[i]], other._names[other.name[i]])
+            self.set_own(ids[i], other.own_bytes[i], other.own_files[i])
+
+    def path_of(self, node: int) -> str:
+        parts = []
+        while node > 0:
+            parts.append(self._names[self.name[node]])
+            node = self.parent[node]
+        return os.path.join(*reversed(parts)) if parts else ""
+
+    def child_nodes(self, node: int) -> array:
+        return self._child_ids[self._child_start[node]:self._child_start[node + 1]]
+
+    def node_of(self, path: str) -> int:
+        """Node id for a path relative to (or absolute under) the root; -1 if unknown."""
+        if os.path.isabs(path):
+            path = os.path.relpath(path, self.root)
+        node = 0
+        for part in os.path.normpath(path).split(os.sep):
+            if part in ("", "."):
+                continue
+            want = os.path.normcase(part)
+            for c in self.child_nodes(node):
+                if os.path.normcase(self._names[self.name[c]]) == want:
+                    node = c
+                    break
+            else:
+                return -1
+        return node
+
+    def subtree(self, path: str = "") -> Dict[str, int]:
+        """Totals (bytes, files, dirs) of the scanned subtree at *path*."""
+        node = self.node_of(path)
+        if node < 0:
+            return {}
+        return {"bytes": self.total_bytes[node], "files": self.total_files[node], "dirs": self.total_dirs[node]}
+
+    def children(self, path: str = "", n: int = 25) -> List[Tuple[str, int]]:
+        """Top *n* subdirectories of *path* by subtree size."""
+        node = self.node_of(path)
+        if node < 0:
+            return []
+        best = heapq.nlargest(n, self.child_nodes(node), key=self._size_key)
+        return [(self.path_of(c), self.total_bytes[c]) for c in best]
+
+    def biggest(self, level: int, n: int = 25) -> List[Tuple[str, int]]:
+        """Top *n* directories at *level* (1 = children of the root) by subtree size."""
+        lv = self.level
+        best = heapq.nlargest(n, (i for i in range(len(lv)) if lv[i] == level), key=self._size_key)
+        return [(self.path_of(c), self.total_bytes[c]) for c in best]
+
+    def _size_key(self, node: int) -> Tuple[int, str]:
+        # Ties broken by name: node ids depend on the order the walk found them.
+        return self.total_bytes[node], self._names[self.name[node]]
+
+
+class _LinkSet:
+    """Hard-linked files already counted, keyed by (st_dev, st_ino), for --dedupe-links.
+
+    Keys are 64-bit hashes kept with the file size in sorted array runs (16
+    bytes per file), plus a small dict of recent ones. Runs of similar length
+    are merged, so there are O(log n) of them to search. Only files with
+    st_nlink > 1 go in; past *max_keys* new links are no longer tracked and
+    count as unique. Thread-safe.
+    """
+
+    PENDING = 1 << 16
+
+    def __init__(self, max_keys: int = LINK_SET_MAX):
+        self.max_keys = max_keys
+        self.untracked = 0
+        self._count = 0
+        self._pending: Dict[int, int] = {}
+        self._runs: List[Tuple[array, array]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, dev: int, ino: int, size: int) -> bool:
+        """Record one link; False if its inode was already counted."""
+        key = hash((dev, ino)) & 0xFFFFFFFFFFFFFFFF
+        with self._lock:
+            return self._add(key, size)
+
+    def merge(self, other: "_LinkSet") -> Tuple[int, int]:
+        """Add the links of *other*; returns (count, bytes) of those already counted here."""
+        n = dup = 0
+        with self._lock:
+            for key, size in other._items():
+                if not self._add(key, size):
+                    n += 1
+                    dup += size
+            self.untracked += other.untracked
+        return n, dup
+
+    def _has(self, key: int) -> bool:
+        if key in self._pending:
+            return True
+        for keys, _ in self._runs:
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                return True
+        return False
+
+    def _add(self, key: int, size: int) -> bool:
+        if self._has(key):
+            return False
+        if self._count >= self.max_keys:
+            self.untracked += 1
+            return True
+        self._pending[key] = size
+        self._count += 1
+        if len(self._pending) >= self.PENDING:
+            self._flush()
+        return True
+
+    def _flush(self) -> None:
+        keys = sorted(self._pending)
+        run = (array("Q", keys), array("q", [self._pending[k] for k in keys]))
+        self._pending = {}
+        while self._runs and len(self._runs[-1][0]) <= 2 * len(run[0]):
+            prev = self._runs.pop()
+            merged_keys, merged_sizes = array("Q"), array("q")
+            for key, size in heapq.merge(zip(*prev), zip(*run)):
+                merged_keys.append(key)
+                merged_sizes.append(size)
+            run = (merged_keys, merged_sizes)
+        self._runs.append(run)
+
+    def _items(self) -> Iterator[Tuple[int, int]]:
+        yield from list(self._pending.items())
+        for keys, sizes in self._runs:
+            yield from zip(keys, sizes)
+
+
+class ScanIndex:
+    """On-disk cache of directory listings for incremental scans (SQLite).
+
+    One row per directory: its mtime, the count/size of the files directly in it,
+    its subdirectory names and its biggest files (all files for levels 0-1, which
+    feed the level buckets by name). A directory whose mtime is unchanged is not
+    listed again: its row is reused and only its subdirectories are stat'ed.
+    Adding, removing or renaming entries bumps the parent's mtime; a file
+    rewritten in place does not, so a reused row can hold stale file sizes.
+    That is why the index is opt-in (scan --incremental): plain scans list
+    every folder.
+    """
+
+    # A directory modified this close to the moment it was listed may change
+    # again within the same mtime tick, so such rows are never trusted.
+    RACY_NS = 2_000_000_000
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY, mtime_ns INTEGER, listed_ns INTEGER,"
+            " files INTEGER, bytes INTEGER, skipped INTEGER, kept INTEGER,"
+            " subdirs TEXT, top TEXT)"
+        )
+        self._pending: List[tuple] = []
+
+    def lookup(self, path: str, mtime_ns: int, level: int, top_files: int):
+        """Return (files, bytes, skipped, subdirs, top) if the row can be reused."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT mtime_ns, listed_ns, files, bytes, skipped, kept, subdirs, top FROM dirs WHERE path=?",
+                (path,),
+            ).fetchone()
+        if row is None:
+            return None
+        mtime, listed, files, size, skipped, kept, subdirs, top = row
+        if mtime != mtime_ns or listed - mtime < self.RACY_NS:
+            return None
+        # Rows from a run with a smaller --files keep too few candidates.
+        if files > kept and (level <= 1 or kept < top_files):
+            return None
+        return files, size, skipped, json.loads(subdirs), json.loads(top)
+
+    def record(self, path: str, mtime_ns: int, listed_ns: int, files: int, size: int, skipped: int,
+               kept: int, subdirs: List[str], top: List[Tuple[str, int]]) -> None:
+        row = (path, mtime_ns, listed_ns, files, size, skipped, kept,
+               json.dumps(subdirs, ensure_ascii=False), json.dumps(top, ensure_ascii=False))
+        with self._lock:
+            old = self._db.execute("SELECT subdirs FROM dirs WHERE path=?", (path,)).fetchone()
+            if old:
+                for name in set(json.loads(old[0])) - set(subdirs):
+                    self._forget(os.path.join(path, name))
+            self._pending.append(row)
+            if len(self._pending) >= 1000:
+                self._flush()
+
+    def _forget(self, path: str) -> None:
+        # Drop a vanished directory and everything below it.
+        lo = os.path.join(path, "")
+        hi = lo[:-1] + chr(ord(lo[-1]) + 1)
+        self._db.execute("DELETE FROM dirs WHERE path=? OR (path>=? AND path<?)", (path, lo, hi))
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._db.executemany("INSERT OR REPLACE INTO dirs VALUES (?,?,?,?,?,?,?,?,?)", self._pending)
+            self._pending.clear()
+
+    def commit(self) -> None:
+        with self._lock:
+            self._flush()
+            self._db.commit()
+
+    def close(self) -> None:
+        self.commit()
+        self._db.close()
+
+
+def _child_item(path: str, name: str, parent: tuple, tree: Optional[DirTree]) -> tuple:
+    _, level, k1, k2, node = parent
+    child = tree.add(node, name) if tree is not None else -1
+    if level == 0:
+        return (path, 1, name, None, child)
+    if level == 1:
+        return (path, 2, k1, os.path.join(k1, name), child)
+    return (path, level + 1, k1, k2, child)
+
+
+def _scan_dir(item: tuple, depth: int, top_files: int, part: _ScanPartial, push,
+              index: Optional[ScanIndex] = None, reuse: bool = True,
+              tree: Optional[DirTree] = None, exclude: frozenset = frozenset(),
+              frontier: Optional[list] = None, links: Optional[_LinkSet] = None,
+              throttle: Optional["IoThrottle"] = None) -> None:
+    """List one directory: account its files into *part*, hand subdirectories to *push*.
+
+    *item* is (path, level, level-1 key, level-2 key, tree node); the keys are
+    carried down from the parent so no path is split or made relative per entry.
+    Metadata is fetched at most once per entry: on Windows DirEntry.stat() is
+    served from the directory listing itself, elsewhere only regular files are
+    stat'ed.
+    With an *index*, unchanged directories are taken from it instead of listed.
+    Directories in *exclude* (normcased paths) are not descended into.
+    Subdirectories just below the depth limit go to *frontier*, if given, so a
+    later pass can continue the walk from there.
+    With *links*, files with more than one hard link are counted once in
+    bytes_unique (index rows carry no inode numbers, so every directory is
+    listed; on Windows this costs one extra stat per file, since the listing
+    does not return st_nlink/st_ino).
+    With stats.profile set, the visit is timed per phase; otherwise the only
+    cost is a flag test around each stat.
+    A *throttle* is charged for the listing and its stats once the directory is done.
+    """
+    cur, level, k1, k2, node = item
+    stats = part.stats
+    prof = stats.profile
+    timing = prof is not None
+    if timing:
+        clock = time.perf_counter
+        t_visit = clock()
+        t_stat = t_top = t_agg = 0.0
+    lvl1, lvl2, heap = part.lvl1, part.lvl2, part.file_heap
+    descend = depth < 0 or level < depth
+    if not descend and frontier is not None:
+        descend, push = True, frontier.append
+    n_files = own = stat_calls = skipped = denied = errors = 0
+    n_links = n_dup = dup = 0
+    rec_dirs = rec_files = row = None
+    if index is not None:
         try:
+            mtime_ns = os.stat(cur).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        stat_calls += 1
+        row = (index.lookup(cur, mtime_ns, level, top_files)
+               if reuse and links is None and mtime_ns is not None else None)
+        if row is not None:
+            n_files, own, skipped, subdirs, top = row
+            for name, sz in top:
+                if level == 0:
+                    lvl1[name] = lvl1.get(name, 0) + sz
+                elif level == 1:
+                    name2 = os.path.join(k1, name)
+                    lvl2[name2] = lvl2.get(name2, 0) + sz
+                _push_top(heap, top_files, sz, os.path.join(cur, name))
+            if descend:
+                for name in subdirs:
+                    path = os.path.join(cur, name)
+                    if not (exclude and os.path.normcase(path) in exclude):
+                        push(_child_item(path, name, item, tree))
+            stats.dirs_reused += 1
+        elif mtime_ns is not None:
+            rec_dirs, rec_files = [], []
+            listed_ns = time.time_ns()
+    try:
+        if row is None:
             with os.scandir(cur) as it:
                 for entry in it:
                     try:
                         if entry.is_symlink():
                             continue
-                        full = entry.path
-                        if is_reparse_point(full):
-                            stats.skipped_reparse += 1
-                            continue
-
-                        if entry.is_dir(follow_symlinks=False):
-                            rel_parts = len(Path(full).parts) - root_parts_len
-                            if depth < 0 or rel_parts <= depth:
-                                stack.append(full)
-                        elif entry.is_file(follow_symlinks=False):
+                        if _WINDOWS:
+                            if timing:
+                                t = clock()
                             st = entry.stat(follow_symlinks=False)
-                            sz = int(getattr(st, "st_size", 0))
-                            stats.files_scanned += 1
-                            stats.bytes_total += sz
+                            if timing:
+                                t_stat += clock() - t
+                            stat_calls += 1
+                            if st.st_file_attributes & REPARSE_POINT_ATTR:
+                                skipped += 1
+                                continue
+                            is_dir = S_ISDIR(st.st_mode)
+                            is_file = not is_dir and S_ISREG(st.st_mode)
+                        else:
+                            st = None
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                            is_file = not is_dir and entry.is_file(follow_symlinks=False)
 
-                            try:
-                                rel = os.path.relpath(full, root)
-                            except Exception:
-                                rel = full
-                            parts = rel.split(os.sep)
-                            if len(parts) >= 1:
-                                lvl1[parts[0]] = lvl1.get(parts[0], 0) + sz
-                            if len(parts) >= 2:
-                                k2 = os.path.join(parts[0], parts[1])
-                                lvl2[k2] = lvl2.get(k2, 0) + sz
-
-                            add_file(sz, full)
+                        if is_dir:
+                            if rec_dirs is not None:
+                                rec_dirs.append(entry.name)
+                            if descend and not (exclude and os.path.normcase(entry.path) in exclude):
+                                push(_child_item(entry.path, entry.name, item, tree))
+                        elif is_file:
+                            if st is None:
+                                if timing:
+                                    t = clock()
+                                st = entry.stat(follow_symlinks=False)
+                                if timing:
+                                    t_stat += clock() - t
+                                stat_calls += 1
+                            sz = st.st_size
+                            n_files += 1
+                            own += sz
+                            if links is not None:
+                                if _WINDOWS:
+                                    if timing:
+                                        t = clock()
+                                    st = os.stat(entry.path, follow_symlinks=False)
+                                    if timing:
+                                        t_stat += clock() - t
+                                    stat_calls += 1
+                                if st.st_nlink > 1:
+                                    n_links += 1
+                                    if not links.add(st.st_dev, st.st_ino, sz):
+                                        n_dup += 1
+                                        dup += sz
+                            if rec_files is not None:
+                                rec_files.append((sz, entry.name))
+                            if level == 0:
+                                lvl1[entry.name] = lvl1.get(entry.name, 0) + sz
+                            elif level == 1:
+                                name2 = os.path.join(k1, entry.name)
+                                lvl2[name2] = lvl2.get(name2, 0) + sz
+                            if top_files > 0 and (len(heap) < top_files or sz >= heap[0][0]):
+                                if timing:
+                                    t = clock()
+                                _push_top(heap, top_files, sz, entry.path)
+                                if timing:
+                                    t_top += clock() - t
                     except PermissionError:
-                        stats.denied += 1
+                        denied += 1
                     except FileNotFoundError:
-                        stats.errors += 1
+                        errors += 1
                     except OSError:
-                        stats.errors += 1
-        except PermissionError:
-            stats.denied += 1
-        except FileNotFoundError:
-            stats.errors += 1
-        except OSError:
-            stats.errors += 1
+                        errors += 1
+    except PermissionError:
+        denied += 1
+    except FileNotFoundError:
+        errors += 1
+    except OSError:
+        errors += 1
+    finally:
+        if timing:
+            t = clock()
+        # Level buckets are updated once per directory, not once per file.
+        if n_files and level >= 1:
+            lvl1[k1] = lvl1.get(k1, 0) + own
+            if level >= 2:
+                lvl2[k2] = lvl2.get(k2, 0) + own
+        if tree is not None:
+            tree.set_own(node, own, n_files)
+        stats.dirs_scanned += 1
+        stats.files_scanned += n_files
+        stats.bytes_total += own
+        stats.bytes_unique += own - dup
+        stats.hardlinks += n_links
+        stats.hardlinks_deduped += n_dup
+        stats.stat_calls += stat_calls
+        stats.skipped_reparse += skipped
+        stats.denied += denied
+        stats.errors += errors
+        if timing:
+            t_agg += clock() - t
 
-    stats.elapsed_sec = round(time.time() - t0, 2)
-    top1 = sorted(lvl1.items(), key=lambda x: x[1], reverse=True)[:top_dirs]
-    top2 = sorted(lvl2.items(), key=lambda x: x[1], reverse=True)[:top_dirs]
-    top_files_list = sorted([(p, sz) for (sz, p) in file_heap], key=lambda x: x[1], reverse=True)
-    return ScanResult(stats=stats, top_dirs_level1=top1, top_dirs_level2=top2, top_files=top_files_list)
+    # Listings with errors are not recorded, so they are read again next time.
+    if rec_dirs is not None and not (denied or errors):
+        kept = n_files if level <= 1 else min(n_files, top_files)
+        top = [(name, sz) for sz, name in heapq.nlargest(kept, rec_files)] if kept else []
+        index.record(cur, mtime_ns, listed_ns, n_files, own, skipped, kept, rec_dirs, top)
+    if timing:
+        visit = clock() - t_visit
+        prof.stat_sec += t_stat
+        prof.top_n_sec += t_top
+        prof.aggregate_sec += t_agg
+        prof.scandir_sec += visit - t_stat - t_top - t_agg
+        prof.add_dir(cur, visit)
+    if throttle is not None:
+        throttle.charge(1, stat_calls)
 
 
-def print_drive_table() -> List[Dict[str, str]]:
-    rows = []
-    print("=== Drives ===")
-    for d in list_drives():
-        try:
-            du = shutil.disk_usage(d)
-            used = du.total - du.free
-            print(f"{d}  Total: {format_gb(du.total)} | Used: {format_gb(used)} | Free: {format_gb(du.free)}")
-            rows.append({"drive": d, "total_gb": f"{du.total/(1024**3):.2f}", "free_gb": f"{du.free/(1024**3):.2f}"})
-        except Exception as e:
-            print(f"{d}  (error reading usage: {e})")
-            rows.append({"drive": d, "error": str(e)})
-    print()
-    return rows
+class IoThrottle:
+    """Caps the rate of directory listings and stats of a scan (shared by all its threads).
 
+    Each budget is a virtual clock that advances 1/rate per operation; a
+    caller that gets ahead of it by more than *burst* seconds sleeps until
+    the clock catches up. A rate of 0 leaves that budget uncapped.
+    """
+
+    def __init__(self, dirs_per_sec: float = 0, stats_per_sec: float = 0, burst: float = 0.25):
+        self.dirs_per_sec = dirs_per_sec
+        self.stats_per_sec = stats_per_sec
+        self.burst = burst
+        self.slept_sec = 0.0
+        self._dirs_t = self._stats_t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def charge(self, dirs: int, stats: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            due = now
+            if self.dirs_per_sec > 0:
+                self._dirs_t = max(self._dirs_t, now - self.burst) + dirs / self.dirs_per_sec
+                due = max(due, self._dirs_t)
+            if self.stats_per_sec > 0:
+                self._stats_t = max(self._stats_t, now - self.burst) + stats / self.stats_per_sec
+                due = max(due, self._stats_t)
+            wait_sec = due - now - self.burst
+            if wait_sec > 0:
+                self.slept_sec += wait_sec
+        if wait_sec > 0:
+            time.sleep(wait_sec)
+
+
+class _LargestFirst:
+    """Pending directories for a time-budgeted walk, grouped by their level-1 folder.
+
+    pop() goes depth-first inside the level-1 subtree with the largest
+    estimated size: bytes found there so far plus, for its pending
+    directories, the average found per directory already listed in it.
+    Subtrees not listed at all yet come first, so each one gets an estimate.
+    The pick is redone every RESELECT pops. Drop-in for the walker's list stack.
+    """
+
+    RESELECT = 32
+
+    def __init__(self, items: List[tuple], lvl1: Dict[str, int]):
+        self._lvl1 = lvl1  # the walking partial's level-1 sizes, updated as directories are listed
+        self._stacks: Dict[Optional[str], List[tuple]] = {}
+        self._listed: Dict[Optional[str], int] = {}
+        self._len = 0
+        self._cur: Optional[List[tuple]] = None
+        self._pops = 0
+        for item in items:
+            self.append(item)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[tuple]:
+        for stack in self._stacks.values():
+            yield from stack
+
+    def append(self, item: tuple) -> None:
+        self._stacks.setdefault(item[2], []).append(item)
+        self._len += 1
+
+    def pop(self) -> tuple:
+        if not self._cur or self._pops % self.RESELECT == 0:
+            self._cur = max((st for st in self._stacks.values() if st), key=self._estimate)
+        self._pops += 1
+        self._len -= 1
+        item = self._cur.pop()
+        self._listed[item[2]] = self._listed.get(item[2], 0) + 1
+        return item
+
+    def _estimate(self, stack: List[tuple]) -> float:
+        k1 = stack[0][2]
+        listed = self._listed.get(k1, 0)
+        if k1 is None or not listed:
+            return float("inf")
+        size = self._lvl1.get(k1, 0)
+        return size + size / listed * len(stack)
+
+
+def _note_pending(part: _ScanPartial, items) -> None:
+    # Directories found but not listed when a walk stops, per level-1 folder.
+    for item in items:
+        k1 = item[2] or ""
+        part.pending[k1] = part.pending.get(k1, 0) + 1
+        part.stats.dirs_pending += 1
+
+
+class _WorkQueue:
+    """Shared directory pool for the parallel walker.
+
+    Each worker walks its own stack depth-first and only gives work back
+    (the shallowest, i.e. biggest, pending subtrees) while another worker is idle,
+    so the lock is taken rarely. The walk is over when every worker is idle.
+    """
+
+    def __init__(self, items: List[tuple], workers: int):
+        self._items = list(items)
+        self._workers = workers
+        self._idle = 0
+        self._done = False
+        self._cv = threading.Condition()
+
+    @property
+    def hungry(self) -> bool:
+        # Racy read on purpose: a stale answer only delays or skips one hand-off.
+        return self._idle > 0 and not self._items
+
+    def get(self):
+        with self._cv:
+            while not self._items:
+                if self._done:
+                    return None
+                self._idle += 1
+                if self._idle == self._workers:
+                    self._done = True
+                    self._cv.notify_all()
+                    return None
+                self._cv.wait()
+                self._idle -= 1
+            return self._items.pop()
+
+    def share(self, stack: List[tuple]) -> None:
+        n = len(stack) // 2
+        if n <= 0:
+            return
+        with self._cv:
+            self._items.extend(stack[:n])
+            del stack[:n]
+            self._cv.notify_all()
+
+    def abort(self) -> List[tuple]:
+        """Stop all workers; returns the items nobody took."""
+        with self._cv:
+            self._done = True
+            items, self._items = self._items, []
+            self._cv.notify_all()
+        return items
+
+
+def _add_stats(dst: ScanStats, src: ScanStats) -> None:
+    for f in fields(ScanStats):
+        v = getattr(src, f.name)
+        if type(v) is int and f.name != "depth":
+            setattr(dst, f.name, getattr(dst, f.name) + v)
+    dst.cancelled = dst.cancelled or src.cancelled
+    dst.budget_exhausted = dst.budget_exhausted or src.budget_exhausted
+    if src.profile is not None:
+        if dst.profile is None:
+            dst.profile = ScanProfile()
+        dst.profile.merge(src.profile)
+
+
+def _merge_links(into: _ScanPartial, links: Optional[_LinkSet]) -> None:
+    # Inodes counted in both walks are taken out of bytes_unique once more.
+    if links is None:
+        return
+    if into.links is None:
+        into.links = _LinkSet()
+    n, dup = into.links.merge(links)
+    into.stats.hardlinks_deduped += n
+    into.stats.bytes_unique -= dup
+
+
+def _merge_partials(into: _ScanPartial, parts: List[_ScanPartial], top_files: int) -> _ScanPartial:
+    lvl1, lvl2, heap = into.lvl1, into.lvl2, into.file_heap
+    for part in parts:
+        _add_stats(into.stats, part.stats)
+        for k, v in part.lvl1.items():
+            lvl1[k] = lvl1.get(k, 0) + v
+        for k, v in part.lvl2.items():
+            lvl2[k] = lvl2.get(k, 0) + v
+        heap.extend(part.file_heap)
+        _merge_links(into, part.links)
+        for k, v in part.pending.items():
+            into.pending[k] = into.pending.get(k, 0) + v
+    t = time.perf_counter()
+    into.file_heap = heapq.nlargest(top_files, heap) if top_files > 0 else []
+    heapq.heapify(into.file_heap)
+    if into.stats.profile is not None:
+        into.stats.profile.top_n_sec += time.perf_counter() - t
+    return into
 
-from dataclasses import dataclass
 
 @dataclass
-class CleanupAction:
-    name: str
-    description: str
-    targets: List[str]
-    needs_admin: bool = False
+class ScanProgress:
+    """Event yielded by iter_scan(); the last one has done=True and the result."""
+    root: str
+    dirs_scanned: int
+    files_scanned: int
+    bytes_total: int
+    elapsed_sec: float
+    top_dirs_level1: List[Tuple[str, int]]
+    done: bool = False
+    result: Optional[ScanResult] = None
 
 
-def expand_globs(patterns: List[str]) -> List[Path]:
-    out: List[Path] = []
-    for pat in patterns:
-        pat2 = os.path.expandvars(pat)
-        p = Path(pat2)
-        if "*" in pat2 or "?" in pat2:
-            parent = p.parent
-            if parent.exists():
-                out.extend(list(parent.glob(p.name)))
-            else:
-                out.append(p)
-        else:
-            out.append(p)
-    uniq, seen = [], set()
-    for p in out:
-        s = str(p).lower()
-        if s not in seen:
-            uniq.append(p)
-            seen.add(s)
-    return uniq
+def _progress(root: str, parts: List[_ScanPartial], t0: float, top_dirs: int) -> ScanProgress:
+    # Reads counters other threads are still updating: the numbers are a
+    # snapshot, not a consistent cut, which is all a progress line needs.
+    dirs = files = size = 0
+    lvl1: Dict[str, int] = {}
+    for part in parts:
+        st = part.stats
+        dirs += st.dirs_scanned
+        files += st.files_scanned
+        size += st.bytes_total
+        for k, v in list(part.lvl1.items()):
+            lvl1[k] = lvl1.get(k, 0) + v
+    top1 = heapq.nlargest(top_dirs, lvl1.items(), key=lambda x: (x[1], x[0]))
+    return ScanProgress(root=root, dirs_scanned=dirs, files_scanned=files, bytes_total=size,
+                        elapsed_sec=round(time.time() - t0, 2), top_dirs_level1=top1)
 
 
-def remove_path(p: Path) -> Tuple[bool, str]:
-    try:
-        if not p.exists():
-            return True, "not_found"
-        if p.is_symlink():
-            return True, "skip_symlink"
-        if is_reparse_point(str(p)):
-            return True, "skip_reparse_point"
-        if p.is_file():
-            p.unlink()
-            return True, "deleted_file"
-        if p.is_dir():
-            shutil.rmtree(p, ignore_errors=False)
-            return True, "deleted_dir"
-        return True, "unknown_type"
-    except PermissionError as e:
-        return False, f"permission_denied: {e}"
-    except Exception as e:
-        return False, f"error: {e}"
+def _walk(root: str, starts: List[tuple], depth: int, top_dirs: int, top_files: int, workers: int,
+          index: Optional[ScanIndex], reuse: bool, tree: Optional[DirTree], cancel: threading.Event,
+          interval: float, exclude: frozenset = frozenset(), frontier: Optional[list] = None,
+          done_parts: Tuple[_ScanPartial, ...] = (), dedupe_links: bool = False, profile: bool = False,
+          throttle: Optional[IoThrottle] = None, deadline: Optional[float] = None):
+    """Generator behind iter_scan(): walks from *starts*, yields progress, returns the merged _ScanPartial.
 
+    *done_parts* are earlier passes over the same root, included in progress events.
+    With a *deadline* (time.monotonic()) the walk stops there, sets *cancel* for
+    the other walks of the run and goes largest level-1 subtree first
+    (_LargestFirst, one thread) so the time goes where most of the bytes are.
+    """
+    t0 = time.time()
+    links = _LinkSet() if dedupe_links else None
+    visit = functools.partial(_scan_dir, depth=depth, top_files=top_files, index=index, reuse=reuse,
+                              tree=tree, exclude=exclude, frontier=frontier, links=links, throttle=throttle)
+    next_emit = time.monotonic() + interval
 
-def cleanup(actions: List[CleanupAction], yes: bool, outdir: Path) -> Dict[str, object]:
-    report = {
-        "generated_at": datetime.now().isoformat(timespec="seconds"),
-        "is_admin": is_admin(),
-        "mode": "EXECUTE" if yes else "DRY_RUN",
-        "actions": [],
-    }
+    def new_partial() -> _ScanPartial:
+        return _ScanPartial(stats=ScanStats(root=root, depth=depth, profile=ScanProfile() if profile else None))
+
+    if workers <= 1 or deadline is not None:
+        part = new_partial()
+        parts = [part]
+        stack = _LargestFirst(starts, part.lvl1) if deadline is not None else list(starts)
+        try:
+            while stack and not cancel.is_set():
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                visit(stack.pop(), part=part, push=stack.append)
+                if time.monotonic() >= next_emit:
+                    yield _progress(root, [*done_parts, *parts], t0, top_dirs)
+                    next_emit = time.monotonic() + interval
+        except KeyboardInterrupt:
+            cancel.set()
+        finally:
+            if stack:
+                cancel.set()
+                _note_pending(part, stack)
+        cancelled = bool(stack)
+    else:
+        queue = _WorkQueue(starts, workers)
+        parts = [new_partial() for _ in range(workers)]
+        aborted: List[bool] = []
+
+        def worker(part: _ScanPartial) -> None:
+            try:
+                while True:
+                    cur = queue.get()
+                    if cur is None:
+                        return
+                    stack = [cur]
+                    while stack:
+                        if cancel.is_set():
+                            aborted.append(True)
+                            _note_pending(part, stack)
+                            _note_pending(part, queue.abort())
+                            return
+                        visit(stack.pop(), part=part, push=stack.append)
+                        if len(stack) > 1 and queue.hungry:
+                            queue.share(stack)
+            except BaseException:
+                queue.abort()
+                raise
+
+        ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+        futures = [ex.submit(worker, part) for part in parts]
+        try:
+            # Short waits keep Ctrl+C responsive on Windows.
+            while wait(futures, timeout=min(interval, 0.25))[1]:
+                if time.monotonic() >= next_emit:
+                    yield _progress(root, [*done_parts, *parts], t0, top_dirs)
+                    next_emit = time.monotonic() + interval
+        except KeyboardInterrupt:
+            cancel.set()
+        finally:
+            if not all(f.done() for f in futures):
+                cancel.set()
+            ex.shutdown(wait=True)
+        for fut in futures:
+            fut.result()
+        cancelled = bool(aborted)
+
+    if index is not None:
+        index.commit()
+    merged = _merge_partials(new_partial(), parts, top_files)
+    merged.stats.cancelled = cancelled
+    merged.stats.budget_exhausted = cancelled and deadline is not None and time.monotonic() >= deadline
+    merged.links = links
+    return merged
+
+
+def _finish(part: _ScanPartial, top_dirs: int, levels: int, t0: float) -> ScanResult:
+    stats = part.stats
+    stats.elapsed_sec = round(time.time() - t0, 2)
+    if part.links is not None:
+        stats.hardlinks_untracked = part.links.untracked
+    clock = time.perf_counter
+    t = clock()
+    by_size = lambda x: (x[1], x[0])
+    top1 = sorted(part.lvl1.items(), key=by_size, reverse=True)[:top_dirs]
+    top2 = sorted(part.lvl2.items(), key=by_size, reverse=True)[:top_dirs]
+    top_files_list = sorted([(p, sz) for (sz, p) in part.file_heap], key=by_size, reverse=True)
+    t_top, t_agg = clock() - t, 0.0
+    by_level: Dict[int, List[Tuple[str, int]]] = {}
+    tree = part.tree
+    if tree is not None:
+        t = clock()
+        tree.finalize()
+        t_agg = clock() - t
+        for lvl in range(1, levels + 1):
+            by_level[lvl] = tree.biggest(lvl, top_dirs)
+        t_top += clock() - t - t_agg
+    prof = stats.profile
+    if prof is not None:
+        prof.top_n_sec += t_top
+        prof.aggregate_sec += t_agg
+        prof.slowest_dirs = sorted(prof.slowest_dirs, reverse=True)
+    unfinished = sorted(part.pending.items(), key=lambda x: (-x[1], x[0]))
+    return ScanResult(stats=stats, top_dirs_level1=top1, top_dirs_level2=top2, top_files=top_files_list,
+                      top_dirs_by_level=by_level, tree=tree, nested_roots=list(part.nested),
+                      unfinished_level1=unfinished)
+
+
+def iter_scan(root: str, depth: int, top_dirs: int, top_files: int, workers: int = 1,
+              index: Optional[ScanIndex] = None, reuse: bool = True, levels: int = 0,
+              cancel: Optional[threading.Event] = None, interval: float = 0.5,
+              dedupe_links: bool = False, profile: bool = False, throttle: Optional[IoThrottle] = None,
+              budget: Optional[float] = None, keep_tree: bool = False) -> Iterator[ScanProgress]:
+    """Walk *root* and collect sizes, yielding a ScanProgress at most every *interval* seconds.
+
+    workers > 1 lists directories on a thread pool (os.scandir releases the GIL),
+    which pays off when the walk is bound by per-directory latency. The result
+    is the same as for a single-threaded walk.
+    With an *index*, unchanged directories are taken from it (unless reuse=False)
+    and every directory that is read is recorded for the next run.
+    levels > 0 also builds the full DirTree and fills top_dirs_by_level for
+    levels 1..N; keep_tree=True builds the tree alone (for write_snapshot()).
+    Setting *cancel* (or Ctrl+C, or closing the generator) stops the walk
+    between directories: the final result then covers exactly the directories
+    listed so far and has stats.cancelled set.
+    dedupe_links=True counts each hard-linked file once in stats.bytes_unique
+    (bytes_total, the level buckets and the tree stay apparent sizes).
+    profile=True fills stats.profile (ScanProfile) with per-phase timings.
+    A *throttle* (IoThrottle) caps listings and stats per second. With a
+    *budget* (seconds) the walk stops when it runs out, largest level-1
+    subtrees first; the result then has stats.budget_exhausted, dirs_pending
+    and the level-1 folders left unfinished.
+    """
+    t0 = time.time()
+    root = os.path.abspath(root)
+    tree = DirTree(root) if levels > 0 or keep_tree else None
+    deadline = time.monotonic() + budget if budget is not None else None
+    part = yield from _walk(root, [(root, 0, None, None, 0)], depth, top_dirs, top_files, workers, index, reuse,
+                            tree, cancel or threading.Event(), interval, dedupe_links=dedupe_links, profile=profile,
+                            throttle=throttle, deadline=deadline)
+    part.tree = tree
+    res = _finish(part, top_dirs, levels, t0)
+    st = res.stats
+    yield ScanProgress(root=root, dirs_scanned=st.dirs_scanned, files_scanned=st.files_scanned,
+                       bytes_total=st.bytes_total, elapsed_sec=st.elapsed_sec,
+                       top_dirs_level1=res.top_dirs_level1, done=True, result=res)
+
+
+def scan_root(root: str, depth: int, top_dirs: int, top_files: int, **kwargs) -> ScanResult:
+    """Blocking form of iter_scan(): walk *root* and return the ScanResult."""
+    for ev in iter_scan(root, depth, top_dirs, top_files, interval=float("inf"), **kwargs):
+        if ev.done:
+            return ev.result
+
+
+def _attribute_nested(into: _ScanPartial, inner: _ScanPartial, inner_tree: Optional[DirTree], tree_nodes: int,
+                      rel: List[str], max_level: int, top_files: int) -> None:
+    """Add a nested root's walk to a root containing it, at relative path *rel*."""
+    st = inner.stats
+    _add_stats(into.stats, st)
+    _merge_links(into, inner.links)
+    p0 = rel[0]
+    if st.files_scanned:
+        into.lvl1[p0] = into.lvl1.get(p0, 0) + st.bytes_total
+    if len(rel) == 1:
+        # Inner level-1 buckets (its files and folders) are level 2 of the outer root.
+        for k, v in inner.lvl1.items():
+            k2 = os.path.join(p0, k)
+            into.lvl2[k2] = into.lvl2.get(k2, 0) + v
+    elif st.files_scanned:
+        k2 = os.path.join(p0, rel[1])
+        into.lvl2[k2] = into.lvl2.get(k2, 0) + st.bytes_total
+    if st.dirs_pending:
+        into.pending[p0] = into.pending.get(p0, 0) + st.dirs_pending
+    for sz, p in inner.file_heap:
+        _push_top(into.file_heap, top_files, sz, p)
+    if into.tree is not None and inner_tree is not None:
+        into.tree.finalize()
+        node = into.tree.node_of(os.path.join(*rel[:-1]) if len(rel) > 1 else "")
+        if node >= 0:
+            into.tree.graft(node, rel[-1], inner_tree, max_level, tree_nodes)
+    into.nested.append(st.root)
+
+
+def scan_roots(roots: List[str], depth: int, top_dirs: int, top_files: int, workers: int = 1,
+               index: Optional[ScanIndex] = None, reuse: bool = True, levels: int = 0,
+               cancel: Optional[threading.Event] = None, interval: float = 0.5,
+               on_progress=None, dedupe_links: bool = False, profile: bool = False,
+               throttle: Optional[IoThrottle] = None, budget: Optional[float] = None,
+               on_result=None, keep_tree: bool = False) -> Tuple[List[ScanResult], Dict[str, object]]:
+    """Scan several roots concurrently, walking overlapping subtrees once.
+
+    Roots are normalized and de-duplicated. A root nested inside another one is
+    walked once, as itself, and attributed to every root whose walk would reach
+    it. With a depth limit the nested walk runs in passes cut at the depth each
+    container would stop at, so every root gets exactly what a walk of its own
+    would have counted. *on_progress* is called from the scanning threads with
+    each ScanProgress. *on_result* is called from the calling thread with each
+    ScanResult as soon as it is final, i.e. when the walks of the root and of
+    the roots nested in it are done, so reports can be written root by root.
+    *throttle* is shared by all the walks; *budget* is one deadline for the
+    whole run; *levels* and *keep_tree* as in iter_scan.
+    Returns the per-root results (input order) and a cross-root rollup.
+    """
+    t0 = time.time()
+    cancel = cancel or threading.Event()
+    deadline = time.monotonic() + budget if budget is not None else None
+    norm: Dict[str, str] = {}
+    for r in roots:
+        r = os.path.normpath(os.path.abspath(os.path.expandvars(r)))
+        norm.setdefault(os.path.normcase(r), r)
+    keys = list(norm)
+
+    def rel_parts(inner: str, outer: str) -> List[str]:
+        return os.path.relpath(norm[inner], norm[outer]).split(os.sep)
+
+    # containers[k]: roots whose walk reaches k, with the level k sits at in them.
+    containers: Dict[str, Dict[str, int]] = {k: {} for k in keys}
+    for k in keys:
+        for o in keys:
+            if o != k and k.startswith(os.path.join(o, "")):
+                lb = len(rel_parts(k, o))
+                if depth < 0 or lb <= depth:
+                    containers[k][o] = lb
+
+    def run(k: str):
+        # One pass per distinct cut-off: band i covers levels (cut[i-1], cut[i]].
+        cuts = sorted({depth - lb for lb in containers[k].values()} | {depth}) if depth >= 0 else [depth]
+        tree = DirTree(norm[k]) if levels > 0 or keep_tree else None
+        exclude = frozenset(j for j in keys if k in containers[j])
+        starts: List[tuple] = [(norm[k], 0, None, None, 0)]
+        bands: List[_ScanPartial] = []
+        for i, cut in enumerate(cuts):
+            frontier: Optional[list] = [] if i + 1 < len(cuts) else None
+            gen = _walk(norm[k], starts, cut, top_dirs, top_files, workers, index, reuse, tree, cancel,
+                        interval, exclude=exclude, frontier=frontier, done_parts=tuple(bands),
+                        dedupe_links=dedupe_links, profile=profile, throttle=throttle, deadline=deadline)
+            try:
+                while True:
+                    ev = next(gen)
+                    if on_progress is not None:
+                        on_progress(ev)
+            except StopIteration as stop:
+                bands.append(stop.value)
+            if not frontier or cancel.is_set():
+                if frontier:
+                    _note_pending(bands[-1], frontier)
+                break
+            starts = frontier
+        return cuts, bands, tree, len(tree) if tree is not None else 0
+
+    walks: Dict[str, tuple] = {}
+
+    def own(k: str, max_level: int) -> _ScanPartial:
+        # Merge the passes of k's own walk down to max_level (-1: all of them).
+        cuts, bands = walks[k][:2]
+        picked = [b for c, b in zip(cuts, bands) if max_level < 0 or c <= max_level]
+        return _merge_partials(_ScanPartial(stats=ScanStats(root=norm[k], depth=depth)), picked, top_files)
+
+    parts: Dict[str, _ScanPartial] = {}
+    done: Dict[str, ScanResult] = {}
+
+    def finish_ready() -> None:
+        # Finish every root whose own walk and nested walks are all in.
+        for k in keys:
+            nested = [j for j in keys if k in containers[j]]
+            if k in done or k not in walks or any(j not in walks for j in nested):
+                continue
+            part = own(k, -1)
+            part.tree = walks[k][2]
+            # Shallower nested roots first: a deeper one is grafted inside their tree.
+            for j in sorted(nested, key=len):
+                max_level = depth - containers[j][k] if depth >= 0 else -1
+                _attribute_nested(part, own(j, max_level), walks[j][2], walks[j][3], rel_parts(j, k), max_level,
+                                  top_files)
+            parts[k] = part
+            done[k] = _finish(part, top_dirs, levels, t0)
+            if on_result is not None:
+                on_result(done[k])
+
+    with ThreadPoolExecutor(max_workers=max(len(keys), 1), thread_name_prefix="root") as ex:
+        futures = {ex.submit(run, k): k for k in keys}
+        running = set(futures)
+        try:
+            while running:
+                finished, running = wait(running, timeout=0.25, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    walks[futures[fut]] = fut.result()
+                finish_ready()
+        except KeyboardInterrupt:
+            cancel.set()
+        for fut, k in futures.items():
+            walks[k] = fut.result()
+    finish_ready()
+
+    results = [done[k] for k in keys]
+    outermost = [k for k in keys if not containers[k]]
+    heap: List[Tuple[int, str]] = []
+    everything = _ScanPartial(stats=ScanStats(root="", depth=depth))
+    for k in outermost:
+        heap.extend(parts[k].file_heap)
+        _add_stats(everything.stats, parts[k].stats)
+        _merge_links(everything, parts[k].links)
+    top = heapq.nlargest(top_files, heap) if top_files > 0 else []
+    rollup = {
+        "roots": [norm[k] for k in outermost],
+        "nested": {norm[k]: [norm[o] for o in containers[k]] for k in keys if containers[k]},
+        "files_scanned": everything.stats.files_scanned,
+        "dirs_scanned": everything.stats.dirs_scanned,
+        "bytes_total": everything.stats.bytes_total,
+        "bytes_unique": everything.stats.bytes_unique,
+        "cancelled": any(p.stats.cancelled for p in parts.values()),
+        "budget_exhausted": any(p.stats.budget_exhausted for p in parts.values()),
+        "dirs_pending": everything.stats.dirs_pending,
+        "elapsed_sec": round(time.time() - t0, 2),
+        "top_files": [(p, sz) for sz, p in top],
+    }
+    return results, rollup
+
+
+APPROX_DELTA = 0.05  # miss rate the approx_scan() ranges are built for; not a guarantee (see approx_scan)
+
+
+@dataclass
+class SizeEstimate:
+    """One level-1 folder in approx_scan(): exact=True for walked-in-full sizes, else a sampled estimate.
+
+    low..high is the likely range of an estimate (low is never below the
+    bytes actually seen); for exact rows it is just the size.
+    """
+    path: str
+    bytes: int
+    files: int
+    exact: bool
+    low: int
+    high: int
+    probes: int = 0
+    dirs_listed: int = 0
+
+
+@dataclass
+class ApproxScanResult:
+    root: str
+    bytes: int  # the root's own files plus every level-1 folder, exact or estimated
+    low: int
+    high: int
+    folders: List[SizeEstimate]  # biggest first
+    dirs_listed: int  # while sampling; the exact refinement walks are on top
+    probes: int
+    elapsed_sec: float
+    refine_sec: float
+
+
+def _list_dir_sizes(path: str) -> Tuple[int, int, List[str]]:
+    """(bytes, files, subfolder paths) of one folder's own entries; links and reparse points are skipped."""
+    own = files = 0
+    subdirs: List[str] = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_symlink():
+                        continue
+                    if _WINDOWS:
+                        st = entry.stat(follow_symlinks=False)
+                        if st.st_file_attributes & REPARSE_POINT_ATTR:
+                            continue
+                        if S_ISDIR(st.st_mode):
+                            subdirs.append(entry.path)
+                        elif S_ISREG(st.st_mode):
+                            own += st.st_size
+                            files += 1
+                    elif entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        own += entry.stat(follow_symlinks=False).st_size
+                        files += 1
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return own, files, subdirs
+
+
+class _SubtreeSampler:
+    """Random-probe (Knuth) estimate of one level-1 folder's bytes and files.
+
+    A probe walks from the folder down to a leaf through uniformly random
+    subfolders; the own size of each folder on the way, times the product of
+    the subfolder counts above it, summed, is an unbiased estimate of the
+    subtree total. Listings are cached, so the upper levels are read once;
+    everything listed adds to the exact lower bound seen_bytes, and a subtree
+    whose folders have all been listed is known exactly.
+    """
+
+    def __init__(self, path: str, depth: int, rng: random.Random):
+        self.path = path
+        self.depth = depth  # walk depth below the folder: -1, or the scan depth - 1
+        self.rng = rng
+        self.n = 0
+        self.sum_b = self.sum_b2 = self.sum_f = self.max_b = 0
+        self.seen_bytes = self.seen_files = 0
+        self._cache: Dict[str, Tuple[int, int, List[str]]] = {}
+        self._found = 1  # folders known to exist, listed or not
+
+    @property
+    def exact(self) -> bool:
+        return self._found == len(self._cache)
+
+    def _listing(self, path: str, level: int) -> Tuple[int, int, List[str]]:
+        hit = self._cache.get(path)
+        if hit is None:
+            own, files, subdirs = _list_dir_sizes(path)
+            if 0 <= self.depth <= level:
+                subdirs = []  # an exact scan would not go below this level either
+            hit = self._cache[path] = (own, files, subdirs)
+            self.seen_bytes += own
+            self.seen_files += files
+            self._found += len(subdirs)
+        return hit
+
+    def probe(self) -> None:
+        path, level, weight = self.path, 0, 1
+        xb = xf = 0
+        while True:
+            own, files, subdirs = self._listing(path, level)
+            xb += weight * own
+            xf += weight * files
+            if not subdirs:
+                break
+            weight *= len(subdirs)
+            path = self.rng.choice(subdirs)
+            level += 1
+        self.n += 1
+        self.sum_b += xb
+        self.sum_b2 += xb * xb
+        self.sum_f += xf
+        self.max_b = max(self.max_b, xb)
+
+    def half_width(self) -> float:
+        """Empirical Bernstein bound (Maurer & Pontil) on the byte estimate, the largest probe taken as the range.
+
+        Unlike mean +- z * standard error it widens with the largest probe
+        when probes are few, which is where heavy-tailed trees fool the
+        sample variance. A tail no probe has reached still goes unseen.
+        """
+        mean = self.sum_b / self.n
+        var = max(self.sum_b2 / self.n - mean * mean, 0.0)
+        log = math.log(2 / APPROX_DELTA)
+        return math.sqrt(2 * var * log / self.n) + 7 * self.max_b * log / (3 * max(self.n - 1, 1))
+
+    def estimate(self) -> SizeEstimate:
+        if self.exact:
+            return SizeEstimate(self.path, self.seen_bytes, self.seen_files, True, self.seen_bytes, self.seen_bytes,
+                                self.n, len(self._cache))
+        mean = self.sum_b / self.n
+        hw = self.half_width()
+        low = max(self.seen_bytes, int(mean - hw))
+        return SizeEstimate(self.path, max(self.seen_bytes, round(mean)), max(self.seen_files, round(self.sum_f / self.n)),
+                            False, low, max(low, int(mean + hw)), self.n, len(self._cache))
+
+
+def approx_scan(root: str, depth: int = -1, samples: int = 32, refine: int = 5, workers: int = 1,
+                seed: Optional[int] = None) -> ApproxScanResult:
+    """Estimate where the space under *root* is without walking all of it.
+
+    Each level-1 folder is sampled with random probes (_SubtreeSampler),
+    round-robin, *samples* per folder on average; probes of folders the
+    sampling has listed in full go to the others. The *refine* folders with
+    the highest upper bounds are then walked exactly with scan_root();
+    folders the probes happened to list in full are exact as well, and so are
+    the root's own files. SizeEstimate.exact tells which numbers are which.
+    *seed* makes the sampling repeatable.
+    The low..high ranges are built to miss APPROX_DELTA of the time, but
+    that rests on the largest probe being representative: where a few deep
+    files hold most of the bytes the probes may never reach them, and the
+    range comes out low. bench/bench_approx_scan.py measures how often the
+    ranges hold the true size (81-91% of estimated folders on its trees).
+    """
+    t0 = time.time()
+    root = os.path.abspath(root)
+    rng = random.Random(seed)
+    own, _, subdirs = _list_dir_sizes(root)
+    sub_depth = depth - 1 if depth > 0 else -1
+    samplers = [_SubtreeSampler(p, sub_depth, rng) for p in (subdirs if depth != 0 else [])]
+
+    # Equal shares: steering probes to folders with a large observed spread
+    # starves the ones whose first probes missed their big files.
+    budget = samples * len(samplers)
+    live = samplers
+    while budget > 0 and live:
+        for sm in live[:budget]:
+            sm.probe()
+        budget -= min(len(live), budget)
+        live = [sm for sm in live if not sm.exact]
+    rows = [sm.estimate() for sm in samplers]
+
+    t_ref = time.time()
+    for r in sorted((r for r in rows if not r.exact), key=lambda r: r.high, reverse=True)[:max(refine, 0)]:
+        res = scan_root(r.path, sub_depth, top_dirs=0, top_files=0, workers=workers)
+        r.bytes = r.low = r.high = res.stats.bytes_total
+        r.files = res.stats.files_scanned
+        r.exact = True
+    refine_sec = time.time() - t_ref
+
+    for r in rows:
+        r.path = os.path.basename(r.path)
+    rows.sort(key=lambda r: (r.bytes, r.path), reverse=True)
+    # Summed bounds: wider than a combined interval, but they hold if every folder's does.
+    return ApproxScanResult(root=root, bytes=own + sum(r.bytes for r in rows), low=own + sum(r.low for r in rows),
+                            high=own + sum(r.high for r in rows),
+                            folders=rows, dirs_listed=1 + sum(r.dirs_listed for r in rows),
+                            probes=sum(r.probes for r in rows), elapsed_sec=round(time.time() - t0, 2),
+                            refine_sec=round(refine_sec, 2))
+
+
+HASH_CACHE_NAME = "hash_cache.sqlite"
+
+
+class HashCache:
+    """On-disk cache of file hashes for `dupes` (SQLite), keyed by path + size + mtime.
+
+    Rows whose size or mtime no longer match the file are ignored and
+    overwritten, so a changed file is simply hashed again.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, head TEXT, full TEXT)"
+        )
+        self._pending: Dict[str, tuple] = {}
+
+    def lookup(self, path: str, size: int, mtime_ns: int) -> Tuple[Optional[str], Optional[str]]:
+        """Return the cached (head+tail hash, full hash) of the file, None where unknown."""
+        with self._lock:
+            row = self._pending.get(path) or self._db.execute(
+                "SELECT path, size, mtime_ns, head, full FROM hashes WHERE path=?", (path,)).fetchone()
+        if row is None or row[1] != size or row[2] != mtime_ns:
+            return None, None
+        return row[3], row[4]
+
+    def record(self, path: str, size: int, mtime_ns: int, head: Optional[str], full: Optional[str]) -> None:
+        with self._lock:
+            self._pending[path] = (path, size, mtime_ns, head, full)
+            if len(self._pending) >= 1000:
+                self._flush()
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._db.executemany("INSERT OR REPLACE INTO hashes VALUES (?,?,?,?,?)", list(self._pending.values()))
+            self._pending.clear()
+
+    def commit(self) -> None:
+        with self._lock:
+            self._flush()
+            self._db.commit()
+
+    def close(self) -> None:
+        self.commit()
+        self._db.close()
+
+
+@dataclass
+class DupeStats:
+    roots: List[str]
+    min_size: int
+    files_seen: int = 0  # files >= min_size
+    same_size: int = 0  # ... sharing their size with another file
+    head_hashed: int = 0  # files read for the head+tail hash
+    full_hashed: int = 0  # files read in full
+    cache_hits: int = 0
+    hardlinks_skipped: int = 0
+    errors: int = 0
+    groups: int = 0
+    wasted_bytes: int = 0
+    elapsed_sec: float = 0.0
+
+
+_DUPE_EDGE = 64 * 1024  # bytes hashed from each end of a file in stage 2
+_HASH_BUF = 1024 * 1024
+
+
+def _hash_head_tail(path: str, size: int) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb", buffering=0) as f:
+        h.update(f.read(_DUPE_EDGE))
+        f.seek(size - _DUPE_EDGE)
+        h.update(f.read(_DUPE_EDGE))
+    return h.hexdigest()
+
+
+def _hash_full(path: str) -> str:
+    # One reusable buffer; hashlib drops the GIL for large updates, so pool
+    # threads hash in parallel.
+    h = hashlib.blake2b(digest_size=20)
+    buf = bytearray(_HASH_BUF)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def _list_big_files(roots: List[str], min_size: int, stats: DupeStats) -> Dict[int, List[tuple]]:
+    # Stage 1: (path, mtime_ns) of every regular file >= min_size, grouped by size.
+    by_size: Dict[int, List[tuple]] = {}
+    seen = set()
+    stack = list(roots)
+    while stack:
+        cur = stack.pop()
+        key = os.path.normcase(cur)
+        if key in seen:
+            continue
+        seen.add(key)
+        try:
+            with os.scandir(cur) as it:
+                for entry in it:
+                    try:
+                        if entry.is_symlink():
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                        if _WINDOWS and st.st_file_attributes & REPARSE_POINT_ATTR:
+                            continue
+                        if S_ISDIR(st.st_mode):
+                            stack.append(entry.path)
+                        elif S_ISREG(st.st_mode) and st.st_size >= min_size:
+                            by_size.setdefault(st.st_size, []).append((entry.path, st.st_mtime_ns))
+                            stats.files_seen += 1
+                    except OSError:
+                        stats.errors += 1
+        except OSError:
+            stats.errors += 1
+    return by_size
+
+
+def _drop_hardlinks(files: List[tuple], stats: DupeStats) -> List[tuple]:
+    # Links to one inode take no extra space: keep one path per (st_dev, st_ino).
+    # DirEntry.stat() on Windows has no inode numbers, so stat each candidate.
+    out, inodes = [], set()
+    for path, mtime_ns in files:
+        try:
+            st = os.stat(path)
+        except OSError:
+            stats.errors += 1
+            continue
+        if st.st_ino and (st.st_dev, st.st_ino) in inodes:
+            stats.hardlinks_skipped += 1
+            continue
+        inodes.add((st.st_dev, st.st_ino))
+        out.append((path, mtime_ns))
+    return out
+
+
+def find_dupes(roots: List[str], min_size: int = 1024 * 1024, workers: int = 4,
+               cache: Optional[HashCache] = None) -> Tuple[List[Dict[str, object]], DupeStats]:
+    """Find files with identical content under *roots*.
+
+    Three stages, each only on what the previous one left: group files by
+    size, hash the first and last 64 KB of same-size files, then hash in
+    full the files whose head+tail hashes still collide. Hashing runs on a
+    thread pool of *workers*. With a *cache*, hashes of files whose size and
+    mtime are unchanged are not computed again.
+    Returns the groups (size, hash, files, wasted bytes; most wasted first)
+    and the run statistics.
+    """
+    t0 = time.time()
+    roots = [os.path.normpath(os.path.abspath(os.path.expandvars(r))) for r in roots]
+    stats = DupeStats(roots=roots, min_size=min_size)
+    by_size = _list_big_files(roots, min_size, stats)
+
+    candidates: List[tuple] = []  # (path, size, mtime_ns)
+    for size, files in by_size.items():
+        if len(files) < 2:
+            continue
+        files = _drop_hardlinks(files, stats)
+        if len(files) < 2:
+            continue
+        stats.same_size += len(files)
+        candidates.extend((p, size, m) for p, m in files)
+
+    def hashed(stage: str, items: List[tuple]) -> Dict[tuple, List[tuple]]:
+        # Hash *items* (cache first, then the pool) and group them by (size, hash).
+        groups: Dict[tuple, List[tuple]] = {}
+        todo = []
+        for it in items:
+            head, full = cache.lookup(it[0], it[1], it[2]) if cache is not None else (None, None)
+            digest = head if stage == "head" else full
+            if digest is None:
+                todo.append(it)
+            else:
+                stats.cache_hits += 1
+                groups.setdefault((it[1], digest), []).append(it)
+
+        def work(it: tuple) -> Optional[str]:
+            path, size, mtime_ns = it
+            try:
+                if stage == "head":
+                    # Small files are read whole: their head hash is the full one.
+                    if size <= 2 * _DUPE_EDGE:
+                        digest = full = _hash_full(path)
+                    else:
+                        digest, full = _hash_head_tail(path, size), None
+                    if cache is not None:
+                        cache.record(path, size, mtime_ns, digest, full)
+                else:
+                    digest = _hash_full(path)
+                    if cache is not None:
+                        cache.record(path, size, mtime_ns, cache.lookup(path, size, mtime_ns)[0], digest)
+                return digest
+            except OSError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="hash") as ex:
+            for it, digest in zip(todo, ex.map(work, todo)):
+                if digest is None:
+                    stats.errors += 1
+                    continue
+                if stage == "head":
+                    stats.head_hashed += 1
+                else:
+                    stats.full_hashed += 1
+                groups.setdefault((it[1], digest), []).append(it)
+        return {k: v for k, v in groups.items() if len(v) > 1}
+
+    by_head = hashed("head", candidates)
+    result: Dict[tuple, List[tuple]] = {}
+    rest: List[tuple] = []
+    for (size, digest), items in by_head.items():
+        if size <= 2 * _DUPE_EDGE:
+            result[(size, digest)] = items
+        else:
+            rest.extend(items)
+    result.update(hashed("full", rest))
+    if cache is not None:
+        cache.commit()
+
+    groups = []
+    for (size, digest), items in result.items():
+        wasted = size * (len(items) - 1)
+        groups.append({"size": size, "hash": digest, "wasted": wasted, "files": sorted(p for p, _, _ in items)})
+        stats.wasted_bytes += wasted
+    groups.sort(key=lambda g: (g["wasted"], g["size"]), reverse=True)
+    stats.groups = len(groups)
+    stats.elapsed_sec = round(time.time() - t0, 2)
+    return groups, stats
+
+
+def print_drive_table(echo: bool = True) -> List[Dict[str, str]]:
+    say = print if echo else (lambda *a, **k: None)
+    rows = []
+    say("=== Drives ===")
+    for d in list_drives():
+        try:
+            du = shutil.disk_usage(d)
+            used = du.total - du.free
+            say(f"{d}  Total: {format_gb(du.total)} | Used: {format_gb(used)} | Free: {format_gb(du.free)}")
+            rows.append({"drive": d, "total_gb": f"{du.total/(1024**3):.2f}", "free_gb": f"{du.free/(1024**3):.2f}"})
+        except Exception as e:
+            say(f"{d}  (error reading usage: {e})")
+            rows.append({"drive": d, "error": str(e)})
+    say()
+    return rows
+
+
+from dataclasses import dataclass
+
+@dataclass
+class CleanupRule:
+    """File filter for a CleanupAction: with a rule only matching files are deleted, folders stay.
+
+    Every set condition must hold. *names* and *exclude* are fnmatch patterns
+    on the entry name (case-insensitive on Windows); an excluded folder is not
+    walked at all.
+    """
+    older_than_days: Optional[float] = None
+    larger_than_mb: Optional[float] = None
+    names: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+
+    def compile(self, now: float) -> tuple:
+        # (max mtime_ns, min size, name regex, exclude regex) for the walk loop.
+        def rx(patterns: List[str]):
+            if not patterns:
+                return None
+            return re.compile("|".join(fnmatch.translate(os.path.normcase(p)) for p in patterns))
+
+        max_mtime = int((now - self.older_than_days * 86400) * 1e9) if self.older_than_days is not None else None
+        min_size = int(self.larger_than_mb * 1024 * 1024) if self.larger_than_mb is not None else -1
+        return max_mtime, min_size, rx(self.names), rx(self.exclude)
+
+
+@dataclass
+class CleanupAction:
+    name: str
+    description: str
+    targets: List[str]
+    needs_admin: bool = False
+    rule: Optional[CleanupRule] = None
+
+
+def iter_rule_matches(actions: List[CleanupAction], targets: List[List[Path]],
+                      now: Optional[float] = None) -> Iterator[Tuple[int, str, int, int]]:
+    """Walk the targets of every action that has a rule once; yield (action index, path, size, mtime_ns).
+
+    *targets* are the expanded targets of each action (expand_glob_groups).
+    Overlapping targets are walked once: a folder's files are tested against
+    the rules of every action whose target contains it, and a file goes to
+    the first action that matches, so it is planned (and counted) once.
+    Links and reparse points are skipped.
+    """
+    now = time.time() if now is None else now
+    roots: Dict[str, Tuple[str, List[tuple]]] = {}
+    for i, (act, paths) in enumerate(zip(actions, targets)):
+        if act.rule is None:
+            continue
+        compiled = (i, *act.rule.compile(now))
+        for p in paths:
+            roots.setdefault(os.path.normcase(str(p)), (str(p), []))[1].append(compiled)
+    if not roots:
+        return
+    keys = sorted(roots)
+    outermost = [k for n, k in enumerate(keys)
+                 if not any(k.startswith(os.path.join(o, "")) for o in keys[:n])]
+    nested = len(keys) > len(outermost)
+
+    def matches(name: str, st, active: tuple) -> Optional[int]:
+        lname = os.path.normcase(name)
+        for i, max_mtime, min_size, names, exclude in active:
+            if st.st_size <= min_size or (max_mtime is not None and st.st_mtime_ns > max_mtime):
+                continue
+            if (names is not None and not names.match(lname)) or (exclude is not None and exclude.match(lname)):
+                continue
+            return i
+        return None
+
+    for key in outermost:
+        path, active = roots[key]
+        active = tuple(active)
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            continue
+        if S_ISLNK(st.st_mode) or (_WINDOWS and st.st_file_attributes & REPARSE_POINT_ATTR):
+            continue
+        if S_ISREG(st.st_mode):
+            i = matches(os.path.basename(path), st, active)
+            if i is not None:
+                yield i, path, st.st_size, st.st_mtime_ns
+            continue
+        stack = [(path, active)]
+        while stack:
+            cur, active = stack.pop()
+            try:
+                with os.scandir(cur) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_symlink():
+                                continue
+                            st = entry.stat(follow_symlinks=False)
+                            if _WINDOWS and st.st_file_attributes & REPARSE_POINT_ATTR:
+                                continue
+                            if S_ISDIR(st.st_mode):
+                                lname = os.path.normcase(entry.name)
+                                sub = tuple(r for r in active if r[4] is None or not r[4].match(lname))
+                                if nested:
+                                    own = roots.get(os.path.normcase(entry.path))
+                                    if own is not None:
+                                        sub += tuple(own[1])
+                                if sub:
+                                    stack.append((entry.path, sub))
+                            elif S_ISREG(st.st_mode):
+                                rules = active
+                                if nested:
+                                    own = roots.get(os.path.normcase(entry.path))
+                                    if own is not None:
+                                        rules += tuple(own[1])
+                                i = matches(entry.name, st, rules)
+                                if i is not None:
+                                    yield i, entry.path, st.st_size, st.st_mtime_ns
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+
+class _GlobNode:
+    """One path segment in the pattern trie of expand_glob_groups()."""
+
+    __slots__ = ("literal", "wild", "ends")
+
+    def __init__(self):
+        self.literal: Dict[str, Tuple[str, "_GlobNode"]] = {}  # normcased segment -> (segment, node)
+        self.wild: Dict[str, Tuple[object, "_GlobNode"]] = {}  # normcased segment -> (regex or None for "*", node)
+        self.ends: List[int] = []  # patterns that end at this node
+
+
+def _has_magic(seg: str) -> bool:
+    return "*" in seg or "?" in seg or "[" in seg
+
+
+def expand_glob_groups(groups: List[List[str]]) -> List[List[Path]]:
+    """Expand several lists of glob patterns (one per cleanup action) in one walk.
+
+    All patterns are compiled into a trie of path segments, so patterns
+    sharing a prefix (e.g. five caches under `User Data\\*`) share its walk:
+    every directory is listed at most once and its entries are matched
+    against each wildcard segment that applies there. Wildcards may appear
+    in any segment; they only descend into real directories, never links or
+    junctions. Matching is case-insensitive on Windows, like Path.glob.
+    A pattern without wildcards is returned as is, even if missing; a
+    wildcard pattern that matches nothing is returned as is when the folder
+    before its first wildcard is missing, so the report still lists it.
+    Returns the matches of each group in pattern order, without duplicates.
+    """
+    roots = _GlobNode()
+    flat: List[Tuple[int, str]] = []  # pattern id -> (group, expanded pattern)
+    for g, patterns in enumerate(groups):
+        for pat in patterns:
+            pat = os.path.expandvars(pat)
+            node = roots
+            for seg in Path(pat).parts:
+                key = os.path.normcase(seg)
+                if _has_magic(seg):
+                    if key not in node.wild:
+                        rx = None if key == "*" else re.compile(fnmatch.translate(key))
+                        node.wild[key] = (rx, _GlobNode())
+                    node = node.wild[key][1]
+                else:
+                    if key not in node.literal:
+                        node.literal[key] = (seg, _GlobNode())
+                    node = node.literal[key][1]
+            node.ends.append(len(flat))
+            flat.append((g, pat))
+
+    hits: List[List[str]] = [[] for _ in flat]
+
+    def walk(path: str, node: _GlobNode, under_wild: bool) -> None:
+        for seg, child in node.literal.values():
+            p = os.path.join(path, seg)
+            if child.ends and (not under_wild or os.path.lexists(p)):
+                for i in child.ends:
+                    hits[i].append(p)
+            if child.literal or child.wild:
+                walk(p, child, under_wild)
+        if not node.wild:
+            return
+        try:
+            with os.scandir(path or ".") as it:
+                entries = list(it)
+        except OSError:
+            return
+        for entry in entries:
+            name = os.path.normcase(entry.name)
+            for rx, child in node.wild.values():
+                if rx is not None and not rx.match(name):
+                    continue
+                p = os.path.join(path, entry.name)
+                for i in child.ends:
+                    hits[i].append(p)
+                if (child.literal or child.wild) and _is_real_dir(entry):
+                    walk(p, child, True)
+
+    walk("", roots, False)
+
+    out: List[List[Path]] = [[] for _ in groups]
+    seen: List[set] = [set() for _ in groups]
+    for i, (g, pat) in enumerate(flat):
+        found = sorted(hits[i])
+        if not found and _has_magic(pat):
+            parts = Path(pat).parts
+            fixed = next(n for n, seg in enumerate(parts) if _has_magic(seg))
+            if fixed and not os.path.isdir(os.path.join(*parts[:fixed])):
+                found = [pat]
+        for p in found:
+            key = os.path.normcase(p)
+            if key not in seen[g]:
+                seen[g].add(key)
+                out[g].append(Path(p))
+    return out
+
+
+def _is_real_dir(entry: os.DirEntry) -> bool:
+    try:
+        if entry.is_symlink() or not entry.is_dir(follow_symlinks=False):
+            return False
+        return not (_WINDOWS and entry.stat(follow_symlinks=False).st_file_attributes & REPARSE_POINT_ATTR)
+    except OSError:
+        return False
+
+
+def expand_globs(patterns: List[str]) -> List[Path]:
+    return expand_glob_groups([patterns])[0]
+
+
+def remove_path(p: Path) -> Tuple[bool, str]:
+    try:
+        if not p.exists():
+            return True, "not_found"
+        if p.is_symlink():
+            return True, "skip_symlink"
+        if is_reparse_point(str(p)):
+            return True, "skip_reparse_point"
+        if p.is_file():
+            p.unlink()
+            return True, "deleted_file"
+        if p.is_dir():
+            shutil.rmtree(p, ignore_errors=False)
+            return True, "deleted_dir"
+        return True, "unknown_type"
+    except PermissionError as e:
+        return False, f"permission_denied: {e}"
+    except Exception as e:
+        return False, f"error: {e}"
+
+
+_FILE, _LINK, _DIR_LINK = 0, 1, 2  # DeleteEngine batch entry kinds
+
+
+class DeleteEngine:
+    """Parallel deletion for cleanup --yes.
+
+    A path is walked once (os.scandir, no links or junctions followed); its
+    files are unlinked in batches on a bounded thread pool, then its
+    directories are removed bottom-up, one depth level at a time. Unlike
+    shutil.rmtree it keeps going after a locked file, so the result says how
+    much was really freed. Use as a context manager; one pool serves every
+    path of a run.
+    """
+
+    BATCH = 256  # files per pool task
+
+    def __init__(self, workers: int = 8):
+        self._pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="delete")
+
+    def __enter__(self) -> "DeleteEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._pool.shutdown(wait=True)
+
+    def delete(self, p: Path) -> Tuple[bool, str, int, int]:
+        """Delete one cleanup target; returns (ok, result, freed bytes, freed files).
+
+        *result* uses the same values as remove_path(); a failure reports the
+        first error met.
+        """
+        path = str(p)
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except FileNotFoundError:
+            return True, "not_found", 0, 0
+        except PermissionError as e:
+            return False, f"permission_denied: {e}", 0, 0
+        except OSError as e:
+            return False, f"error: {e}", 0, 0
+        if S_ISLNK(st.st_mode):
+            return True, "skip_symlink", 0, 0
+        if _WINDOWS and st.st_file_attributes & REPARSE_POINT_ATTR:
+            return True, "skip_reparse_point", 0, 0
+        if S_ISDIR(st.st_mode):
+            return self._delete_dir(path)
+        if not S_ISREG(st.st_mode):
+            return True, "unknown_type", 0, 0
+        freed, n, err = self._unlink_batch([(path, st.st_size, _FILE)])
+        if err is not None:
+            return False, _delete_error(err), freed, n
+        return True, "deleted_file", freed, n
+
+    def submit_files(self, files: List[Tuple[str, int]]):
+        """Unlink (path, size) pairs on the pool; the future gives (freed bytes, freed files, first error)."""
+        return self._pool.submit(self._unlink_batch, [(p, sz, _FILE) for p, sz in files])
+
+    def _delete_dir(self, top: str) -> Tuple[bool, str, int, int]:
+        futures = []
+        levels: List[List[str]] = [[top]]
+        batch: List[Tuple[str, int, int]] = []
+        first_err: Optional[BaseException] = None
+        depth = 0
+        while depth < len(levels):
+            below: List[str] = []
+            for cur in levels[depth]:
+                try:
+                    with os.scandir(cur) as it:
+                        for entry in it:
+                            try:
+                                st = entry.stat(follow_symlinks=False)
+                            except FileNotFoundError:
+                                continue
+                            link = S_ISLNK(st.st_mode) or bool(
+                                _WINDOWS and st.st_file_attributes & REPARSE_POINT_ATTR)
+                            if not link:
+                                if S_ISDIR(st.st_mode):
+                                    below.append(entry.path)
+                                    continue
+                                batch.append((entry.path, st.st_size, _FILE))
+                            else:
+                                # Links and junctions are removed themselves, never followed.
+                                batch.append((entry.path, 0, _DIR_LINK if S_ISDIR(st.st_mode) else _LINK))
+                            if len(batch) >= self.BATCH:
+                                futures.append(self._pool.submit(self._unlink_batch, batch))
+                                batch = []
+                except OSError as e:
+                    first_err = first_err or e
+            if below:
+                levels.append(below)
+            depth += 1
+        if batch:
+            futures.append(self._pool.submit(self._unlink_batch, batch))
+
+        freed = n_files = 0
+        for fut in futures:
+            b, n, err = fut.result()
+            freed += b
+            n_files += n
+            first_err = first_err or err
+        # Deepest directories first: a level only goes once everything below it is gone.
+        for dirs in reversed(levels):
+            for err in self._pool.map(_rmdir_quiet, dirs):
+                first_err = first_err or err
+        if first_err is not None:
+            return False, _delete_error(first_err), freed, n_files
+        return True, "deleted_dir", freed, n_files
+
+    @staticmethod
+    def _unlink_batch(batch: List[Tuple[str, int, int]]) -> Tuple[int, int, Optional[BaseException]]:
+        freed = n = 0
+        first_err = None
+        for path, size, kind in batch:
+            try:
+                if kind == _DIR_LINK:
+                    os.rmdir(path)
+                else:
+                    os.unlink(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                first_err = first_err or e
+                continue
+            if kind == _FILE:
+                freed += size
+                n += 1
+        return freed, n, first_err
+
+
+def _rmdir_quiet(path: str) -> Optional[BaseException]:
+    try:
+        os.rmdir(path)
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        return e
+    return None
+
+
+def _delete_error(e: BaseException) -> str:
+    return f"permission_denied: {e}" if isinstance(e, PermissionError) else f"error: {e}"
+
+
+# Sizes measured by a dry-run, reused by a --yes run in the same process:
+# normcased path -> (mtime_ns, bytes, files, measured at).
+_reclaim_cache: Dict[str, Tuple[int, int, int, float]] = {}
+RECLAIM_CACHE_TTL = 15 * 60
+
+
+def _measure_path(p: Path) -> Tuple[int, int, int]:
+    # (mtime_ns, bytes, files) of one cleanup target, counted the way
+    # DeleteEngine deletes: links and reparse points are not followed.
+    st = os.stat(p, follow_symlinks=False)
+    if S_ISLNK(st.st_mode) or (_WINDOWS and st.st_file_attributes & REPARSE_POINT_ATTR):
+        return st.st_mtime_ns, 0, 0
+    if S_ISREG(st.st_mode):
+        return st.st_mtime_ns, st.st_size, 1
+    if not S_ISDIR(st.st_mode):
+        return st.st_mtime_ns, 0, 0
+    res = scan_root(str(p), depth=-1, top_dirs=0, top_files=0)
+    return st.st_mtime_ns, res.stats.bytes_total, res.stats.files_scanned
+
+
+def cached_reclaimable(p: Path) -> Optional[Tuple[int, int]]:
+    """(bytes, files) of a target from an earlier measure_reclaimable(), if still fresh.
+
+    Fresh means measured less than RECLAIM_CACHE_TTL seconds ago and the
+    target's mtime is unchanged (entries added or removed directly in it);
+    changes deeper down are not seen.
+    """
+    hit = _reclaim_cache.get(os.path.normcase(str(p)))
+    if hit is None or time.time() - hit[3] >= RECLAIM_CACHE_TTL:
+        return None
+    try:
+        if os.stat(p, follow_symlinks=False).st_mtime_ns != hit[0]:
+            return None
+    except OSError:
+        return None
+    return hit[1], hit[2]
+
+
+def measure_reclaimable(paths: List[Path], workers: int = 8, use_cache: bool = True) -> Dict[str, Tuple[int, int]]:
+    """Bytes and files under each cleanup target: {str(path): (bytes, files)}.
+
+    Targets are sized in parallel with the scan engine; missing ones are left
+    out. Measurements are kept in a process-wide cache, and with *use_cache*
+    fresh ones (see cached_reclaimable) are not walked again.
+    """
+    out: Dict[str, Tuple[int, int]] = {}
+    todo: List[Path] = []
+    now = time.time()
+    for p in paths:
+        hit = cached_reclaimable(p) if use_cache else None
+        if hit is not None:
+            out[str(p)] = hit
+        else:
+            todo.append(p)
+
+    def measure(p: Path) -> Optional[Tuple[int, int, int]]:
+        try:
+            return _measure_path(p)
+        except OSError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="measure") as ex:
+        for p, m in zip(todo, ex.map(measure, todo)):
+            if m is None:
+                continue
+            _reclaim_cache[os.path.normcase(str(p))] = (*m, now)
+            out[str(p)] = (m[1], m[2])
+    return out
+
+
+def _run_rules(actions: List[CleanupAction], targets: List[List[Path]], engine: Optional[DeleteEngine],
+               plan_csv: Path) -> Dict[int, Dict[str, object]]:
+    # One walk over the targets of every rule action (iter_rule_matches): the
+    # matches are written to *plan_csv* and, with an *engine*, deleted in
+    # batches as they stream in. Returns the report fields of each action index.
+    out = {i: {"reclaimable_bytes": 0, "reclaimable_files": 0} for i, act in enumerate(actions) if act.rule is not None}
+    if engine is not None:
+        for entry in out.values():
+            entry.update(freed_bytes=0, freed_files=0)
+    batches: Dict[int, List[Tuple[str, int]]] = {i: [] for i in out}
+    futures: List[tuple] = []
+    with open(plan_csv, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["action", "path", "bytes", "modified"])
+        for i, path, size, mtime_ns in iter_rule_matches(actions, targets):
+            entry = out[i]
+            entry["reclaimable_bytes"] += size
+            entry["reclaimable_files"] += 1
+            w.writerow([actions[i].name, path, size,
+                        datetime.fromtimestamp(mtime_ns / 1e9).isoformat(timespec="seconds")])
+            if engine is not None:
+                batch = batches[i]
+                batch.append((path, size))
+                if len(batch) >= DeleteEngine.BATCH:
+                    futures.append((i, engine.submit_files(batch)))
+                    batches[i] = []
+    if engine is not None:
+        futures.extend((i, engine.submit_files(b)) for i, b in batches.items() if b)
+        for i, fut in futures:
+            freed, n, err = fut.result()
+            entry = out[i]
+            entry["freed_bytes"] += freed
+            entry["freed_files"] += n
+            if err is not None:
+                entry.setdefault("error", _delete_error(err))
+    return out
+
+
+def cleanup(actions: List[CleanupAction], yes: bool, outdir: Path, workers: int = 8,
+            profile: bool = False) -> Dict[str, object]:
+    """Run (or, without *yes*, size) the cleanup actions and write cleanup_report_*.json.
+
+    profile=True adds the seconds spent per phase (target expansion, sizing,
+    rule walk, per-item deletes, recycle bin) to the report as "profile".
+    """
+    clock = time.perf_counter
+    phases: Dict[str, float] = {}
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "is_admin": is_admin(),
+        "mode": "EXECUTE" if yes else "DRY_RUN",
+        "actions": [],
+    }
+    report["reclaimable_bytes"] = report["reclaimable_files"] = 0
+    if yes:
+        report["freed_bytes"] = report["freed_files"] = 0
+
+    outdir.mkdir(parents=True, exist_ok=True)
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    runnable = [act for act in actions if not (act.needs_admin and not is_admin())]
+    t = clock()
+    targets = expand_glob_groups([act.targets for act in runnable])
+    phases["expand_sec"] = clock() - t
+    plain = [p for act, paths in zip(runnable, targets) if act.rule is None for p in paths]
+    # A dry-run sizes every target; --yes walks nothing extra and only reports
+    # what a dry-run in this process already measured (the delete itself
+    # counts what it frees).
+    t = clock()
+    if yes:
+        sizes = {str(p): hit for p in plain if (hit := cached_reclaimable(p)) is not None}
+    else:
+        sizes = measure_reclaimable(plain, workers)
+    phases["measure_sec"] = clock() - t
+
+    pending = iter(enumerate(targets))
+    with DeleteEngine(workers) as engine:
+        planned: Dict[int, Dict[str, object]] = {}
+        if any(act.rule is not None for act in runnable):
+            t = clock()
+            plan_csv = outdir / f"cleanup_plan_{ts}_{report['mode'].lower()}.csv"
+            planned = _run_rules(runnable, targets, engine if yes else None, plan_csv)
+            report["plan_file"] = str(plan_csv)
+            phases["rules_sec"] = clock() - t
+
+        t = clock()
+        for act in actions:
+            act_entry = {"name": act.name, "description": act.description, "needs_admin": act.needs_admin, "items": []}
+            if act.needs_admin and not is_admin():
+                act_entry["skipped"] = "needs_admin"
+                report["actions"].append(act_entry)
+                continue
+
+            act_entry["reclaimable_bytes"] = act_entry["reclaimable_files"] = 0
+            if yes:
+                act_entry["freed_bytes"] = act_entry["freed_files"] = 0
+            k, paths = next(pending)
+            if act.rule is not None:
+                act_entry["rule"] = asdict(act.rule)
+                act_entry.update(planned[k])
+                act_entry["items"] = [{"path": str(p), "exists": p.exists()} for p in paths]
+                paths = []
+            for p in paths:
+                item = {"path": str(p), "exists": p.exists()}
+                if str(p) in sizes:
+                    item["reclaimable_bytes"], item["reclaimable_files"] = sizes[str(p)]
+                    act_entry["reclaimable_bytes"] += item["reclaimable_bytes"]
+                    act_entry["reclaimable_files"] += item["reclaimable_files"]
+                if yes:
+                    ok, msg, freed, n_files = engine.delete(p)
+                    item["result"] = msg
+                    item["ok"] = ok
+                    item["freed_bytes"] = freed
+                    item["freed_files"] = n_files
+                    act_entry["freed_bytes"] += freed
+                    act_entry["freed_files"] += n_files
+                    _reclaim_cache.pop(os.path.normcase(str(p)), None)
+                act_entry["items"].append(item)
+
+            report["reclaimable_bytes"] += act_entry["reclaimable_bytes"]
+            report["reclaimable_files"] += act_entry["reclaimable_files"]
+            if yes:
+                report["freed_bytes"] += act_entry["freed_bytes"]
+                report["freed_files"] += act_entry["freed_files"]
+            report["actions"].append(act_entry)
+        phases["items_sec"] = clock() - t
+
+    if yes:
+        t = clock()
+        code, out, err = run_powershell("try { Clear-RecycleBin -Force -ErrorAction SilentlyContinue } catch { $_.Exception.Message }")
+        report["recycle_bin"] = {"code": code, "out": out, "err": err}
+        phases["recycle_bin_sec"] = clock() - t
+    if profile:
+        report["profile"] = {k: round(v, 4) for k, v in phases.items()}
+
+    out = outdir / f"cleanup_report_{ts}.json"
+    if out.exists():  # dry-run and --ask execute within the same second
+        out = outdir / f"cleanup_report_{ts}_{report['mode'].lower()}.json"
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return report
+
+
+def winupdate_cache_reset(yes: bool, outdir: Path) -> Dict[str, object]:
+    report = {"generated_at": datetime.now().isoformat(timespec="seconds"), "mode": "EXECUTE" if yes else "DRY_RUN"}
+    report["target"] = os.path.expandvars(r"%windir%\SoftwareDistribution\Download\*")
+
+    if not yes:
+        report["note"] = "Would stop wuauserv/bits, delete Download cache, then start services."
+        (outdir / f"winupdate_cache_dryrun_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json").write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        return report
+
+    if not is_admin():
+        report["error"] = "Run as Administrator for this action."
+        (outdir / f"winupdate_cache_error_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json").write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        return report
+
+    # All steps go through the one PowerShell worker instead of a process each.
+    cmds = [
+        "net stop wuauserv",
+        "net stop bits",
+        r'Remove-Item -Recurse -Force "$env:windir\SoftwareDistribution\Download\*" -ErrorAction SilentlyContinue',
+        "net start bits",
+        "net start wuauserv",
+    ]
+    results = []
+    for c in cmds:
+        code, out, err = run_powershell(c)
+        results.append({"cmd": c, "code": code, "out": out, "err": err})
+    report["results"] = results
+
+    (outdir / f"winupdate_cache_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json").write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    return report
+
+
+BACKUP_MANIFEST = "manifest.json"
+
+# Browser cache folders left out of profile backups (passwords/bookmarks are not in them).
+BROWSER_CACHE_DIRS = frozenset({
+    "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache", "DawnCache",
+    "Media Cache", "CacheStorage", "Crashpad", "Crash Reports"
+})
+
+
+class CopyCancelled(Exception):
+    """Raised by CopyEngine once its *cancel* event is set."""
+
+
+class CopyEngine:
+    """Parallel tree copier shared by backup-browsers and win_collect_session.
+
+    The source tree is walked once and each destination folder is created
+    once; files are copied in batches on a bounded thread pool. Files from
+    LARGE bytes up go through os.copy_file_range where the OS has it
+    (in-kernel copy, reflinks on btrfs/XFS) and otherwise through a 4 MB
+    buffer; smaller ones through shutil.copyfile (sendfile on Linux). Folders
+    named in *exclude_dirs* are skipped. With *best_effort* failed files are
+    collected as (src, dst, error) and the copy goes on; otherwise the first
+    error is raised once the files in flight are done. Setting *cancel*
+    stops copies between files: copytree() and copy_file() then raise
+    CopyCancelled. Close it (or use it as a context manager) to stop the pool.
+    """
+
+    LARGE = 8 * 1024 * 1024
+    BATCH = 32  # files per pool task
+    BUFFER = 4 * 1024 * 1024
+
+    def __init__(self, workers: int = 8, best_effort: bool = False, exclude_dirs: frozenset = frozenset(),
+                 cancel: Optional[threading.Event] = None):
+        self.best_effort = best_effort
+        self.exclude_dirs = exclude_dirs
+        self.cancel = cancel or threading.Event()
+        self.files = self.bytes = 0
+        self.elapsed_sec = 0.0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="copy")
+
+    def __enter__(self) -> "CopyEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def copytree(self, src: Path, dst: Path, copy=None) -> List[Tuple[str, str, str]]:
+        """Copy the tree *src* into *dst* (merged into existing folders).
+
+        *copy(src_file, dst_file, rel)* replaces copy_file() per file, *rel*
+        being the path below *src* with forward slashes.
+        Returns the (src, dst, error) list of failed files (best_effort mode).
+        """
+        t0 = time.perf_counter()
+        copy = copy or (lambda s, t, rel: self.copy_file(s, t))
+        errors: List[Tuple[str, str, str]] = []
+        failed: List[BaseException] = []
+        futures = []
+        batch: List[Tuple[str, str, str]] = []
+
+        def run(jobs: List[Tuple[str, str, str]]) -> None:
+            for s, t, rel in jobs:
+                if failed or self.cancel.is_set():
+                    return
+                try:
+                    copy(s, t, rel)
+                except Exception as e:
+                    with self._lock:
+                        if self.best_effort:
+                            errors.append((s, t, repr(e)))
+                        else:
+                            failed.append(e)
+
+        src = Path(src).resolve()
+        dst = Path(dst).resolve()
+        for root, dirs, files in os.walk(src):
+            rel = os.path.relpath(root, src)
+            target_dir = os.path.normpath(os.path.join(dst, rel))
+            try:
+                os.makedirs(target_dir, exist_ok=True)
+            except OSError:
+                pass
+            dirs[:] = [d for d in dirs if d not in self.exclude_dirs]
+            prefix = "" if rel == "." else rel.replace(os.sep, "/") + "/"
+            for fn in files:
+                batch.append((os.path.join(root, fn), os.path.join(target_dir, fn), prefix + fn))
+                if len(batch) >= self.BATCH:
+                    futures.append(self._pool.submit(run, batch))
+                    batch = []
+            if failed or self.cancel.is_set():
+                break
+        if batch:
+            futures.append(self._pool.submit(run, batch))
+        for fut in futures:
+            fut.result()
+        self.elapsed_sec += time.perf_counter() - t0
+        if failed:
+            raise failed[0]
+        if self.cancel.is_set():
+            raise CopyCancelled(str(src))
+        return errors
+
+    def copy_file(self, s: str, t: str) -> int:
+        """Copy one file with its timestamps (like shutil.copy2); returns its size."""
+        if self.cancel.is_set():
+            raise CopyCancelled(s)
+        size = os.stat(s).st_size
+        if size >= self.LARGE:
+            self._copy_large(s, t, size)
+        else:
+            shutil.copyfile(s, t)
+        shutil.copystat(s, t)
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+        return size
+
+    def _copy_large(self, s: str, t: str, size: int) -> None:
+        with open(s, "rb") as fs, open(t, "wb") as ft:
+            if hasattr(os, "copy_file_range"):
+                try:
+                    done = 0
+                    while done < size:
+                        n = os.copy_file_range(fs.fileno(), ft.fileno(), size - done)
+                        if n == 0:
+                            break
+                        done += n
+                    return
+                except OSError:
+                    # Not supported across these file systems: start over with plain reads.
+                    fs.seek(0)
+                    ft.seek(0)
+                    ft.truncate()
+            buf = bytearray(self.BUFFER)
+            view = memoryview(buf)
+            while True:
+                n = fs.readinto(buf)
+                if not n:
+                    break
+                ft.write(view[:n])
+
+    def throughput(self) -> Dict[str, float]:
+        secs = max(self.elapsed_sec, 1e-9)
+        return {"files": self.files, "bytes": self.bytes, "elapsed_sec": round(self.elapsed_sec, 2),
+                "mb_per_sec": round(self.bytes / (1024 * 1024) / secs, 1), "files_per_sec": round(self.files / secs, 1)}
+
+
+class SnapshotCopier:
+    """Copies folders into one snapshot and writes its manifest (path, size, mtime, optional hash).
+
+    Given the previous snapshot (*prev_dir* with its manifest), a file whose
+    size and mtime match the manifest entry is hard-linked from there instead
+    of copied, so every snapshot is a complete tree that only costs the
+    changed files. With *hash_files*, copied files are hashed into the
+    manifest, and a file whose mtime changed but whose size and hash did not
+    is linked too. Linked files share one copy on disk: never edit a file
+    inside a snapshot. Where links are not possible (FAT/exFAT, another
+    volume) files are copied, through *engine*.
+    """
+
+    def __init__(self, snapshot_dir: Path, engine: CopyEngine, prev_dir: Optional[Path] = None,
+                 hash_files: bool = False):
+        self.snapshot_dir = snapshot_dir
+        self.engine = engine
+        self.prev_dir = prev_dir
+        self.hash_files = hash_files
+        self.prev_files: Dict[str, list] = load_manifest(prev_dir) if prev_dir is not None else {}
+        self.files: Dict[str, list] = {}
+        self.files_linked = self.bytes_linked = 0
+        self._lock = threading.Lock()
+
+    def copytree(self, src: Path, name: str) -> List[Tuple[str, str, str]]:
+        """Copy *src* into <snapshot>/<name> through the engine.
+
+        Returns a list of (src, dst, error) for skipped/failed files (only in best_effort mode).
+        """
+        return self.engine.copytree(src, self.snapshot_dir / name,
+                                    copy=lambda s, t, rel: self._copy_file(s, t, f"{name}/{rel}"))
+
+    def _copy_file(self, s: str, t: str, key: str) -> None:
+        st = os.stat(s)
+        prev = self.prev_files.get(key)
+        digest = None
+        if prev is not None and prev[0] == st.st_size:
+            same = prev[1] == st.st_mtime_ns
+            if not same and self.hash_files and prev[2]:
+                digest = _hash_full(s)
+                same = digest == prev[2]
+            if same and self._link(self.prev_dir / key, Path(t)):
+                with self._lock:
+                    self.files[key] = [st.st_size, prev[1] if digest is None else st.st_mtime_ns, prev[2]]
+                    self.files_linked += 1
+                    self.bytes_linked += st.st_size
+                return
+        self.engine.copy_file(s, t)
+        if self.hash_files and digest is None:
+            digest = _hash_full(s)
+        with self._lock:
+            self.files[key] = [st.st_size, st.st_mtime_ns, digest]
+
+    @staticmethod
+    def _link(prev: Path, t: Path) -> bool:
+        try:
+            if t.exists():
+                t.unlink()
+            os.link(prev, t)
+            return True
+        except OSError:
+            return False
+
+    def save_manifest(self) -> Path:
+        path = self.snapshot_dir / BACKUP_MANIFEST
+        data = {
+            "version": 1,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "previous": str(self.prev_dir) if self.prev_dir is not None else None,
+            "files": self.files,
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        return path
+
+    def totals(self) -> Dict[str, object]:
+        return {"files_copied": self.engine.files, "bytes_copied": self.engine.bytes,
+                "files_linked": self.files_linked, "bytes_linked": self.bytes_linked,
+                "throughput": self.engine.throughput()}
+
+
+def load_manifest(snapshot_dir: Path) -> Dict[str, list]:
+    """Files of a snapshot ({relative path: [size, mtime_ns, hash or None]}); {} without a readable manifest."""
+    try:
+        data = json.loads((snapshot_dir / BACKUP_MANIFEST).read_text(encoding="utf-8"))
+        return dict(data.get("files", {}))
+    except (OSError, ValueError):
+        return {}
+
+
+def latest_snapshot(dest_root: Path, prefix: str) -> Optional[Path]:
+    """Newest <prefix><stamp> folder under *dest_root* that has a manifest."""
+    found = sorted(p for p in dest_root.glob(prefix + "*") if (p / BACKUP_MANIFEST).is_file())
+    return found[-1] if found else None
+
+
+ARCHIVE_FORMATS = ("zip", "tar.xz")
+
+# Already-compressed formats, stored as is in archive backups (.ldb = LevelDB tables, Snappy-compressed).
+ARCHIVE_STORED_EXTS = frozenset({
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif", ".mp3", ".mp4", ".m4a", ".webm", ".ogg",
+    ".zip", ".gz", ".xz", ".bz2", ".7z", ".rar", ".zst", ".br", ".crx", ".woff", ".woff2", ".ldb",
+})
+_SAMPLE_MIN = 16 * 1024  # smaller files are always compressed
+_SAMPLE_SIZE = 64 * 1024
+
+
+def looks_compressed(path: str, size: int) -> bool:
+    """True if *path* is not worth compressing: known extension, or its first 64 KB shrink < 5% at zlib level 1."""
+    if os.path.splitext(path)[1].lower() in ARCHIVE_STORED_EXTS:
+        return True
+    if size < _SAMPLE_MIN:
+        return False
+    try:
+        with open(path, "rb") as f:
+            sample = f.read(_SAMPLE_SIZE)
+    except OSError:
+        return False
+    return len(zlib.compress(sample, 1)) > len(sample) * 0.95
+
+
+def _stored(path: str) -> bool:
+    # looks_compressed() for a path not stat'ed yet; a file that cannot be read fails later, when added.
+    try:
+        return looks_compressed(path, os.stat(path).st_size)
+    except OSError:
+        return False
+
+
+class _XzStreams:
+    """Write-only file object xz-compressing into *raw*, as a chain of xz streams.
+
+    use() switches the LZMA2 filter chain (ending the current stream), cut()
+    ends the stream so raw.tell() is exact. xz and the lzma module read
+    concatenated streams as one file.
+    """
+
+    def __init__(self, raw, filters: List[dict]):
+        self.raw = raw
+        self.filters = filters
+        self.pos = 0
+        self._comp = lzma.LZMACompressor(filters=filters)
 
-    for act in actions:
-        act_entry = {"name": act.name, "description": act.description, "needs_admin": act.needs_admin, "items": []}
-        if act.needs_admin and not is_admin():
-            act_entry["skipped"] = "needs_admin"
-            report["actions"].append(act_entry)
-            continue
+    def use(self, filters: List[dict]) -> None:
+        if filters is not self.filters:
+            self.filters = filters
+            self.cut()
 
-        paths = expand_globs(act.targets)
-        for p in paths:
-            item = {"path": str(p), "exists": p.exists()}
-            if yes:
-                ok, msg = remove_path(p)
-                item["result"] = msg
-                item["ok"] = ok
-            act_entry["items"].append(item)
+    def cut(self) -> None:
+        self.raw.write(self._comp.flush())
+        self._comp = lzma.LZMACompressor(filters=self.filters)
 
-        report["actions"].append(act_entry)
+    def write(self, data) -> int:
+        self.raw.write(self._comp.compress(data))
+        self.pos += len(data)
+        return len(data)
 
-    if yes:
-        code, out, err = run_powershell("try { Clear-RecycleBin -Force -ErrorAction SilentlyContinue } catch { $_.Exception.Message }")
-        report["recycle_bin"] = {"code": code, "out": out, "err": err}
+    def tell(self) -> int:
+        return self.pos
 
-    outdir.mkdir(parents=True, exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    (outdir / f"cleanup_report_{ts}.json").write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
-    return report
+    def close(self) -> None:
+        self.raw.write(self._comp.flush())
 
 
-def winupdate_cache_reset(yes: bool, outdir: Path) -> Dict[str, object]:
-    report = {"generated_at": datetime.now().isoformat(timespec="seconds"), "mode": "EXECUTE" if yes else "DRY_RUN"}
-    report["target"] = os.path.expandvars(r"%windir%\SoftwareDistribution\Download\*")
+class ArchiveWriter:
+    """Streams folders straight into one zip or tar.xz, without a copy on disk first.
 
-    if not yes:
-        report["note"] = "Would stop wuauserv/bits, delete Download cache, then start services."
-        (outdir / f"winupdate_cache_dryrun_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json").write_text(
-            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
-        return report
+    Each file is read once into the archive. Files that looks_compressed()
+    are stored as is in zip; tar.xz compresses the whole stream, so
+    there they go into an xz stream with the cheapest LZMA2 settings
+    (about 2x faster than preset 6 on incompressible data). In tar.xz the
+    files of each tree are grouped by stream (compressible ones first), so
+    every tree costs at most two streams. The archive is
+    written as <path>.part and renamed on close(). Folders named in
+    *exclude_dirs* are skipped; *best_effort* works as in CopyEngine.
+    """
 
-    if not is_admin():
-        report["error"] = "Run as Administrator for this action."
-        (outdir / f"winupdate_cache_error_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json").write_text(
-            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
-        return report
+    BUFFER = 1024 * 1024
+    XZ_DEFAULT = [{"id": lzma.FILTER_LZMA2, "preset": 6}]
+    XZ_FAST = [{"id": lzma.FILTER_LZMA2, "preset": 0, "dict_size": 4096, "mf": lzma.MF_HC3, "depth": 1, "nice_len": 8}]
 
-    cmds = [
-        ["net", "stop", "wuauserv"],
-        ["net", "stop", "bits"],
-        ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command",
-         r"Remove-Item -Recurse -Force \"$env:windir\SoftwareDistribution\Download\*\" -ErrorAction SilentlyContinue"],
-        ["net", "start", "bits"],
-        ["net", "start", "wuauserv"],
-    ]
-    results = []
-    for c in cmds:
-        code, out, err = run_cmd(c)
-        results.append({"cmd": " ".join(c), "code": code, "out": out, "err": err})
-    report["results"] = results
+    def __init__(self, path: Path, fmt: str, best_effort: bool = False, exclude_dirs: frozenset = frozenset()):
+        if fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"unknown archive format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.best_effort = best_effort
+        self.exclude_dirs = exclude_dirs
+        self._part = path.with_name(path.name + ".part")
+        self._raw = open(self._part, "wb")
+        if fmt == "zip":
+            self._zip = zipfile.ZipFile(self._raw, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        else:
+            self._xz = _XzStreams(self._raw, self.XZ_DEFAULT)
+            self._tar = tarfile.TarFile(fileobj=self._xz, mode="w", format=tarfile.PAX_FORMAT,
+                                        copybufsize=self.BUFFER)
 
-    (outdir / f"winupdate_cache_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json").write_text(
-        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
-    return report
+    def add_tree(self, src: Path, name: str) -> Tuple[List[Tuple[str, str, str]], Dict[str, object]]:
+        """Add the tree *src* as <name>/... .
+
+        Returns the (src, arcname, error) list of failed files (best_effort
+        mode) and the stats of this tree: files, files_stored, bytes_in,
+        bytes_out, ratio (out/in) and elapsed_sec.
+        """
+        t0 = time.perf_counter()
+        start = self._raw.tell()
+        stats = {"files": 0, "files_stored": 0, "bytes_in": 0, "bytes_out": 0}
+        errors: List[Tuple[str, str, str]] = []
+        src = Path(src).resolve()
+        try:
+            entries = self._list_tree(src, name)
+            if self.fmt != "zip":
+                # Every switch of filter chain starts a new xz stream with an empty
+                # dictionary: write the compressible files first, then the rest.
+                marked = [(path, arcname, _stored(path)) for path, arcname, _ in entries]
+                entries = [e for e in marked if not e[2]] + [e for e in marked if e[2]]
+            for path, arcname, stored in entries:
+                try:
+                    size, stored = self._add_file(path, arcname, stored)
+                except OSError as e:
+                    if not self.best_effort:
+                        raise
+                    errors.append((path, arcname, repr(e)))
+                    continue
+                stats["files"] += 1
+                stats["files_stored"] += stored
+                stats["bytes_in"] += size
+        finally:
+            if self.fmt == "zip":
+                self._raw.flush()
+            else:
+                self._xz.cut()
+            stats["bytes_out"] = self._raw.tell() - start
+            stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else None
+            stats["elapsed_sec"] = round(time.perf_counter() - t0, 2)
+        return errors, stats
+
+    def _list_tree(self, src: Path, name: str) -> List[Tuple[str, str, Optional[bool]]]:
+        # (path, arcname, stored) of every file to add, in walk order; stored is decided later.
+        entries = []
+        for root, dirs, files in os.walk(src):
+            dirs[:] = sorted(d for d in dirs if d not in self.exclude_dirs)
+            rel = os.path.relpath(root, src)
+            prefix = name + "/" if rel == "." else f"{name}/{rel.replace(os.sep, '/')}/"
+            entries.extend((os.path.join(root, fn), prefix + fn, None) for fn in sorted(files))
+        return entries
+
+    def _add_file(self, path: str, arcname: str, stored: Optional[bool] = None) -> Tuple[int, bool]:
+        size = os.stat(path).st_size
+        if stored is None:
+            stored = looks_compressed(path, size)
+        # Open before anything is written, so a locked file leaves no half entry.
+        with open(path, "rb") as f:
+            if self.fmt == "zip":
+                info = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+                info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+                with self._zip.open(info, "w", force_zip64=size * 1.05 > zipfile.ZIP64_LIMIT) as out:
+                    shutil.copyfileobj(f, out, self.BUFFER)
+            else:
+                info = self._tar.gettarinfo(arcname=arcname, fileobj=f)
+                self._xz.use(self.XZ_FAST if stored else self.XZ_DEFAULT)
+                self._tar.addfile(info, f)
+                size = info.size
+        return size, stored
+
+    def close(self) -> Path:
+        if self.fmt == "zip":
+            self._zip.close()
+        else:
+            self._tar.close()
+            self._xz.close()
+        self._raw.close()
+        os.replace(self._part, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        try:
+            self._raw.close()
+            self._part.unlink()
+        except OSError:
+            pass
 
 
-def backup_browsers(dest: str, kill_browsers: bool = False, best_effort: bool = False) -> Dict[str, object]:
+def backup_browsers(dest: str, kill_browsers: bool = False, best_effort: bool = False,
+                    incremental: bool = False, hash_files: bool = False,
+                    archive: Optional[str] = None) -> Dict[str, object]:
     """
     Backup browser profiles (Edge / Yandex / Opera GX) to a folder.
+    Every backup is a complete browsers_backup_<stamp> folder with a manifest.json;
+    with incremental=True unchanged files are hard-linked from the previous one
+    (see SnapshotCopier). With archive="zip"/"tar.xz" the profiles are streamed
+    into browsers_backup_<stamp>.<ext> instead (see ArchiveWriter), with the
+    report next to it.
     Notes:
       * For a "perfect" backup (cookies/sessions), CLOSE browsers first or use kill_browsers=True.
       * Saved passwords/cookies are DPAPI-encrypted and usually restore only on the same Windows install/user.
@@ -361,7 +3161,7 @@ def backup_browsers(dest: str, kill_browsers: bool = False, best_effort: bool =
 
     def _tasklist_names() -> set:
         try:
-            out = subprocess.check_output(["tasklist", "/FO", "CSV", "/NH"], text=True, errors="ignore")
+            out = run_cmd(["tasklist", "/FO", "CSV", "/NH"])[1]
             names = set()
             for line in out.splitlines():
                 line = line.strip()
@@ -381,6 +3181,9 @@ def backup_browsers(dest: str, kill_browsers: bool = False, best_effort: bool =
         except Exception:
             pass
 
+    if archive and incremental:
+        return {"saved_to": None, "items": [], "error": "--archive cannot be combined with --incremental."}
+
     browser_imgs = ["msedge.exe", "browser.exe", "opera.exe"]
     running = [p for p in browser_imgs if p.lower() in _tasklist_names()]
     if running and not kill_browsers:
@@ -412,74 +3215,84 @@ def backup_browsers(dest: str, kill_browsers: bool = False, best_effort: bool =
         ("OperaGX_Stable_Roaming", roaming / "Opera Software" / "Opera GX Stable"),
     ]
 
-    # Exclude obvious cache directories to keep backup smaller (does NOT affect passwords/bookmarks).
-    EXCLUDE_DIR_NAMES = {
-        "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache", "DawnCache",
-        "Media Cache", "CacheStorage", "Crashpad", "Crash Reports"
-    }
-
-    def _copytree_best_effort(src: Path, dst: Path) -> List[Tuple[str, str, str]]:
-        """
-        Copy directory tree.
-        Returns a list of (src, dst, error) for skipped/failed files (only used in best_effort mode).
-        """
-        errors: List[Tuple[str, str, str]] = []
-        src = src.resolve()
-        dst = dst.resolve()
-        dst.mkdir(parents=True, exist_ok=True)
-
-        for root, dirs, files in os.walk(src):
-            root_p = Path(root)
-            rel = root_p.relative_to(src)
-            target_dir = dst / rel
-            try:
-                target_dir.mkdir(parents=True, exist_ok=True)
-            except Exception:
-                pass
-
-            # filter out cache dirs
-            dirs[:] = [d for d in dirs if d not in EXCLUDE_DIR_NAMES]
-
-            for fn in files:
-                s = root_p / fn
-                t = target_dir / fn
-                try:
-                    t.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.copy2(s, t)
-                except Exception as e:
-                    if best_effort:
-                        errors.append((str(s), str(t), repr(e)))
-                        continue
-                    raise
-        return errors
-
     dest_root = Path(dest).expanduser().resolve()
+    if archive:
+        return _backup_to_archive(profiles, dest_root, archive, best_effort)
+    prev = latest_snapshot(dest_root, "browsers_backup_") if dest_root.exists() and incremental else None
     stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     outdir = dest_root / f"browsers_backup_{stamp}"
     outdir.mkdir(parents=True, exist_ok=True)
+    report: Dict[str, object] = {"saved_to": str(outdir), "previous": str(prev) if prev else None, "items": []}
 
-    report: Dict[str, object] = {"saved_to": str(outdir), "items": []}
+    with CopyEngine(best_effort=best_effort, exclude_dirs=BROWSER_CACHE_DIRS) as engine:
+        copier = SnapshotCopier(outdir, engine, prev_dir=prev, hash_files=hash_files)
+        for name, src in profiles:
+            if not src.exists():
+                report["items"].append({"name": name, "src": str(src), "status": "not_found"})
+                continue
 
-    for name, src in profiles:
-        if not src.exists():
-            report["items"].append({"name": name, "src": str(src), "status": "not_found"})
-            continue
+            dst = outdir / name
+            try:
+                errs = copier.copytree(src, name)
+                if errs:
+                    report["items"].append({"name": name, "src": str(src), "dst": str(dst), "status": "partial", "errors": errs[:50]})
+                else:
+                    report["items"].append({"name": name, "src": str(src), "dst": str(dst), "status": "ok"})
+            except Exception as e:
+                report["items"].append({"name": name, "src": str(src), "dst": str(dst), "status": f"error: {e!r}"})
 
-        dst = outdir / name
-        try:
-            errs = _copytree_best_effort(src, dst)
-            if errs:
-                report["items"].append({"name": name, "src": str(src), "dst": str(dst), "status": "partial", "errors": errs[:50]})
-            else:
-                report["items"].append({"name": name, "src": str(src), "dst": str(dst), "status": "ok"})
-        except Exception as e:
-            report["items"].append({"name": name, "src": str(src), "dst": str(dst), "status": f"error: {e!r}"})
+    copier.save_manifest()
+    report.update(copier.totals())
 
     # Save report JSON for audit
     (outdir / "backup_report.json").write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
     return report
 
 
+def _backup_to_archive(profiles: List[Tuple[str, Path]], dest_root: Path, fmt: str,
+                       best_effort: bool) -> Dict[str, object]:
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    dest_root.mkdir(parents=True, exist_ok=True)
+    path = dest_root / f"browsers_backup_{stamp}.{fmt}"
+    report: Dict[str, object] = {"saved_to": str(path), "format": fmt, "items": []}
+    t0 = time.perf_counter()
+
+    writer = ArchiveWriter(path, fmt, best_effort=best_effort, exclude_dirs=BROWSER_CACHE_DIRS)
+    try:
+        for name, src in profiles:
+            if not src.exists():
+                report["items"].append({"name": name, "src": str(src), "status": "not_found"})
+                continue
+            item = {"name": name, "src": str(src)}
+            try:
+                errs, stats = writer.add_tree(src, name)
+                item["status"] = "partial" if errs else "ok"
+                if errs:
+                    item["errors"] = errs[:50]
+                item.update(stats)
+            except Exception as e:
+                item["status"] = f"error: {e!r}"
+            report["items"].append(item)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    done = [it for it in report["items"] if "bytes_in" in it]
+    bytes_in = sum(it["bytes_in"] for it in done)
+    report.update({
+        "files": sum(it["files"] for it in done),
+        "files_stored": sum(it["files_stored"] for it in done),
+        "bytes_in": bytes_in,
+        "bytes_out": path.stat().st_size,
+        "ratio": round(path.stat().st_size / bytes_in, 3) if bytes_in else None,
+        "elapsed_sec": round(time.perf_counter() - t0, 2),
+    })
+    path.with_name(path.name + ".report.json").write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return report
+
+
 def optimize_ssd(drive_letter: str) -> Dict[str, object]:
     report = {"generated_at": datetime.now().isoformat(timespec="seconds"), "drive": drive_letter}
     if not is_admin():
@@ -491,34 +3304,599 @@ def optimize_ssd(drive_letter: str) -> Dict[str, object]:
     return report
 
 
+REPORT_FORMATS = ("json", "jsonl", "csv", "sqlite")
+
+
+class ReportWriter(ABC):
+    """Streams scan report records to one file as they are produced (flat memory).
+
+    Records are (kind, fields): "meta", "progress", "stats", "top_dir",
+    "top_file", "dir" (one per folder of a --levels tree) and "rollup".
+    Formats keep what fits them; read them back with iter_report().
+    scan writes each root with write_result() as soon as it is final
+    (scan_roots on_result), so roots appear in the order they finish and
+    can be read before the rest of the scan is done.
+    """
+
+    suffix = ""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    @abstractmethod
+    def write(self, kind: str, rec: Dict[str, object]) -> None:
+        """Append one record of *kind*."""
+
+    def write_tree(self, root: str, tree: DirTree) -> None:
+        for rec in _tree_records(root, tree):
+            self.write("dir", rec)
+
+    def write_result(self, r: ScanResult) -> None:
+        """Append the stats, top_dir, top_file and dir records of one finished root."""
+        root = r.stats.root
+        self.write("stats", asdict(r.stats))
+        levels = [(1, r.top_dirs_level1), (2, r.top_dirs_level2)]
+        levels += [(lvl, rows) for lvl, rows in sorted(r.top_dirs_by_level.items()) if lvl > 2]
+        for lvl, rows in levels:
+            for p, sz in rows:
+                self.write("top_dir", {"root": root, "level": lvl, "path": p, "bytes": sz})
+        for p, sz in r.top_files:
+            self.write("top_file", {"root": root, "path": p, "bytes": sz})
+        if r.tree is not None:
+            self.write_tree(root, r.tree)
+        self.flush()
+
+    def flush(self) -> None:
+        """Make the records written so far readable by other processes."""
+
+    def close(self) -> None:
+        pass
+
+
+def _tree_records(root: str, tree: DirTree) -> Iterator[Dict[str, object]]:
+    # Depth-first with the parent path on the stack: no per-node walk up the tree, no path table.
+    stack = [(0, "")]
+    while stack:
+        i, path = stack.pop()
+        yield {"root": root, "level": tree.level[i], "path": path, "bytes": tree.total_bytes[i],
+               "files": tree.total_files[i], "dirs": tree.total_dirs[i]}
+        for c in reversed(tree.child_nodes(i)):
+            name = tree._names[tree.name[c]]
+            stack.append((c, os.path.join(path, name) if path else name))
+
+
+class JsonReportWriter(ReportWriter):
+    """scan_report_*.json plus its _topdirs.csv, written one root at a time.
+
+    The JSON keeps its one-document layout ({..., "results": [...], "rollup"})
+    and the indent=2 formatting; only one root's result is in memory at once.
+    The file is complete once close() has run.
+    """
+
+    suffix = ".json"
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        # pathlib.Path.with_suffix expects a *file extension* like ".csv".
+        # We want to add a postfix to the filename instead.
+        self.topdirs_path = path.with_name(path.stem + "_topdirs.csv")
+        self._f = open(path, "w", encoding="utf-8")
+        self._csv_f = open(self.topdirs_path, "w", encoding="utf-8-sig", newline="")
+        self._csv = csv.writer(self._csv_f, delimiter=";")
+        self._csv.writerow(["root", "level", "path", "bytes", "gb"])
+        self._results = 0
+
+    @staticmethod
+    def _dump(obj: object, indent: str) -> str:
+        # json.dumps(indent=2) of a nested value; strings never hold raw newlines.
+        return json.dumps(obj, ensure_ascii=False, indent=2).replace("\n", "\n" + indent)
+
+    def write(self, kind: str, rec: Dict[str, object]) -> None:
+        if kind == "meta":
+            head = {k: rec[k] for k in ("generated_at", "is_admin", "drives")}
+            self._f.write(self._dump(head, "")[:-2] + ',\n  "results": [')
+        elif kind == "rollup":
+            self._f.write(("\n  ]" if self._results else "]") + ',\n  "rollup": ' + self._dump(rec, "  ") + "\n}")
+
+    def write_result(self, r: ScanResult) -> None:
+        rec = {"stats": asdict(r.stats), "top_dirs_level1": r.top_dirs_level1, "top_dirs_level2": r.top_dirs_level2,
+               "top_dirs_by_level": r.top_dirs_by_level, "top_files": r.top_files}
+        self._f.write(("," if self._results else "") + "\n    " + self._dump(rec, "    "))
+        self._results += 1
+        root = r.stats.root
+        levels = [(1, r.top_dirs_level1), (2, r.top_dirs_level2)]
+        levels += [(lvl, rows) for lvl, rows in r.top_dirs_by_level.items() if lvl > 2]
+        for lvl, rows in levels:
+            for p, sz in rows:
+                self._csv.writerow([root, lvl, p, sz, round(sz / (1024**3), 3)])
+        self.flush()
+
+    def flush(self) -> None:
+        self._f.flush()
+        self._csv_f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+        self._csv_f.close()
+
+
+class JsonlReportWriter(ReportWriter):
+    """One JSON object per line: {"kind": ..., **fields}."""
+
+    suffix = ".jsonl"
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._f = open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, kind: str, rec: Dict[str, object]) -> None:
+        line = json.dumps({"kind": kind, **rec}, ensure_ascii=False) + "\n"
+        with self._lock:  # progress records come from the walker threads
+            self._f.write(line)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class CsvReportWriter(ReportWriter):
+    """The folder and file rows (top_dir, top_file, dir) in one table; other kinds are left out."""
+
+    suffix = ".csv"
+    COLUMNS = ("kind", "root", "level", "path", "bytes", "files", "dirs")
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._f = open(path, "w", encoding="utf-8-sig", newline="")
+        self._w = csv.writer(self._f, delimiter=";")
+        self._w.writerow(self.COLUMNS)
+
+    def write(self, kind: str, rec: Dict[str, object]) -> None:
+        if kind in ("top_dir", "top_file", "dir"):
+            self._w.writerow([kind] + [rec.get(c, "") for c in self.COLUMNS[1:]])
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class SqliteReportWriter(ReportWriter):
+    """Columnar report: tables per record kind; --levels trees as (node, parent, name) rows
+    that load_report_tree() turns back into a queryable DirTree."""
+
+    suffix = ".sqlite"
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.executescript(
+            "CREATE TABLE records (kind TEXT, data TEXT);"
+            "CREATE TABLE top_dirs (root TEXT, level INTEGER, path TEXT, bytes INTEGER);"
+            "CREATE TABLE top_files (root TEXT, path TEXT, bytes INTEGER);"
+            "CREATE TABLE dirs (root TEXT, node INTEGER, parent INTEGER, name TEXT, level INTEGER,"
+            " bytes INTEGER, files INTEGER, dirs INTEGER, own_bytes INTEGER, own_files INTEGER,"
+            " PRIMARY KEY (root, node)) WITHOUT ROWID;"
+        )
+        self._lock = threading.Lock()
+
+    def write(self, kind: str, rec: Dict[str, object]) -> None:
+        with self._lock:
+            if kind == "top_dir":
+                self._db.execute("INSERT INTO top_dirs VALUES (?,?,?,?)", (rec["root"], rec["level"], rec["path"], rec["bytes"]))
+            elif kind == "top_file":
+                self._db.execute("INSERT INTO top_files VALUES (?,?,?)", (rec["root"], rec["path"], rec["bytes"]))
+            elif kind == "dir":
+                raise ValueError("use write_tree() for dir records")
+            else:
+                self._db.execute("INSERT INTO records VALUES (?,?)", (kind, json.dumps(rec, ensure_ascii=False)))
+
+    def write_tree(self, root: str, tree: DirTree) -> None:
+        rows = ((root, i, tree.parent[i], tree._names[tree.name[i]], tree.level[i], tree.total_bytes[i],
+                 tree.total_files[i], tree.total_dirs[i], tree.own_bytes[i], tree.own_files[i])
+                for i in range(len(tree)))
+        with self._lock:
+            self._db.executemany("INSERT INTO dirs VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._db.commit()
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+
+REPORT_WRITERS = {"json": JsonReportWriter, "jsonl": JsonlReportWriter, "csv": CsvReportWriter, "sqlite": SqliteReportWriter}
+
+
+def iter_report(path: Path) -> Iterator[Dict[str, object]]:
+    """Records of a .jsonl / .csv / .sqlite scan report as {"kind": ..., **fields} dicts, streamed."""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    elif path.suffix == ".csv":
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f, delimiter=";"):
+                yield {k: (int(v) if k in ("level", "bytes", "files", "dirs") and v != "" else v) for k, v in row.items()}
+    elif path.suffix == ".sqlite":
+        db = sqlite3.connect(str(path))
+        try:
+            for kind, data in db.execute("SELECT kind, data FROM records ORDER BY rowid"):
+                yield {"kind": kind, **json.loads(data)}
+            for root, level, p, size in db.execute("SELECT * FROM top_dirs ORDER BY rowid"):
+                yield {"kind": "top_dir", "root": root, "level": level, "path": p, "bytes": size}
+            for root, p, size in db.execute("SELECT * FROM top_files ORDER BY rowid"):
+                yield {"kind": "top_file", "root": root, "path": p, "bytes": size}
+            roots = [r for r, in db.execute("SELECT DISTINCT root FROM dirs")]
+        finally:
+            db.close()
+        for root in roots:
+            # Paths need the parent chain: rebuild the compact tree, one root at a time.
+            for rec in _tree_records(root, load_report_tree(path, root)):
+                yield {"kind": "dir", **rec}
+    else:
+        raise ValueError(f"not a streamed scan report: {path}")
+
+
+def load_report_tree(path: Path, root: str) -> Optional[DirTree]:
+    """Rebuild the DirTree of *root* from a .sqlite scan report (None if it has no tree for it)."""
+    db = sqlite3.connect(str(path))
+    tree, rows = DirTree(root), 0
+    try:
+        for node, parent, name, own_bytes, own_files in db.execute(
+                "SELECT node, parent, name, own_bytes, own_files FROM dirs WHERE root=? ORDER BY node", (root,)):
+            if node:
+                tree.add(parent, name)
+            tree.set_own(node, own_bytes, own_files)
+            rows += 1
+    finally:
+        db.close()
+    if not rows:
+        return None
+    tree.finalize()
+    return tree
+
+
+SNAPSHOT_DIR = "snapshots"
+_KEY_SEP = "\x01"  # sorts below every character allowed in a file name
+
+
+def _snapshot_key(rel: str) -> str:
+    # Component-wise path order as plain string order: "a" < "a/x" < "a b".
+    return os.path.normcase(rel).replace(os.sep, _KEY_SEP)
+
+
+def _sorted_tree_rows(tree: DirTree) -> Iterator[Tuple[str, str, int, int, int]]:
+    """(key, path, bytes, files, own_bytes) of every folder in key order: a depth-first walk
+    with children sorted by name is already in order, so nothing is buffered."""
+    stack = [(0, "")]
+    while stack:
+        i, path = stack.pop()
+        yield _snapshot_key(path), path, tree.total_bytes[i], tree.total_files[i], tree.own_bytes[i]
+        kids = sorted(tree.child_nodes(i), key=lambda c: os.path.normcase(tree._names[tree.name[c]]), reverse=True)
+        for c in kids:
+            name = tree._names[tree.name[c]]
+            stack.append((c, os.path.join(path, name) if path else name))
+
+
+def write_snapshot(path: Path, results: List[ScanResult]) -> Path:
+    """Save the folder trees of a scan as a path-sorted snapshot (SQLite, one row per folder)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(str(path))
+    try:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.executescript(
+            "CREATE TABLE meta (root TEXT PRIMARY KEY, depth INTEGER, created_at TEXT, stats TEXT);"
+            "CREATE TABLE dirs (root TEXT, key TEXT, path TEXT, bytes INTEGER, files INTEGER, own_bytes INTEGER,"
+            " PRIMARY KEY (root, key)) WITHOUT ROWID;"
+        )
+        created = datetime.now().isoformat(timespec="seconds")
+        for r in results:
+            if r.tree is None:
+                continue
+            root = os.path.normcase(os.path.abspath(r.stats.root))
+            db.execute("INSERT INTO meta VALUES (?,?,?,?)", (root, r.stats.depth, created, json.dumps(asdict(r.stats))))
+            db.executemany("INSERT INTO dirs VALUES (?,?,?,?,?,?)",
+                           ((root, *row) for row in _sorted_tree_rows(r.tree)))
+        db.commit()
+    finally:
+        db.close()
+    return path
+
+
+def list_snapshots(outdir: Path) -> List[Path]:
+    """Snapshots under <outdir>/snapshots, oldest first."""
+    return sorted((outdir / SNAPSHOT_DIR).glob("scan_*.sqlite"))
+
+
+def _snapshot_rows(path: Path) -> Iterator[tuple]:
+    db = sqlite3.connect(str(path))
+    try:
+        yield from db.execute("SELECT root, key, path, bytes, files, own_bytes FROM dirs ORDER BY root, key")
+    finally:
+        db.close()
+
+
+def diff_snapshots(old: Path, new: Path, top: int = 25, min_bytes: int = 1) -> Dict[str, object]:
+    """Compare two snapshots in one merge-join pass over their path-sorted rows.
+
+    Returns the *top* growers and shrinkers (by change of total size), and
+    the biggest new and vanished folders (only the topmost folder of a
+    new/vanished subtree). A grower whose growth is >= 90% explained by one
+    of its listed subfolders is dropped in favour of that subfolder. Only
+    the top-N candidates are kept in memory.
+    """
+    t0 = time.time()
+    keep = top * 4
+    grow: List[tuple] = []
+    shrink: List[tuple] = []
+    added: List[tuple] = []
+    gone: List[tuple] = []
+    totals = {"dirs_old": 0, "dirs_new": 0, "bytes_old": 0, "bytes_new": 0}
+    new_prefix = gone_prefix = None
+
+    def push(heap, score, item):
+        if len(heap) < keep:
+            heapq.heappush(heap, (score, item))
+        elif score > heap[0][0]:
+            heapq.heapreplace(heap, (score, item))
+
+    def under(prefix, rk):
+        return prefix is not None and rk[0] == prefix[0] and (rk[1] + _KEY_SEP).startswith(prefix[1] + _KEY_SEP)
+
+    a_it, b_it = _snapshot_rows(old), _snapshot_rows(new)
+    a, b = next(a_it, None), next(b_it, None)
+    while a is not None or b is not None:
+        ka = (a[0], a[1]) if a is not None else None
+        kb = (b[0], b[1]) if b is not None else None
+        if kb is None or (ka is not None and ka < kb):
+            totals["dirs_old"] += 1
+            if not under(gone_prefix, ka):
+                gone_prefix = ka if ka[1] else None  # a vanished root is not a vanished folder
+                if ka[1]:
+                    push(gone, a[3], (a[0], a[2], a[3], 0))
+            a = next(a_it, None)
+            continue
+        if ka is None or kb < ka:
+            totals["dirs_new"] += 1
+            if not under(new_prefix, kb):
+                new_prefix = kb if kb[1] else None
+                if kb[1]:
+                    push(added, b[3], (b[0], b[2], 0, b[3]))
+            b = next(b_it, None)
+            continue
+        totals["dirs_old"] += 1
+        totals["dirs_new"] += 1
+        if not a[1]:
+            totals["bytes_old"] += a[3]
+            totals["bytes_new"] += b[3]
+        delta = b[3] - a[3]
+        if delta >= min_bytes:
+            push(grow, delta, (b[0], b[2], a[3], b[3]))
+        elif delta <= -min_bytes:
+            push(shrink, -delta, (b[0], b[2], a[3], b[3]))
+        a, b = next(a_it, None), next(b_it, None)
+
+    def rows(heap, explained: bool):
+        items = [it for _, it in sorted(heap, reverse=True)]
+        if explained:
+            def inside(child, parent):
+                return child[0] == parent[0] and (not parent[1] or child[1].startswith(parent[1] + os.sep))
+            items = [it for it in items
+                     if not any(o is not it and inside(o, it) and abs(o[3] - o[2]) >= 0.9 * abs(it[3] - it[2])
+                                for o in items)]
+        return [{"root": r, "path": p, "bytes_old": bo, "bytes_new": bn, "delta": bn - bo}
+                for r, p, bo, bn in items[:top]]
+
+    return {"old": str(old), "new": str(new), **totals, "delta": totals["bytes_new"] - totals["bytes_old"],
+            "growers": rows(grow, True), "shrinkers": rows(shrink, True),
+            "new_dirs": rows(added, False), "vanished_dirs": rows(gone, False),
+            "elapsed_sec": round(time.time() - t0, 2)}
+
+
+def _emit(event: str, **fields) -> None:
+    """Write one NDJSON event line (scan --stream) for the launcher UI."""
+    sys.stdout.write(json.dumps({"event": event, **fields}, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def default_scan_roots() -> List[str]:
+    user = os.environ.get("USERPROFILE", "")
+    return [
+        os.path.join(user, "AppData", "Local"),
+        os.path.join(user, "AppData", "Roaming"),
+        os.path.join(os.environ.get("windir", r"C:\Windows"), "SoftwareDistribution", "Download"),
+        os.path.join(os.environ.get("windir", r"C:\Windows"), "Temp"),
+    ]
+
+
+def _print_scan_profile(prof: ScanProfile) -> None:
+    print(f"Phases (summed over workers): scandir {prof.scandir_sec:.2f}s, stat {prof.stat_sec:.2f}s, "
+          f"aggregate {prof.aggregate_sec:.2f}s, top-N {prof.top_n_sec:.2f}s")
+    print("Folder listing latency: " + ", ".join(f"{label}: {n}" for label, n in prof.histogram()))
+    print("Slowest folders:")
+    for sec, path in prof.slowest_dirs[:10]:
+        print(f"  {sec * 1000:9.1f} ms  {path}")
+
+
+def _scan_approx(args: argparse.Namespace, roots: List[str], outdir: Path, stream: bool) -> None:
+    results = []
+    for r in roots:
+        res = approx_scan(r, depth=args.depth, samples=args.samples, refine=args.refine, workers=args.workers)
+        results.append(res)
+        if stream:
+            _emit("approx_done", **asdict(res))
+            continue
+        print(f"Approx. total {format_gb(res.bytes)} (likely range {format_gb(res.low)} .. {format_gb(res.high)}); "
+              f"{res.dirs_listed} folders listed, {res.probes} probes, time={res.elapsed_sec}s "
+              f"(exact refinement {res.refine_sec}s)")
+        print("\n--- Top folders (level 1; ~ = estimate) ---")
+        for row in res.folders[:args.top]:
+            interval = "exact" if row.exact else f"{format_gb(row.low)} .. {format_gb(row.high)}"
+            print(f"{' ' if row.exact else '~'}{format_gb(row.bytes):>11}  {interval:<24} {row.path}")
+        print("\n" + "=" * 70 + "\n")
+
+    out = outdir / f"scan_approx_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.write_text(json.dumps({"generated_at": datetime.now().isoformat(timespec="seconds"),
+                               "results": [asdict(r) for r in results]}, ensure_ascii=False, indent=2), encoding="utf-8")
+    if stream:
+        _emit("saved", files=[str(out)])
+    else:
+        print(f"Saved:\n- {out}")
+
+
+BACKGROUND_DIRS_PER_SEC = 200  # scan --background caps unless given explicitly
+BACKGROUND_STATS_PER_SEC = 5000
+
+
 def cmd_scan(args: argparse.Namespace):
-    drives_info = print_drive_table()
+    stream = getattr(args, "stream", False)
+    profile = getattr(args, "profile", False)
+    drives_info = print_drive_table(echo=not stream)
+    if stream:
+        _emit("drives", drives=drives_info)
 
-    roots = args.roots or []
-    if not roots:
-        user = os.environ.get("USERPROFILE", "")
-        roots = [
-            os.path.join(user, "AppData", "Local"),
-            os.path.join(user, "AppData", "Roaming"),
-            os.path.join(os.environ.get("windir", r"C:\Windows"), "SoftwareDistribution", "Download"),
-            os.path.join(os.environ.get("windir", r"C:\Windows"), "Temp"),
-        ]
-
-    results: List[ScanResult] = []
+    roots = args.roots or default_scan_roots()
+
+    outdir = Path(args.outdir).resolve()
+    outdir.mkdir(parents=True, exist_ok=True)
+    incremental = getattr(args, "incremental", False)
+    index = ScanIndex(outdir / SCAN_INDEX_NAME) if incremental else None
+    cancel = threading.Event()
+    live = not stream and sys.stdout.isatty()
+
+    present: List[str] = []
     for r in roots:
         if not r:
             continue
         r = os.path.expandvars(r)
         if not os.path.exists(r):
-            print(f"[skip] Not found: {r}")
+            if stream:
+                _emit("skip", root=r, reason="not_found")
+            else:
+                print(f"[skip] Not found: {r}")
             continue
-        print(f"=== Scanning: {r} (depth={args.depth}) ===")
-        res = scan_root(r, depth=args.depth, top_dirs=args.top, top_files=args.files)
-        results.append(res)
+        present.append(r)
+
+    background = getattr(args, "background", False)
+    dirs_rate = getattr(args, "max_dirs_per_sec", None)
+    stats_rate = getattr(args, "max_stats_per_sec", None)
+    if background:
+        dirs_rate = BACKGROUND_DIRS_PER_SEC if dirs_rate is None else dirs_rate
+        stats_rate = BACKGROUND_STATS_PER_SEC if stats_rate is None else stats_rate
+    throttle = IoThrottle(dirs_rate or 0, stats_rate or 0) if dirs_rate or stats_rate else None
+    budget = getattr(args, "budget", None)
+    priority = lower_priority() if background or getattr(args, "low_priority", False) else None
+
+    if stream:
+        for r in present:
+            _emit("scan_start", root=r, depth=args.depth, workers=args.workers, budget=budget,
+                  max_dirs_per_sec=dirs_rate, max_stats_per_sec=stats_rate, priority=priority)
+    else:
+        print(f"=== Scanning {len(present)} root(s) (depth={args.depth}, workers={args.workers}) ===")
+        for r in present:
+            print(f"- {r}")
+        if throttle or budget or priority:
+            print(f"Limits: {dirs_rate or 'any'} dirs/s, {stats_rate or 'any'} stats/s, "
+                  f"budget={f'{budget:g}s' if budget else 'none'}, priority={priority or 'normal'}")
+        print()
+
+    if getattr(args, "approx", False):
+        if index is not None:
+            index.close()
+        _scan_approx(args, present, outdir, stream)
+        return
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = outdir / f"scan_report_{ts}"
+    formats = getattr(args, "report", None) or ["json"]
+    writers = [REPORT_WRITERS[f](base.with_suffix(REPORT_WRITERS[f].suffix)) for f in formats]
+    for w in writers:
+        w.write("meta", {"generated_at": datetime.now().isoformat(timespec="seconds"), "is_admin": is_admin(),
+                         "drives": drives_info, "roots": present})
+
+    # Progress events come from one thread per root.
+    lock = threading.Lock()
+    latest: Dict[str, ScanProgress] = {}
+
+    def on_progress(ev: ScanProgress) -> None:
+        for w in writers:
+            w.write("progress", {k: v for k, v in asdict(ev).items() if k not in ("done", "result")})
+        with lock:
+            if stream:
+                _emit("progress", **{k: v for k, v in asdict(ev).items() if k not in ("done", "result")})
+            elif live:
+                latest[ev.root] = ev
+                evs = latest.values()
+                print(f"  ... dirs={sum(e.dirs_scanned for e in evs)}, files={sum(e.files_scanned for e in evs)}, "
+                      f"total={format_gb(sum(e.bytes_total for e in evs))}, {ev.elapsed_sec}s", end="\r", flush=True)
 
+    # Each root goes into the reports as soon as it is final, while the others are still walking.
+    report_sec = 0.0
+
+    def on_result(res: ScanResult) -> None:
+        nonlocal report_sec
+        t = time.perf_counter()
+        if not args.levels:
+            res = replace(res, tree=None)  # built for --snapshot only: the tree goes to the snapshot, not the reports
+        for w in writers:
+            w.write_result(res)
+        report_sec += time.perf_counter() - t
+
+    results, rollup = scan_roots(present, depth=args.depth, top_dirs=args.top, top_files=args.files,
+                                 workers=args.workers, index=index, reuse=not getattr(args, "full", False),
+                                 levels=args.levels, keep_tree=getattr(args, "snapshot", False),
+                                 cancel=cancel, interval=args.progress_interval, on_progress=on_progress,
+                                 dedupe_links=args.dedupe_links, profile=profile, throttle=throttle, budget=budget,
+                                 on_result=on_result)
+    if live:
+        print(" " * 79, end="\r")
+    if throttle is not None and not stream:
+        print(f"Throttle: slept {throttle.slept_sec:.1f}s")
+
+    for res in results:
         st = res.stats
+        if stream:
+            _emit("scan_done", stats=asdict(st), top_dirs_level1=res.top_dirs_level1,
+                  top_dirs_level2=res.top_dirs_level2, top_dirs_by_level=res.top_dirs_by_level,
+                  top_files=res.top_files)
+            continue
+        if st.budget_exhausted:
+            found = st.dirs_scanned + st.dirs_pending
+            print(f"[budget] Time budget used up: {st.dirs_scanned} of {found} folders found were listed "
+                  f"({st.dirs_scanned / max(found, 1):.0%}); sizes below are lower bounds.")
+            if res.unfinished_level1:
+                print("Unfinished (folders not listed): " + ", ".join(
+                    f"{k or '<root>'} ({n})" for k, n in res.unfinished_level1[:10]))
+        elif st.cancelled:
+            print("[cancelled] Partial result: only folders listed before the stop are counted.")
         print(f"Scanned dirs={st.dirs_scanned}, files={st.files_scanned}, total={format_gb(st.bytes_total)}, "
-              f"denied={st.denied}, errors={st.errors}, skipped_reparse={st.skipped_reparse}, time={st.elapsed_sec}s\n")
+              f"denied={st.denied}, errors={st.errors}, skipped_reparse={st.skipped_reparse}, time={st.elapsed_sec}s")
+        if incremental:
+            print(f"Index: reused dirs={st.dirs_reused}, re-read dirs={st.dirs_scanned - st.dirs_reused}")
+        if args.dedupe_links:
+            print(f"Hard links: unique={format_gb(st.bytes_unique)} (apparent {format_gb(st.bytes_total)}), "
+                  f"linked files={st.hardlinks}, counted once={st.hardlinks_deduped}")
+            if st.hardlinks_untracked:
+                print(f"[warn] Link set full: {st.hardlinks_untracked} linked files counted as unique.")
+        if res.nested_roots:
+            print("Contains other scanned roots (walked once, counted here too):")
+            for n in res.nested_roots:
+                print(f"  {n}")
+        if profile:
+            _print_scan_profile(st.profile)
+        print()
 
         print("--- Top folders (level 1) ---")
         for name, sz in res.top_dirs_level1:
@@ -526,41 +3904,141 @@ def cmd_scan(args: argparse.Namespace):
         print("\n--- Top folders (level 2) ---")
         for name, sz in res.top_dirs_level2:
             print(f"{name:<45} {format_gb(sz)}")
+        for lvl, rows in res.top_dirs_by_level.items():
+            if lvl <= 2:
+                continue
+            print(f"\n--- Top folders (level {lvl}) ---")
+            for name, sz in rows:
+                print(f"{name:<45} {format_gb(sz)}")
         print("\n--- Top files ---")
         for p, sz in res.top_files:
             print(f"{format_gb(sz):>10}  {p}")
         print("\n" + "=" * 70 + "\n")
+    if index is not None:
+        index.close()
+
+    if stream:
+        _emit("rollup", **rollup)
+    elif len(results) > 1:
+        print("=== All roots (overlaps counted once) ===")
+        print(f"Roots: {', '.join(rollup['roots'])}")
+        print(f"Scanned dirs={rollup['dirs_scanned']}, files={rollup['files_scanned']}, "
+              f"total={format_gb(rollup['bytes_total'])}, time={rollup['elapsed_sec']}s")
+        if args.dedupe_links:
+            print(f"Unique (hard links counted once): {format_gb(rollup['bytes_unique'])}")
+        print("\n--- Top files ---")
+        for p, sz in rollup["top_files"]:
+            print(f"{format_gb(sz):>10}  {p}")
+        print()
+
+    t_report = time.perf_counter()
+    saved = []
+    for w in writers:
+        w.write("rollup", rollup)
+        w.close()
+        saved.append(str(w.path))
+        if isinstance(w, JsonReportWriter):
+            saved.append(str(w.topdirs_path))
+    if getattr(args, "snapshot", False):
+        saved.append(str(write_snapshot(outdir / SNAPSHOT_DIR / f"scan_{ts}.sqlite", results)))
+
+    if profile:
+        # Reports above carry report_sec=0; the profile file has the time they took.
+        report_sec = round(report_sec + time.perf_counter() - t_report, 4)
+        prof_path = base.with_name(base.name + "_profile.json")
+        for r in results:
+            r.stats.profile.report_sec = report_sec
+        prof_path.write_text(json.dumps({"report_sec": report_sec, "roots": [
+            {"root": r.stats.root, "elapsed_sec": r.stats.elapsed_sec, "dirs_scanned": r.stats.dirs_scanned,
+             **asdict(r.stats.profile), "latency_hist": r.stats.profile.histogram()} for r in results]},
+            ensure_ascii=False, indent=2), encoding="utf-8")
+        saved.append(str(prof_path))
+        if not stream:
+            print(f"Reports written in {report_sec:.2f}s")
+    if stream:
+        _emit("saved", files=saved)
+    else:
+        print("Saved:\n" + "\n".join(f"- {p}" for p in saved))
+
+
+def cmd_diff(args: argparse.Namespace):
+    outdir = Path(args.outdir).resolve()
+    snaps = list_snapshots(outdir)
+    new = Path(args.new) if args.new else (snaps[-1] if snaps else None)
+    if args.old:
+        old = Path(args.old)
+    else:
+        # Newest snapshot at least --days older than the new one (the one before it by default).
+        cutoff = datetime.fromtimestamp(new.stat().st_mtime) - timedelta(days=args.days) if new else None
+        older = [p for p in snaps if p != new and datetime.fromtimestamp(p.stat().st_mtime) <= cutoff] if new else []
+        old = older[-1] if older else None
+    if old is None or new is None:
+        print(f"Need two snapshots (scan --snapshot) in {outdir / SNAPSHOT_DIR}, or give OLD and NEW.")
+        return
+    rep = diff_snapshots(old, new, top=args.top, min_bytes=int(args.min_mb * 1024 * 1024))
+
+    print(f"=== {old.name} -> {new.name} ===")
+    print(f"Folders: {rep['dirs_old']} -> {rep['dirs_new']}, total {format_gb(rep['bytes_old'])} -> "
+          f"{format_gb(rep['bytes_new'])} ({'+' if rep['delta'] >= 0 else '-'}{format_gb(abs(rep['delta']))}), "
+          f"time={rep['elapsed_sec']}s")
+    for title, key in (("Grew", "growers"), ("Shrank", "shrinkers"), ("New folders", "new_dirs"),
+                       ("Vanished folders", "vanished_dirs")):
+        print(f"\n--- {title} ---")
+        for row in rep[key]:
+            sign = "+" if row["delta"] >= 0 else "-"
+            print(f"{sign}{format_gb(abs(row['delta'])):>10}  {format_gb(row['bytes_new']):>10}  "
+                  f"{os.path.join(row['root'], row['path']) if row['path'] else row['root']}")
+
+    out = outdir / f"scan_diff_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.write_text(json.dumps(rep, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nSaved: {out}")
+
+
+def cmd_dupes(args: argparse.Namespace):
+    roots = []
+    for r in args.roots or default_scan_roots():
+        r = os.path.expandvars(r)
+        if r and os.path.exists(r):
+            roots.append(r)
+        elif r:
+            print(f"[skip] Not found: {r}")
 
     outdir = Path(args.outdir).resolve()
     outdir.mkdir(parents=True, exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base = outdir / f"scan_report_{ts}"
+    min_size = int(args.min_mb * 1024 * 1024)
+    print(f"=== Duplicates >= {args.min_mb} MB under {len(roots)} root(s) (workers={args.workers}) ===")
+    cache = HashCache(outdir / HASH_CACHE_NAME)
+    try:
+        groups, st = find_dupes(roots, min_size=min_size, workers=args.workers, cache=cache)
+    finally:
+        cache.close()
 
+    print(f"Files >= min size={st.files_seen}, same size={st.same_size}, head-hashed={st.head_hashed}, "
+          f"fully hashed={st.full_hashed}, cache hits={st.cache_hits}, hard links skipped={st.hardlinks_skipped}, "
+          f"errors={st.errors}, time={st.elapsed_sec}s")
+    print(f"Duplicate groups={st.groups}, wasted={format_gb(st.wasted_bytes)}\n")
+    for g in groups[:args.top]:
+        print(f"{format_gb(g['wasted']):>10} wasted  {len(g['files'])} x {format_gb(g['size'])}")
+        for p in g["files"]:
+            print(f"            {p}")
+    print()
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = outdir / f"dupes_report_{ts}"
     payload = {
         "generated_at": datetime.now().isoformat(timespec="seconds"),
-        "is_admin": is_admin(),
-        "drives": drives_info,
-        "results": [
-            {"stats": asdict(r.stats), "top_dirs_level1": r.top_dirs_level1, "top_dirs_level2": r.top_dirs_level2, "top_files": r.top_files}
-            for r in results
-        ],
+        "stats": asdict(st),
+        "groups": groups,
     }
-    (base.with_suffix(".json")).write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-
-    # pathlib.Path.with_suffix expects a *file extension* like ".csv".
-    # We want to add a postfix to the filename instead.
-    topdirs_csv = base.with_name(base.name + "_topdirs.csv")
-    with open(topdirs_csv, "w", encoding="utf-8-sig", newline="") as f:
+    base.with_suffix(".json").write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    groups_csv = base.with_name(base.name + "_groups.csv")
+    with open(groups_csv, "w", encoding="utf-8-sig", newline="") as f:
         w = csv.writer(f, delimiter=";")
-        w.writerow(["root", "level", "path", "bytes", "gb"])
-        for r in results:
-            root = r.stats.root
-            for p, sz in r.top_dirs_level1:
-                w.writerow([root, 1, p, sz, round(sz / (1024**3), 3)])
-            for p, sz in r.top_dirs_level2:
-                w.writerow([root, 2, p, sz, round(sz / (1024**3), 3)])
-
-    print(f"Saved:\n- {base.with_suffix('.json')}\n- {topdirs_csv}")
+        w.writerow(["group", "size", "wasted", "wasted_gb", "hash", "path"])
+        for i, g in enumerate(groups, 1):
+            for p in g["files"]:
+                w.writerow([i, g["size"], g["wasted"], round(g["wasted"] / (1024**3), 3), g["hash"], p])
+    print(f"Saved:\n- {base.with_suffix('.json')}\n- {groups_csv}")
 
 
 def build_cleanup_actions(include_browser_cache: bool, include_nvidia_app: bool):
@@ -658,22 +4136,47 @@ def cmd_cleanup(args: argparse.Namespace):
         include_nvidia_app=args.nvidia_app_cache
     )
 
+    if args.older_than is not None or args.larger_than is not None or args.name or args.exclude:
+        rule = CleanupRule(older_than_days=args.older_than, larger_than_mb=args.larger_than,
+                           names=args.name, exclude=args.exclude)
+        for act in actions:
+            act.rule = rule
+        print(f"Rule: {asdict(rule)} (only matching files are deleted)")
+
     print(f"Mode: {'EXECUTE' if args.yes else 'DRY_RUN'}")
     if args.browser_cache:
         print("Including browser caches: YES (close browsers before executing)")
     if args.nvidia_app_cache:
         print("Including NVIDIA app UpdateFramework cache: YES (admin + NVIDIA app closed recommended)")
 
-    rep = cleanup(actions, yes=args.yes, outdir=outdir)
+    profile = getattr(args, "profile", False)
+    rep = cleanup(actions, yes=args.yes, outdir=outdir, workers=args.workers, profile=profile)
     print(f"Report saved into: {outdir}")
+    if profile:
+        print("Phases: " + ", ".join(f"{k[:-4]} {v:.2f}s" for k, v in rep["profile"].items()))
     if rep.get("mode") == "DRY_RUN":
-        print("Dry-run complete. Re-run with --yes to actually delete.")
-    else:
-        print("Cleanup executed.")
+        for act in rep["actions"]:
+            if "skipped" in act:
+                print(f"{act['name']:<35} skipped ({act['skipped']})")
+            else:
+                print(f"{act['name']:<35} {format_gb(act['reclaimable_bytes'])} ({act['reclaimable_files']} files)")
+        print(f"Reclaimable: {format_gb(rep['reclaimable_bytes'])} ({rep['reclaimable_files']} files)")
+        if args.ask and rep["reclaimable_files"] and input("Delete now? [y/N] ").strip().lower() in ("y", "yes"):
+            rep = cleanup(actions, yes=True, outdir=outdir, workers=args.workers, profile=profile)
+            if profile:
+                print("Phases: " + ", ".join(f"{k[:-4]} {v:.2f}s" for k, v in rep["profile"].items()))
+        else:
+            print("Dry-run complete. Re-run with --yes to actually delete.")
+            return
+    for act in rep["actions"]:
+        if "freed_bytes" in act:
+            print(f"{act['name']:<35} freed {format_gb(act['freed_bytes'])} ({act['freed_files']} files)")
+    print(f"Cleanup executed. Freed {format_gb(rep['freed_bytes'])} ({rep['freed_files']} files).")
 
 
 def cmd_backup(args: argparse.Namespace):
-    rep = backup_browsers(args.dest, kill_browsers=getattr(args,'kill_browsers', False), best_effort=getattr(args,'best_effort', False))
+    rep = backup_browsers(args.dest, kill_browsers=getattr(args,'kill_browsers', False), best_effort=getattr(args,'best_effort', False),
+                          incremental=args.incremental, hash_files=args.hash, archive=args.archive)
     print(json.dumps(rep, ensure_ascii=False, indent=2))
 
 
@@ -688,6 +4191,31 @@ def cmd_trim(args: argparse.Namespace):
     print(json.dumps(rep, ensure_ascii=False, indent=2))
 
 
+PROFILE_HELP = "Profile the run: cProfile stats in <outdir>/profile_<command>_*.prof/.txt; scan and cleanup also report per-phase timings."
+
+
+def run_profiled(args: argparse.Namespace) -> None:
+    """Run the subcommand under cProfile and save the stats next to the reports.
+
+    <outdir>/profile_<command>_<ts>.prof is for pstats/snakeviz, the .txt next
+    to it has the top functions by cumulative time. cProfile only sees the
+    calling thread; work on thread pools shows up as waits (scan's per-phase
+    timers cover its walker threads).
+    """
+    prof = cProfile.Profile()
+    try:
+        prof.runcall(args.func, args)
+    finally:
+        outdir = Path(args.outdir).resolve()
+        outdir.mkdir(parents=True, exist_ok=True)
+        base = outdir / f"profile_{args.cmd}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        prof.dump_stats(str(base.with_suffix(".prof")))
+        with open(base.with_suffix(".txt"), "w", encoding="utf-8") as f:
+            pstats.Stats(prof, stream=f).strip_dirs().sort_stats("cumulative").print_stats(40)
+        # stderr: scan --stream keeps stdout for NDJSON.
+        print(f"Profile saved: {base.with_suffix('.prof')} (+ .txt)", file=sys.stderr)
+
+
 def main():
     if os.name != "nt":
         print("This tool is for Windows.")
@@ -695,6 +4223,7 @@ def main():
 
     ap = argparse.ArgumentParser("win_maintain", description="Scan + safe cleanup + browser backup for Windows 10/11.")
     ap.add_argument("--outdir", default=str(DEFAULT_OUTDIR), help="Output dir for reports (default: current).")
+    ap.add_argument("--profile", action="store_true", help=PROFILE_HELP)
 
 
     sub = ap.add_subparsers(dest="cmd", required=True)
@@ -702,16 +4231,62 @@ def main():
     sp_scan = sub.add_parser("scan", help="Scan disk hogs under common roots (or provided roots).")
 
     sp_scan.add_argument("--outdir", default=argparse.SUPPRESS, help="Output dir for reports (default: current).")
+    sp_scan.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help=PROFILE_HELP)
     sp_scan.add_argument("--roots", nargs="*", default=[], help="Roots to scan (default: Local/Roaming + Win Update cache + Win Temp).")
     sp_scan.add_argument("--depth", type=int, default=6, help="Relative depth (default 6). Use -1 for unlimited (can be slow).")
     sp_scan.add_argument("--top", type=int, default=25, help="Top N folders (default 25).")
     sp_scan.add_argument("--files", type=int, default=30, help="Top N files (default 30).")
+    sp_scan.add_argument("--workers", type=int, default=1, help="Parallel directory listing threads (default 1).")
+    sp_scan.add_argument("--levels", type=int, default=0, help="Keep the full folder tree and report top folders for levels 1..N.")
+    sp_scan.add_argument("--dedupe-links", action="store_true", help="Count hard-linked files once (reports unique size next to apparent size; slower on Windows).")
+    sp_scan.add_argument("--stream", action="store_true", help="Print NDJSON events (progress, results) instead of console text.")
+    sp_scan.add_argument("--progress-interval", type=float, default=1.0, help="Seconds between progress events (default 1).")
+    sp_scan.add_argument("--incremental", action="store_true", help="Reuse folders with an unchanged modification time from <outdir>/scan_index.sqlite (faster rescans; a file rewritten in place keeps its old size until its folder changes).")
+    sp_scan.add_argument("--full", action="store_true", help="--incremental: re-read every folder and refresh the scan index.")
+    sp_scan.add_argument("--report", nargs="+", choices=REPORT_FORMATS, default=["json"], help="Report formats: json (+ top folders CSV), jsonl/csv streamed, sqlite (columnar, with the --levels tree).")
+    sp_scan.add_argument("--snapshot", action="store_true", help="Save a path-sorted folder snapshot (every folder, whatever --levels is) to <outdir>/snapshots for `diff`; reports still list only the --levels top folders.")
+    sp_scan.add_argument("--budget", type=float, default=None, help="Stop after this many seconds with a partial result (largest level-1 folders first; one thread per root).")
+    sp_scan.add_argument("--max-dirs-per-sec", type=float, default=None, help="Cap folder listings per second.")
+    sp_scan.add_argument("--max-stats-per-sec", type=float, default=None, help="Cap file stats per second.")
+    sp_scan.add_argument("--low-priority", action="store_true", help="Lower process CPU/I/O priority (Windows background mode).")
+    sp_scan.add_argument("--approx", action="store_true", help="Estimate level-1 folder sizes by sampling (with likely ranges, not guaranteed), then walk the biggest ones exactly.")
+    sp_scan.add_argument("--samples", type=int, default=32, help="--approx: random probes per level-1 folder on average (default 32).")
+    sp_scan.add_argument("--refine", type=int, default=5, help="--approx: biggest estimates re-scanned exactly (default 5).")
+    sp_scan.add_argument("--background", action="store_true", help=f"Working-hours mode: --low-priority and, unless given, {BACKGROUND_DIRS_PER_SEC} dirs/s and {BACKGROUND_STATS_PER_SEC} stats/s.")
     sp_scan.set_defaults(func=cmd_scan)
 
+    sp_diff = sub.add_parser("diff", help="Compare two scan snapshots: biggest growers, shrinkers, new and vanished folders.")
+
+    sp_diff.add_argument("--outdir", default=argparse.SUPPRESS, help="Output dir for reports (default: current).")
+    sp_diff.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help=PROFILE_HELP)
+    sp_diff.add_argument("old", nargs="?", help="Older snapshot (default: newest one at least --days before NEW).")
+    sp_diff.add_argument("new", nargs="?", help="Newer snapshot (default: latest).")
+    sp_diff.add_argument("--days", type=float, default=0, help="Pick OLD at least this many days before NEW (e.g. 7).")
+    sp_diff.add_argument("--top", type=int, default=25, help="Rows per list (default 25).")
+    sp_diff.add_argument("--min-mb", type=float, default=1.0, help="Ignore changes smaller than this many MB (default 1).")
+    sp_diff.set_defaults(func=cmd_diff)
+
+    sp_dupes = sub.add_parser("dupes", help="Find duplicate large files (size, then head/tail hash, then full hash).")
+
+    sp_dupes.add_argument("--outdir", default=argparse.SUPPRESS, help="Output dir for reports (default: current).")
+    sp_dupes.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help=PROFILE_HELP)
+    sp_dupes.add_argument("--roots", nargs="*", default=[], help="Roots to search (default: same as scan).")
+    sp_dupes.add_argument("--min-mb", type=float, default=1.0, help="Ignore files smaller than this many MB (default 1).")
+    sp_dupes.add_argument("--workers", type=int, default=4, help="Hashing threads (default 4).")
+    sp_dupes.add_argument("--top", type=int, default=25, help="Duplicate groups to print (default 25; reports have all).")
+    sp_dupes.set_defaults(func=cmd_dupes)
+
     sp_cleanup = sub.add_parser("cleanup", help="Safe cleanup (temp/caches). Default is dry-run.")
 
     sp_cleanup.add_argument("--outdir", default=argparse.SUPPRESS, help="Output dir for reports (default: current).")
+    sp_cleanup.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help=PROFILE_HELP)
     sp_cleanup.add_argument("--yes", action="store_true", help="Actually delete (otherwise dry-run).")
+    sp_cleanup.add_argument("--workers", type=int, default=8, help="Parallel delete/measure threads (default 8).")
+    sp_cleanup.add_argument("--ask", action="store_true", help="Dry-run, show reclaimable size, then ask before deleting.")
+    sp_cleanup.add_argument("--older-than", type=float, default=None, help="Only files not modified for N days.")
+    sp_cleanup.add_argument("--larger-than", type=float, default=None, help="Only files larger than N MB.")
+    sp_cleanup.add_argument("--name", nargs="*", default=[], help="Only files whose name matches one of these patterns (e.g. *.tmp *.log).")
+    sp_cleanup.add_argument("--exclude", nargs="*", default=[], help="Skip files/folders whose name matches one of these patterns.")
     sp_cleanup.add_argument("--browser-cache", action="store_true", help="Also clear browser cache folders (profiles untouched).")
     sp_cleanup.add_argument("--nvidia-app-cache", action="store_true", help="Also clear NVIDIA app UpdateFramework/Installer cache (admin recommended).")
     sp_cleanup.set_defaults(func=cmd_cleanup)
@@ -719,27 +4294,36 @@ def main():
     sp_backup = sub.add_parser("backup-browsers", help="Backup browser profiles to a folder.")
 
     sp_backup.add_argument("--outdir", default=argparse.SUPPRESS, help="Output dir for reports (default: current).")
+    sp_backup.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help=PROFILE_HELP)
     sp_backup.add_argument("--dest", default=r"D:\Backups\Browsers", help="Destination folder (default: D:\\Backups\\Browsers).")
     sp_backup.add_argument("--kill-browsers", action="store_true", help="Kill Edge/Yandex/Opera processes before backup (recommended).")
     sp_backup.add_argument("--best-effort", action="store_true", help="Continue even if some files are locked; skipped files will be reported.")
+    sp_backup.add_argument("--incremental", action="store_true", help="Hard-link unchanged files from the previous backup in --dest.")
+    sp_backup.add_argument("--hash", action="store_true", help="Store file hashes in the manifest; link files whose mtime changed but content did not.")
+    sp_backup.add_argument("--archive", choices=ARCHIVE_FORMATS, default=None, help="Stream profiles into one zip/tar.xz instead of a folder copy (already-compressed files are stored).")
     sp_backup.set_defaults(func=cmd_backup)
 
     sp_wu = sub.add_parser("winupdate-cache", help="Reset Windows Update download cache (admin recommended).")
 
     sp_wu.add_argument("--outdir", default=argparse.SUPPRESS, help="Output dir for reports (default: current).")
+    sp_wu.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help=PROFILE_HELP)
     sp_wu.add_argument("--yes", action="store_true", help="Execute (otherwise dry-run).")
     sp_wu.set_defaults(func=cmd_winupdate_cache)
 
     sp_trim = sub.add_parser("trim", help="Run SSD TRIM (Optimize-Volume) for a drive (admin required).")
 
     sp_trim.add_argument("--outdir", default=argparse.SUPPRESS, help="Output dir for reports (default: current).")
+    sp_trim.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help=PROFILE_HELP)
     sp_trim.add_argument("--drive", default="C", help="Drive letter (default C).")
     sp_trim.set_defaults(func=cmd_trim)
 
     args = ap.parse_args()
     if not hasattr(args, 'outdir'):
         args.outdir = str(DEFAULT_OUTDIR)
-    args.func(args)
+    if args.profile:
+        run_profiled(args)
+    else:
+        args.func(args)
 
 
 if __name__ == "__main__":